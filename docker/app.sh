@@ -1,26 +1,18 @@
 #!/bin/bash
-migration_path="migrations/versions"
-# Get the number of .py files before creating a revision
-initial_file_count=$(find "$migration_path" -type f -name "*.py" | wc -l)
-# Always create a new revision
-alembic -c alembic.ini revision --autogenerate -m "update_tables"
-# Get the number of .py files after creating a revision
-current_file_count=$(find "$migration_path" -type f -name "*.py" | wc -l)
-# Check if a new file has been added
-if [ "$current_file_count" -gt "$initial_file_count" ]; then
-  echo "New migration file detected. Upgrading and adding import line."
-  # Get the list of files
-  files=$(find "$migration_path" -type f -name "*.py")
-  # Iterate over each file and add the import line if it's not present
-  for file in $files; do
-    if ! grep -q "import fastapi_users_db_sqlalchemy.generics" "$file"; then
-      sed -i '1iimport fastapi_users_db_sqlalchemy.generics' "$file"
-    fi
-  done
+# Apply the committed migrations, unless the database is at the head revision already
+python migrations/check.py
+migration_status=$?
+if [ "$migration_status" -eq 2 ]; then
+  # The database records a revision generated on boot by an older release, it has to be stamped by hand
+  exit 1
+elif [ "$migration_status" -ne 0 ]; then
+  alembic -c alembic.ini upgrade head
+fi
+# With the in-process task backend the app workers run the tasks, so no Celery worker is needed
+if [ "${CELERY_TASK_BACKEND:-celery}" = "inprocess" ]; then
+  exec gunicorn main:app --worker-class uvicorn.workers.UvicornWorker --bind=0.0.0.0:8080
 fi
-# Upgrade the database to the latest migration
-alembic -c alembic.ini upgrade head
 # Start the Gunicorn server in the background
 gunicorn main:app --worker-class uvicorn.workers.UvicornWorker --bind=0.0.0.0:8080 &
-# Start the Celery worker
-celery -A tasks_celery.celery_app worker --loglevel=info
\ No newline at end of file
+# Start the Celery worker, with the beat scheduling the periodic tasks
+celery -A tasks_celery.celery_app worker -B --loglevel=info
\ No newline at end of file
@@ -0,0 +1,70 @@
+"""
+Checks whether the database is at the head revision of the committed migrations.
+
+Exits with 0 when it is, so the container can skip Alembic, and with 1 when the 
+migrations have to be applied. The revision is read with a single query, 
+without loading the Alembic environment or the models.
+
+Exits with 2 when the database records a revision that is not committed, such 
+as the ones generated on boot by older releases. Such a database has to be 
+stamped first, see "Upgrading an existing database" in the README.
+
+Usage:
+    python migrations/check.py
+"""
+import asyncio
+import sys
+from pathlib import Path
+
+import asyncpg
+from alembic.config import Config
+from alembic.script import ScriptDirectory
+from alembic.util import CommandError
+
+from config import settings
+
+
+ALEMBIC_INI_PATH = Path(__file__).resolve().parent.parent / "alembic.ini"
+
+
+def get_script_directory() -> ScriptDirectory:
+    """Returns the directory of the committed migrations."""
+    config = Config(str(ALEMBIC_INI_PATH))
+    config.set_main_option("script_location", str(ALEMBIC_INI_PATH.parent / "migrations"))
+    return ScriptDirectory.from_config(config)
+
+
+def is_committed(script_directory: ScriptDirectory, revision: str) -> bool:
+    """Returns whether the revision is one of the committed migrations."""
+    try:
+        return script_directory.get_revision(revision) is not None
+    except CommandError:
+        return False
+
+
+async def get_current_revisions() -> set[str]:
+    """Returns the revisions recorded in the database, empty if it was never migrated."""
+    db_settings = settings.test_database if settings.test.IS_TESTING else settings.database
+    connection = await asyncpg.connect(db_settings.DATABASE_URL_ASYNC.replace("postgresql+asyncpg://", "postgresql://"))
+    try:
+        rows = await connection.fetch("SELECT version_num FROM alembic_version")
+    except asyncpg.UndefinedTableError:
+        return set()
+    finally:
+        await connection.close()
+    return {row["version_num"] for row in rows}
+
+
+if __name__ == "__main__":
+    script_directory = get_script_directory()
+    heads = set(script_directory.get_heads())
+    current = asyncio.run(get_current_revisions())
+    unknown = {revision for revision in current - heads if not is_committed(script_directory, revision)}
+    if unknown:
+        print(f"Database is at {', '.join(sorted(unknown))}, which is not a committed revision, stamp it first")
+        sys.exit(2)
+    if current == heads:
+        print(f"Database is up to date at {', '.join(sorted(heads))}")
+        sys.exit(0)
+    print(f"Database is at {', '.join(sorted(current)) or 'no revision'}, head is {', '.join(sorted(heads))}")
+    sys.exit(1)
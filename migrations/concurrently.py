@@ -0,0 +1,39 @@
+from alembic import op
+
+
+def create_index_concurrently(index_name: str, table_name: str, columns: list[str], **kwargs):
+    """
+    Builds an index with `CREATE INDEX CONCURRENTLY`, so the table stays writable during the build.
+
+    Concurrent builds cannot run inside a transaction, so the index is built in 
+    an autocommit block. A build that failed halfway leaves an invalid index 
+    behind, which is dropped first, so the migration can simply be run again.
+
+    Args:
+        index_name (str): The name of the index.
+        table_name (str): The name of the indexed table.
+        columns (list[str]): The indexed columns.
+        **kwargs: Extra options for `op.create_index`, such as `postgresql_using`.
+    """
+    with op.get_context().autocommit_block():
+        invalid = op.get_bind().exec_driver_sql(
+            "SELECT 1 FROM pg_index JOIN pg_class ON pg_class.oid = pg_index.indexrelid "
+            f"WHERE pg_class.relname = '{index_name}' AND NOT pg_index.indisvalid"
+        ).first()
+        if invalid:
+            op.drop_index(index_name, table_name=table_name, postgresql_concurrently=True)
+        op.create_index(
+            index_name, table_name, columns, postgresql_concurrently=True, if_not_exists=True, **kwargs
+        )
+
+
+def drop_index_concurrently(index_name: str, table_name: str):
+    """
+    Drops an index with `DROP INDEX CONCURRENTLY`, without blocking the queries on the table.
+
+    Args:
+        index_name (str): The name of the index.
+        table_name (str): The name of the indexed table.
+    """
+    with op.get_context().autocommit_block():
+        op.drop_index(index_name, table_name=table_name, postgresql_concurrently=True, if_exists=True)
@@ -50,7 +50,11 @@ else:
 # from myapp import mymodel
 # target_metadata = mymodel.Base.metadata
 from user.models import User
-from advertisement.models import Advertisement
+from advertisement.models import (
+    Advertisement, AdvertisementTombstone, AdvertisementViewStats, AdvertisementViewStatsDaily
+)
+from outbox.models import OutboxMessage
+from fixtures.models import FixtureLoad
 target_metadata = Base.metadata
 
 # other values from the config, defined by the needs of env.py,
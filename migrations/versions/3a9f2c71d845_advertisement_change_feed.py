@@ -0,0 +1,76 @@
+"""Advertisement change feed
+
+Revision ID: 3a9f2c71d845
+Revises: 7c1d9e4a2b60
+Create Date: 2026-10-19 02:41:37.509126
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from migrations.concurrently import create_index_concurrently, drop_index_concurrently
+
+# revision identifiers, used by Alembic.
+revision: str = '3a9f2c71d845'
+down_revision: Union[str, None] = '7c1d9e4a2b60'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # A stable default is stored once in the catalog, so existing rows are not rewritten
+    op.add_column('advertisement', sa.Column(
+        'created_at', sa.DateTime(), server_default=sa.text("TIMEZONE('utc', now())"), nullable=False
+    ))
+    op.add_column('advertisement', sa.Column(
+        'updated_at', sa.DateTime(), server_default=sa.text("TIMEZONE('utc', now())"), nullable=False
+    ))
+    op.create_table('advertisement_tombstone',
+    sa.Column('advertisement_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('deleted_at', sa.DateTime(), server_default=sa.text("TIMEZONE('utc', now())"), nullable=False),
+    sa.PrimaryKeyConstraint('advertisement_id')
+    )
+    op.create_index(
+        'ix_advertisement_tombstone_deleted_at_id', 'advertisement_tombstone', ['deleted_at', 'advertisement_id']
+    )
+    op.execute("""
+        CREATE OR REPLACE FUNCTION advertisement_touch() RETURNS trigger AS $$
+        BEGIN
+            NEW.updated_at := TIMEZONE('utc', now());
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER advertisement_touch BEFORE UPDATE ON advertisement
+        FOR EACH ROW EXECUTE FUNCTION advertisement_touch()
+    """)
+    op.execute("""
+        CREATE OR REPLACE FUNCTION advertisement_tombstone() RETURNS trigger AS $$
+        BEGIN
+            INSERT INTO advertisement_tombstone (advertisement_id, deleted_at)
+            VALUES (OLD.id, TIMEZONE('utc', now()))
+            ON CONFLICT (advertisement_id) DO UPDATE SET deleted_at = EXCLUDED.deleted_at;
+            RETURN OLD;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER advertisement_tombstone AFTER DELETE ON advertisement
+        FOR EACH ROW EXECUTE FUNCTION advertisement_tombstone()
+    """)
+    create_index_concurrently('ix_advertisement_updated_at_id', 'advertisement', ['updated_at', 'id'])
+
+
+def downgrade() -> None:
+    drop_index_concurrently('ix_advertisement_updated_at_id', 'advertisement')
+    op.execute("DROP TRIGGER IF EXISTS advertisement_tombstone ON advertisement")
+    op.execute("DROP FUNCTION IF EXISTS advertisement_tombstone()")
+    op.execute("DROP TRIGGER IF EXISTS advertisement_touch ON advertisement")
+    op.execute("DROP FUNCTION IF EXISTS advertisement_touch()")
+    op.drop_index('ix_advertisement_tombstone_deleted_at_id', table_name='advertisement_tombstone')
+    op.drop_table('advertisement_tombstone')
+    op.drop_column('advertisement', 'updated_at')
+    op.drop_column('advertisement', 'created_at')
@@ -0,0 +1,35 @@
+"""Search and sort indexes
+
+Revision ID: 7c1d9e4a2b60
+Revises: 9670eb3fe0f5
+Create Date: 2026-10-19 00:20:12.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+from migrations.concurrently import create_index_concurrently, drop_index_concurrently
+
+# revision identifiers, used by Alembic.
+revision: str = '7c1d9e4a2b60'
+down_revision: Union[str, None] = '9670eb3fe0f5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    # Built online, so large tables stay writable while the migration runs
+    create_index_concurrently('ix_advertisement_position', 'advertisement', ['position'])
+    create_index_concurrently(
+        'ix_advertisement_title_trgm', 'advertisement', ['title'],
+        postgresql_using='gin', postgresql_ops={'title': 'gin_trgm_ops'},
+    )
+    create_index_concurrently('ix_user_verification_token', 'user', ['verification_token'])
+
+
+def downgrade() -> None:
+    drop_index_concurrently('ix_user_verification_token', 'user')
+    drop_index_concurrently('ix_advertisement_title_trgm', 'advertisement')
+    drop_index_concurrently('ix_advertisement_position', 'advertisement')
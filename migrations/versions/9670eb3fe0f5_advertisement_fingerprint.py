@@ -0,0 +1,36 @@
+"""Advertisement fingerprint
+
+Revision ID: 9670eb3fe0f5
+Revises: 3fe557fa820f
+Create Date: 2026-10-19 00:07:15.960384
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '9670eb3fe0f5'
+down_revision: Union[str, None] = '3fe557fa820f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('advertisement', sa.Column(
+        'fingerprint', sa.String(length=32),
+        sa.Computed('md5(lower(btrim(author)) || chr(31) || lower(btrim(title)))', persisted=True), nullable=False,
+    ))
+    # Keep the first of the advertisements sharing a fingerprint, the table stays locked by the column rewrite
+    op.execute("""
+        DELETE FROM advertisement AS duplicate
+        USING advertisement AS original
+        WHERE duplicate.fingerprint = original.fingerprint AND duplicate.id > original.id
+    """)
+    op.create_index('ux_advertisement_fingerprint', 'advertisement', ['fingerprint'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ux_advertisement_fingerprint', table_name='advertisement')
+    op.drop_column('advertisement', 'fingerprint')
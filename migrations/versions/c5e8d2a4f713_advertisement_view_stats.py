@@ -0,0 +1,41 @@
+"""Advertisement view stats
+
+Revision ID: c5e8d2a4f713
+Revises: 3a9f2c71d845
+Create Date: 2026-10-19 04:12:53.871402
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5e8d2a4f713'
+down_revision: Union[str, None] = '3a9f2c71d845'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('advertisement_view_stats',
+    sa.Column('advertisement_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('hour', sa.DateTime(), nullable=False),
+    sa.Column('views', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('advertisement_id', 'hour')
+    )
+    op.create_index('ix_advertisement_view_stats_hour', 'advertisement_view_stats', ['hour'])
+    op.create_table('advertisement_view_stats_daily',
+    sa.Column('advertisement_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('views', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('advertisement_id', 'day')
+    )
+    op.create_index('ix_advertisement_view_stats_daily_day', 'advertisement_view_stats_daily', ['day'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_advertisement_view_stats_daily_day', table_name='advertisement_view_stats_daily')
+    op.drop_table('advertisement_view_stats_daily')
+    op.drop_index('ix_advertisement_view_stats_hour', table_name='advertisement_view_stats')
+    op.drop_table('advertisement_view_stats')
@@ -0,0 +1,204 @@
+import uuid
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, ClassVar, Optional
+
+from sqladmin import ModelView
+from sqladmin.pagination import Pagination, PageControl
+from sqlalchemy import Select, and_, func, or_, select, text
+from starlette.datastructures import URL
+from starlette.exceptions import HTTPException
+from starlette.requests import Request
+from starlette.responses import RedirectResponse
+
+from cursors import encode_cursor, decode_cursor
+
+
+@dataclass
+class KeysetPagination(Pagination):
+    """
+    Pagination that links to the neighbouring pages with keyset cursors instead of offsets.
+
+    The page number is only displayed, while the `after` and `before` cursors
+    select the rows, so every page costs the same whatever its depth.
+    """
+    next_cursor: Optional[str] = None
+    previous_cursor: Optional[str] = None
+
+    @property
+    def has_previous(self) -> bool:
+        return self.page > 1 and self.previous_cursor is not None
+
+    @property
+    def has_next(self) -> bool:
+        return self.next_cursor is not None
+
+    def add_pagination_urls(self, base_url: URL) -> None:
+        current_url = str(base_url)
+        base_url = base_url.remove_query_params(["page", "after", "before"])
+        if self.has_previous:
+            url = base_url.include_query_params(page=self.page - 1, before=self.previous_cursor)
+            self.page_controls.append(PageControl(number=self.page - 1, url=str(url)))
+        self.page_controls.append(PageControl(number=self.page, url=current_url))
+        if self.has_next:
+            url = base_url.include_query_params(page=self.page + 1, after=self.next_cursor)
+            self.page_controls.append(PageControl(number=self.page + 1, url=str(url)))
+
+
+class ScalableModelView(ModelView):
+    """
+    Model view whose list page stays fast on large tables.
+
+    - The total is estimated from `pg_class.reltuples` once the table holds more
+      than `estimated_count_threshold` rows, and search results are counted up
+      to that threshold only.
+    - Pages are navigated with keyset cursors on the sort column and the
+      primary key, rather than with `OFFSET`.
+    - Sorting is limited to `column_sortable_list`, which should only hold
+      indexed columns, and searching to `column_searchable_list`, which should
+      only hold columns backed by a trigram or full-text index.
+    """
+    estimated_count_threshold: ClassVar[int] = 100_000
+
+    def get_selected_pks(self, request: Request) -> list:
+        """
+        Returns the primary keys of the rows selected for an action.
+
+        Raises:
+            HTTPException: If a primary key is malformed, a 400 error is raised.
+        """
+        pk_column = self.pk_columns[0]
+        params = request.query_params.get("pks", "")
+        try:
+            return [pk_column.type.python_type(pk) for pk in params.split(",") if pk]
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid primary key")
+
+    def redirect_to_list(self, request: Request) -> RedirectResponse:
+        """Redirects back to the list page an action was started from."""
+        return RedirectResponse(
+            request.headers.get("referer") or request.url_for("admin:list", identity=self.identity),
+            status_code=302,
+        )
+
+    async def _scalar(self, stmt: Any) -> Any:
+        """Runs a statement returning a single value."""
+        async with self.session_maker() as session:
+            return await session.scalar(stmt)
+
+    async def count(self, request: Request, stmt: Optional[Select] = None) -> int:
+        if stmt is not None:
+            # Search results are only counted up to the threshold
+            capped = select(func.count()).select_from(stmt.limit(self.estimated_count_threshold).subquery())
+            return await self._scalar(capped)
+
+        estimate = await self._scalar(
+            text("SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(quote_ident(:table))").bindparams(
+                table=self.model.__table__.name
+            )
+        )
+        # Tables that were never analyzed report -1
+        if estimate is not None and estimate >= self.estimated_count_threshold:
+            return estimate
+        return await self._scalar(self.count_query(request))
+
+    def _get_sort(self, request: Request) -> tuple[str, bool]:
+        """Returns the requested sort column if it is sortable, the default sort otherwise."""
+        sort_by = request.query_params.get("sortBy")
+        if sort_by in self._sort_fields:
+            return sort_by, request.query_params.get("sort", "asc") == "desc"
+        sort_field, is_desc = self._get_default_sort()[0]
+        return self._get_prop_name(sort_field), is_desc
+
+    def sort_query(self, stmt: Select, request: Request) -> Select:
+        sort_by, is_desc = self._get_sort(request)
+        sort_column = getattr(self.model, sort_by)
+        pk_column = getattr(self.model, self.pk_columns[0].key)
+        if is_desc:
+            return stmt.order_by(sort_column.desc(), pk_column.desc())
+        return stmt.order_by(sort_column.asc(), pk_column.asc())
+
+    def search_query(self, stmt: Select, term: str) -> Select:
+        # Columns are matched as they are, so their trigram indexes can serve the search
+        return stmt.where(or_(*(getattr(self.model, field).ilike(f"%{term}%") for field in self._search_fields)))
+
+    def _load_value(self, column: Any, value: Any) -> Any:
+        """Restores a sort key value decoded from a cursor to the type of its column."""
+        if value is None:
+            return None
+        python_type = column.type.python_type
+        if python_type is datetime:
+            return datetime.fromisoformat(value)
+        if python_type is uuid.UUID:
+            return uuid.UUID(value)
+        return value
+
+    def _keyset_condition(self, sort_column: Any, pk_column: Any, cursor: list, forward: bool) -> Any:
+        """
+        Builds the condition selecting the rows after the cursor in the order of the list.
+
+        Nulls come last in ascending order and first in descending order, as in Postgres.
+
+        Args:
+            sort_column: The sort column.
+            pk_column: The primary key column breaking ties.
+            cursor (list): The sort column value and the primary key of the boundary row.
+            forward (bool): Whether the rows after the boundary come after it in the sort column order.
+
+        Returns:
+            The filtering condition.
+        """
+        value, pk = self._load_value(sort_column, cursor[0]), self._load_value(pk_column, cursor[1])
+        after = (lambda column, bound: column > bound) if forward else (lambda column, bound: column < bound)
+        if value is None:
+            tie = and_(sort_column.is_(None), after(pk_column, pk))
+            return tie if forward else or_(tie, sort_column.is_not(None))
+        tie = and_(sort_column == value, after(pk_column, pk))
+        condition = or_(after(sort_column, value), tie)
+        return or_(condition, sort_column.is_(None)) if forward else condition
+
+    async def list(self, request: Request) -> Pagination:
+        page = self.validate_page_number(request.query_params.get("page"), 1)
+        page_size = self.validate_page_number(request.query_params.get("pageSize"), 0)
+        page_size = min(page_size or self.page_size, max(self.page_size_options))
+        search = request.query_params.get("search", None)
+        after = request.query_params.get("after")
+        before = request.query_params.get("before")
+
+        sort_by, is_desc = self._get_sort(request)
+        sort_column = getattr(self.model, sort_by)
+        pk_column = getattr(self.model, self.pk_columns[0].key)
+
+        stmt = self.list_query(request)
+        if search:
+            stmt = self.search_query(stmt=stmt, term=search)
+        count = await self.count(request, stmt if search else None)
+
+        if before:
+            # Walk backwards from the first row of the next page, then restore the order
+            condition = self._keyset_condition(sort_column, pk_column, decode_cursor(before), forward=is_desc)
+            order = (sort_column.asc(), pk_column.asc()) if is_desc else (sort_column.desc(), pk_column.desc())
+            stmt = stmt.where(condition).order_by(*order).limit(page_size + 1)
+            rows = list(reversed(await self._run_query(stmt)))
+            has_more_before, rows = len(rows) > page_size, rows[-page_size:]
+            has_more_after = True
+        else:
+            stmt = self.sort_query(stmt, request)
+            if after:
+                stmt = stmt.where(self._keyset_condition(sort_column, pk_column, decode_cursor(after), forward=not is_desc))
+            elif page > 1:
+                # Plain page numbers, such as bookmarked links, fall back to an offset
+                stmt = stmt.offset((page - 1) * page_size)
+            rows = await self._run_query(stmt.limit(page_size + 1))
+            has_more_after, rows = len(rows) > page_size, rows[:page_size]
+            has_more_before = page > 1
+
+        cursor_of = lambda row: encode_cursor([getattr(row, sort_by), getattr(row, pk_column.key)])
+        return KeysetPagination(
+            rows=rows,
+            page=page,
+            page_size=page_size,
+            count=count,
+            next_cursor=cursor_of(rows[-1]) if rows and has_more_after else None,
+            previous_cursor=cursor_of(rows[0]) if rows and has_more_before else None,
+        )
@@ -1,9 +1,13 @@
-from sqladmin import ModelView
+from sqladmin import action
+from starlette.requests import Request
+from starlette.responses import RedirectResponse
 
+from admin.views import ScalableModelView
 from .models import Advertisement
+from .service import delete_advertisements, move_advertisements_to_top
 
 
-class AdvertisementAdmin(ModelView, model=Advertisement):
+class AdvertisementAdmin(ScalableModelView, model=Advertisement):
     """Admin interface for managing advertisements."""
     name = "Advertisement"
     name_plural = "Advertisements"
@@ -14,6 +18,9 @@ class AdvertisementAdmin(ModelView, model=Advertisement):
         "views_count",
         "position"
     ]
+    # Only indexed columns, so sorting and searching stay fast on large tables
+    column_sortable_list = ["id", "position"]
+    column_searchable_list = ["title"]
     column_labels = {
         "id": "ID",
         "title": "Title",
@@ -21,3 +28,26 @@ class AdvertisementAdmin(ModelView, model=Advertisement):
         "views_count": "Views Count",
         "position": "Position"
     }
+    # The fingerprint and the timestamps are maintained by the database
+    form_excluded_columns = ["fingerprint", "created_at", "updated_at"]
+
+    @action(
+        name="bulk_delete",
+        label="Delete selected",
+        confirmation_message="Delete the selected advertisements?",
+        add_in_detail=False,
+    )
+    async def bulk_delete(self, request: Request) -> RedirectResponse:
+        """Deletes the selected advertisements with one statement."""
+        await delete_advertisements(self.get_selected_pks(request))
+        return self.redirect_to_list(request)
+
+    @action(
+        name="move_to_top",
+        label="Move to top",
+        confirmation_message="Move the selected advertisements to the top of the list?",
+    )
+    async def move_to_top(self, request: Request) -> RedirectResponse:
+        """Gives the selected advertisements the first positions with one statement."""
+        await move_advertisements_to_top(self.get_selected_pks(request))
+        return self.redirect_to_list(request)
@@ -0,0 +1,252 @@
+import asyncio
+import json
+from contextvars import Context
+from typing import AsyncIterator
+
+import asyncpg
+from fastapi import HTTPException
+from sqlalchemy import Text, case, cast, func, literal, select
+
+from config import settings
+from db import engine
+from logger import app_logger as logger
+from monitoring.metrics import metrics_registry, MetricFamily
+from advertisement.models import Advertisement
+
+
+advertisement_settings = settings.advertisement
+
+ADVERTISEMENT_CHANNEL = "advertisement_events"
+# Postgres rejects notification payloads of 8000 bytes or more
+MAX_PAYLOAD_BYTES = 7999
+
+
+def advertisement_notification(event: str):
+    """
+    Builds a `pg_notify` call announcing the event for the advertisement row of a statement.
+
+    Used in the RETURNING clause of the statement that changes the row, so the
+    notification costs no extra round trip and is only sent if the transaction
+    commits. Rows too large for a notification are announced without their data.
+
+    Args:
+        event (str): The event name, such as "create", "update" or "delete".
+
+    Returns:
+        The SQL expression sending the notification.
+    """
+    data = func.json_build_object(
+        "id", Advertisement.id,
+        "title", Advertisement.title,
+        "author", Advertisement.author,
+        "views_count", Advertisement.views_count,
+        "position", Advertisement.position,
+    )
+    payload = cast(func.json_build_object("event", event, "id", Advertisement.id, "data", data), Text)
+    short_payload = cast(func.json_build_object("event", event, "id", Advertisement.id), Text)
+    return func.pg_notify(
+        ADVERTISEMENT_CHANNEL,
+        case((func.octet_length(payload) <= MAX_PAYLOAD_BYTES, payload), else_=short_payload),
+    )
+
+
+# Sent after bulk changes, which subscribers pick up from the change feed instead of row by row
+RESYNC_NOTIFICATION = select(func.pg_notify(ADVERTISEMENT_CHANNEL, literal(json.dumps({"event": "resync"}))))
+
+
+def format_event(event: str, data: str) -> str:
+    """Formats an event as a server-sent events message."""
+    return f"event: {event}\ndata: {data}\n\n"
+
+
+RESYNC_MESSAGE = format_event("resync", json.dumps({"event": "resync"}))
+
+
+class Subscription:
+    """
+    Buffer of the events waiting to be streamed to one client.
+
+    The buffer is bounded. When a client reads too slowly and the buffer fills
+    up, the buffered events are dropped and replaced by a single resync event,
+    which tells the client to catch up from the change feed.
+
+    Args:
+        queue_size (int): The maximum number of buffered events.
+    """
+
+    def __init__(self, queue_size: int):
+        self.queue: asyncio.Queue[str | None] = asyncio.Queue(maxsize=queue_size)
+        self.resync_count = 0
+
+    def push(self, message: str):
+        """Buffers the message, or replaces the buffer with a resync event if it is full."""
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESYNC_MESSAGE)
+            self.resync_count += 1
+
+    def close(self):
+        """Ends the stream of the subscription."""
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(None)
+
+    async def messages(self, heartbeat: float) -> AsyncIterator[str]:
+        """
+        Yields the buffered messages until the subscription is closed.
+
+        Args:
+            heartbeat (float): The idle time in seconds after which a comment is sent to keep the connection open.
+        """
+        yield format_event("ready", json.dumps({"event": "ready"}))
+        while True:
+            try:
+                message = await asyncio.wait_for(self.queue.get(), timeout=heartbeat)
+            except asyncio.TimeoutError:
+                message = ": ping\n\n"
+            if message is None:
+                return
+            yield message
+
+
+class AdvertisementEvents:
+    """
+    Fans the advertisement notifications out to the subscribers of this process.
+
+    A single connection per process listens to the notification channel, so
+    the number of database connections does not grow with the number of
+    clients. The connection is opened on the first subscription and reopened
+    when it breaks, after which every subscriber is told to resync, since
+    notifications sent in the meantime are lost.
+
+    Args:
+        queue_size (int): The maximum number of events buffered per subscriber.
+        heartbeat (float): The interval in seconds for checking the listening connection.
+        connect_timeout (float): The time in seconds a subscriber waits for the connection.
+        reconnect_interval (float): The delay in seconds before reopening a broken connection.
+    """
+
+    def __init__(self, queue_size: int, heartbeat: float, connect_timeout: float, reconnect_interval: float):
+        self.queue_size = queue_size
+        self.heartbeat = heartbeat
+        self.connect_timeout = connect_timeout
+        self.reconnect_interval = reconnect_interval
+        self.subscriptions: set[Subscription] = set()
+        self.event_count = 0
+        self.resync_count = 0
+        self._task: asyncio.Task | None = None
+        self._listening = asyncio.Event()
+
+    def start(self):
+        """Starts listening on the running event loop."""
+        if self._task is None:
+            self._task = asyncio.create_task(self.run(), context=Context())
+
+    async def stop(self):
+        """Stops listening and ends the streams of all subscribers."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        # A new event, since the old one may be bound to a loop that is closed before the next start
+        self._listening = asyncio.Event()
+        for subscription in self.subscriptions:
+            subscription.close()
+        self.subscriptions.clear()
+
+    async def subscribe(self) -> Subscription:
+        """
+        Creates a subscription that receives the events sent from now on.
+
+        Raises:
+            HTTPException: If the listening connection cannot be opened in time, a 503 error is raised.
+
+        Returns:
+            Subscription: The subscription buffering the events.
+        """
+        self.start()
+        try:
+            await asyncio.wait_for(self._listening.wait(), timeout=self.connect_timeout)
+        except asyncio.TimeoutError:
+            raise HTTPException(status_code=503, detail="Advertisement events are unavailable")
+        subscription = Subscription(self.queue_size)
+        self.subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        """Stops delivering events to the subscription."""
+        self.subscriptions.discard(subscription)
+        self.resync_count += subscription.resync_count
+
+    def broadcast(self, message: str):
+        """Buffers the message for every subscriber."""
+        for subscription in self.subscriptions:
+            subscription.push(message)
+
+    def _on_notification(self, connection: asyncpg.Connection, pid: int, channel: str, payload: str):
+        """Formats a notification once and hands it to every subscriber."""
+        try:
+            event = json.loads(payload)["event"]
+        except (ValueError, KeyError, TypeError):
+            logger.warning(f"Ignoring malformed advertisement notification {payload!r}")
+            return
+        self.event_count += 1
+        self.broadcast(format_event(event, payload))
+
+    async def run(self):
+        """Listens to the notification channel until cancelled, reconnecting when the connection breaks."""
+        dsn = engine.url.set(drivername="postgresql").render_as_string(hide_password=False)
+        while True:
+            connection = None
+            try:
+                connection = await asyncpg.connect(dsn, timeout=self.connect_timeout)
+                closed = asyncio.Event()
+                connection.add_termination_listener(lambda _: closed.set())
+                await connection.add_listener(ADVERTISEMENT_CHANNEL, self._on_notification)
+                self._listening.set()
+                logger.info("Listening to advertisement events")
+                while not closed.is_set():
+                    try:
+                        await asyncio.wait_for(closed.wait(), timeout=self.heartbeat)
+                    except asyncio.TimeoutError:
+                        # A silently dropped connection is only noticed on the next query
+                        await connection.execute("SELECT 1", timeout=self.connect_timeout)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Advertisement events connection lost: {e}")
+            finally:
+                self._listening.clear()
+                if connection is not None:
+                    connection.terminate()
+            self.broadcast(RESYNC_MESSAGE)
+            await asyncio.sleep(self.reconnect_interval)
+
+
+advertisement_events = AdvertisementEvents(
+    queue_size=advertisement_settings.STREAM_QUEUE_SIZE,
+    heartbeat=advertisement_settings.STREAM_HEARTBEAT_SECONDS,
+    connect_timeout=advertisement_settings.STREAM_CONNECT_TIMEOUT,
+    reconnect_interval=advertisement_settings.STREAM_RECONNECT_SECONDS,
+)
+
+
+def collect_stream_metrics() -> list[MetricFamily]:
+    """Collects the statistics of the advertisement event stream."""
+    resyncs = advertisement_events.resync_count + sum(
+        subscription.resync_count for subscription in advertisement_events.subscriptions
+    )
+    return [
+        ("advertisement_stream_subscribers", "gauge", "Number of clients streaming advertisement events.",
+         [({}, len(advertisement_events.subscriptions))]),
+        ("advertisement_stream_events_total", "counter", "Number of advertisement notifications received.",
+         [({}, advertisement_events.event_count)]),
+        ("advertisement_stream_resyncs_total", "counter", "Number of times a slow client was told to resync.",
+         [({}, resyncs)]),
+    ]
+
+
+metrics_registry.add_collector(collect_stream_metrics)
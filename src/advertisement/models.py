@@ -1,4 +1,6 @@
-from sqlalchemy import String, Integer
+from datetime import date, datetime
+
+from sqlalchemy import DDL, BigInteger, String, Integer, Index, Computed, event, text
 from sqlalchemy.orm import Mapped, mapped_column
 
 from base import Base
@@ -7,24 +9,113 @@ from base import Base
 class Advertisement(Base):
     """Model representing an advertisement in the system."""
     __tablename__ = "advertisement"
-    __table_args__ = {'extend_existing': True}
+    __table_args__ = (
+        # Advertisements are unique by normalized author and title
+        Index("ux_advertisement_fingerprint", "fingerprint", unique=True),
+        # Serves substring searches on the title, requires the pg_trgm extension
+        Index("ix_advertisement_title_trgm", "title", postgresql_using="gin", postgresql_ops={"title": "gin_trgm_ops"}),
+        # Serves the change feed, which reads rows in (updated_at, id) order
+        Index("ix_advertisement_updated_at_id", "updated_at", "id"),
+        {'extend_existing': True},
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
 
     title: Mapped[str] = mapped_column(String(length=100))
     author: Mapped[str] = mapped_column(String)
-    views_count: Mapped[int] = mapped_column(Integer, default=0)  
-    position: Mapped[int] = mapped_column(Integer, nullable=True)
-
-    
-    def __hash__(self):
-        return hash((self.author, self.title))
-
-    def __eq__(self, other):
-        return isinstance(other, Advertisement) and self.author == other.author and self.title == other.title
+    views_count: Mapped[int] = mapped_column(Integer, default=0)
+    position: Mapped[int] = mapped_column(Integer, nullable=True, index=True)
+    fingerprint: Mapped[str] = mapped_column(
+        String(32), Computed("md5(lower(btrim(author)) || chr(31) || lower(btrim(title)))", persisted=True)
+    )
+    # Maintained by database triggers, so bulk statements and the admin panel keep them current
+    created_at: Mapped[datetime] = mapped_column(server_default=text("TIMEZONE('utc', now())"))
+    updated_at: Mapped[datetime] = mapped_column(server_default=text("TIMEZONE('utc', now())"))
 
     def __doc__(self):
         return f"Advertisement({self.id}) {self.title} | Author ID: {self.author_id}"
 
     def __str__(self):
-        return f"({self.id}) {self.title} | Author ID: {self.author_id}"
\ No newline at end of file
+        return f"({self.id}) {self.title} | Author ID: {self.author_id}"
+
+
+class AdvertisementTombstone(Base):
+    """Model recording a deleted advertisement, so the change feed can report the deletion."""
+    __tablename__ = "advertisement_tombstone"
+    __table_args__ = (
+        Index("ix_advertisement_tombstone_deleted_at_id", "deleted_at", "advertisement_id"),
+        {'extend_existing': True},
+    )
+
+    advertisement_id: Mapped[int] = mapped_column(primary_key=True, autoincrement=False)
+    deleted_at: Mapped[datetime] = mapped_column(server_default=text("TIMEZONE('utc', now())"))
+
+    def __str__(self):
+        return f"({self.advertisement_id}) deleted at {self.deleted_at}"
+
+
+class AdvertisementViewStats(Base):
+    """Model counting the views of an advertisement in one hour."""
+    __tablename__ = "advertisement_view_stats"
+    __table_args__ = (
+        # Serves the daily rollup, which reads the recent hours of every advertisement
+        Index("ix_advertisement_view_stats_hour", "hour"),
+        {'extend_existing': True},
+    )
+
+    advertisement_id: Mapped[int] = mapped_column(primary_key=True, autoincrement=False)
+    hour: Mapped[datetime] = mapped_column(primary_key=True)
+    views: Mapped[int] = mapped_column(BigInteger, default=0)
+
+    def __str__(self):
+        return f"({self.advertisement_id}) {self.hour}: {self.views} views"
+
+
+class AdvertisementViewStatsDaily(Base):
+    """Model counting the views of an advertisement in one day, rolled up from the hourly counts."""
+    __tablename__ = "advertisement_view_stats_daily"
+    __table_args__ = (
+        # Serves finding the last rolled up day
+        Index("ix_advertisement_view_stats_daily_day", "day"),
+        {'extend_existing': True},
+    )
+
+    advertisement_id: Mapped[int] = mapped_column(primary_key=True, autoincrement=False)
+    day: Mapped[date] = mapped_column(primary_key=True)
+    views: Mapped[int] = mapped_column(BigInteger, default=0)
+
+    def __str__(self):
+        return f"({self.advertisement_id}) {self.day}: {self.views} views"
+
+
+# Stamps every update and records every delete, whichever statement made it
+ADVERTISEMENT_TRIGGERS = [
+    DDL("""
+        CREATE OR REPLACE FUNCTION advertisement_touch() RETURNS trigger AS $$
+        BEGIN
+            NEW.updated_at := TIMEZONE('utc', now());
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql
+    """),
+    DDL("""
+        CREATE TRIGGER advertisement_touch BEFORE UPDATE ON advertisement
+        FOR EACH ROW EXECUTE FUNCTION advertisement_touch()
+    """),
+    DDL("""
+        CREATE OR REPLACE FUNCTION advertisement_tombstone() RETURNS trigger AS $$
+        BEGIN
+            INSERT INTO advertisement_tombstone (advertisement_id, deleted_at)
+            VALUES (OLD.id, TIMEZONE('utc', now()))
+            ON CONFLICT (advertisement_id) DO UPDATE SET deleted_at = EXCLUDED.deleted_at;
+            RETURN OLD;
+        END;
+        $$ LANGUAGE plpgsql
+    """),
+    DDL("""
+        CREATE TRIGGER advertisement_tombstone AFTER DELETE ON advertisement
+        FOR EACH ROW EXECUTE FUNCTION advertisement_tombstone()
+    """),
+]
+for trigger in ADVERTISEMENT_TRIGGERS:
+    event.listen(Advertisement.__table__, "after_create", trigger)
@@ -1,41 +1,218 @@
-from fastapi import APIRouter, HTTPException, Depends
+from datetime import datetime, timedelta, timezone
+
+from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi.responses import JSONResponse, StreamingResponse
 from starlette import status
 
 from logger import app_logger as logger
 from auth.base_config import current_user
 from user.models import User
-from advertisement.schemas import AdvertisementCreate, AdvertisementRead, AdvertisementUpdate
+from monitoring.timing import TimedRoute
+from config import settings
+from advertisement.schemas import (
+    AdvertisementCreate, AdvertisementRead, AdvertisementUpdate, AdvertisementChanges,
+    AdvertisementBatch, AdvertisementBatchRequest, ADVERTISEMENT_ID_MAX,
+    AdvertisementViewStatsRead, ViewStatsGranularity,
+)
+from advertisement.events import advertisement_events, Subscription
+from advertisement.view_stats import view_buffer
 from advertisement.service import (
-    get_advertisements_all, get_advertisement_by_id, 
+    get_advertisements_all, get_advertisement_by_id, get_advertisement_changes, get_advertisement_view_stats,
+    get_advertisements_fields, get_advertisement_fields_by_id, get_advertisements_by_ids,
     create_advertisement, delete_advertisement, update_advertisement
 )
 
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
+advertisement_settings = settings.advertisement
+
+
+def advertisement_fields(
+    fields: str | None = Query(default=None, description="Comma-separated fields to return, all by default.")
+) -> list[str] | None:
+    """
+    Parses the fields requested with `?fields=`.
+
+    Raises:
+        HTTPException: If a field is unknown, a 400 error is raised.
+
+    Returns:
+        list[str] | None: The requested fields without duplicates, or None to return every field.
+    """
+    if fields is None:
+        return None
+    requested = list(dict.fromkeys(field.strip() for field in fields.split(",") if field.strip()))
+    unknown = [field for field in requested if field not in AdvertisementRead.model_fields]
+    if unknown or not requested:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    return requested
 
 
 @router.get("/", response_model=list[AdvertisementRead])
-async def read_advertisements(user: User = Depends(current_user)) -> list[AdvertisementRead]:
+async def read_advertisements(
+    fields: list[str] | None = Depends(advertisement_fields), user: User = Depends(current_user)
+) -> list[AdvertisementRead]:
     """
     Asynchronously retrieves all advertisements.
 
+    With `fields`, only those columns are selected and only those keys are returned.
+
     Args:
+        fields (list[str] | None): The fields to return, or None for every field.
         user (User): The current user, required for authorization.
 
     Returns:
         list[AdvertisementRead]: A list of all advertisements.
     """
     logger.info("Get all advertisements")
+    if fields:
+        # The rows hold plain values already, so they skip the response model
+        return JSONResponse(await get_advertisements_fields(fields))
     return await get_advertisements_all()
 
 
+def check_batch_size(ids: list[int]):
+    """
+    Checks that a batch requests at least one and at most `BATCH_MAX_IDS` advertisements.
+
+    Raises:
+        HTTPException: If the batch is empty or too large, a 400 error is raised.
+    """
+    if not 1 <= len(ids) <= advertisement_settings.BATCH_MAX_IDS:
+        raise HTTPException(
+            status_code=400, detail=f"Request between 1 and {advertisement_settings.BATCH_MAX_IDS} advertisements"
+        )
+
+
+def record_batch_views(batch: AdvertisementBatch) -> AdvertisementBatch:
+    """Counts a view of every advertisement found by a batch read."""
+    for advertisement in batch.advertisements:
+        view_buffer.record(advertisement.id)
+    return batch
+
+
+# Declared before the routes taking an advertisement ID, which would otherwise match "batch", "changes" and "stream"
+@router.get("/batch", response_model=AdvertisementBatch)
+async def read_advertisements_batch(
+    ids: str = Query(description="Comma-separated advertisement IDs."), user: User = Depends(current_user)
+) -> AdvertisementBatch:
+    """
+    Asynchronously retrieves several advertisements by their IDs with a single query.
+
+    Args:
+        ids (str): The comma-separated IDs of the advertisements to retrieve.
+        user (User): The current user, required for authorization.
+
+    Raises:
+        HTTPException: If an ID is not a valid advertisement ID, or the batch is empty or too large.
+
+    Returns:
+        AdvertisementBatch: The advertisements in the requested order, and the IDs that were not found.
+    """
+    try:
+        advertisement_ids = [int(id) for id in ids.split(",") if id.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Advertisement IDs must be integers")
+    if not all(1 <= id <= ADVERTISEMENT_ID_MAX for id in advertisement_ids):
+        raise HTTPException(status_code=400, detail=f"Advertisement IDs must be between 1 and {ADVERTISEMENT_ID_MAX}")
+    check_batch_size(advertisement_ids)
+    logger.info(f"Get {len(advertisement_ids)} advertisements by id")
+    return record_batch_views(await get_advertisements_by_ids(advertisement_ids))
+
+
+@router.post("/batch", response_model=AdvertisementBatch)
+async def read_advertisements_batch_body(
+    batch: AdvertisementBatchRequest, user: User = Depends(current_user)
+) -> AdvertisementBatch:
+    """
+    Asynchronously retrieves several advertisements by the IDs in the request body, for batches too long for a URL.
+
+    Args:
+        batch (AdvertisementBatchRequest): The IDs of the advertisements to retrieve.
+        user (User): The current user, required for authorization.
+
+    Raises:
+        HTTPException: If the batch is empty or too large.
+
+    Returns:
+        AdvertisementBatch: The advertisements in the requested order, and the IDs that were not found.
+    """
+    check_batch_size(batch.ids)
+    logger.info(f"Get {len(batch.ids)} advertisements by id")
+    return record_batch_views(await get_advertisements_by_ids(batch.ids))
+
+
+@router.get("/changes", response_model=AdvertisementChanges)
+async def read_advertisement_changes(
+    since: str | None = None,
+    limit: int = Query(default=advertisement_settings.CHANGES_PAGE_SIZE, ge=1, le=advertisement_settings.CHANGES_MAX_PAGE_SIZE),
+    user: User = Depends(current_user),
+) -> AdvertisementChanges:
+    """
+    Asynchronously retrieves the advertisements created, updated or deleted since the cursor.
+
+    Args:
+        since (str | None): The cursor returned by the previous call, or None to get every advertisement.
+        limit (int): The maximum number of changes to return.
+        user (User): The current user, required for authorization.
+
+    Raises:
+        HTTPException: If the cursor is malformed.
+
+    Returns:
+        AdvertisementChanges: The changes and the cursor for the next call.
+    """
+    logger.info(f"Get advertisement changes since {since}")
+    return await get_advertisement_changes(since, limit)
+
+
+async def stream_subscription(subscription: Subscription):
+    """Streams the events of the subscription and unsubscribes once the client is gone."""
+    try:
+        async for message in subscription.messages(heartbeat=advertisement_settings.STREAM_HEARTBEAT_SECONDS):
+            yield message
+    finally:
+        advertisement_events.unsubscribe(subscription)
+
+
+@router.get("/stream", response_class=StreamingResponse)
+async def stream_advertisement_events(user: User = Depends(current_user)) -> StreamingResponse:
+    """
+    Asynchronously streams the create, update and delete events of advertisements as server-sent events.
+
+    The stream starts with a "ready" event. A "resync" event means events were
+    lost, and the client should catch up from the change feed.
+
+    Args:
+        user (User): The current user, required for authorization.
+
+    Raises:
+        HTTPException: If the events are unavailable.
+
+    Returns:
+        StreamingResponse: The event stream.
+    """
+    logger.info("Stream advertisement events")
+    subscription = await advertisement_events.subscribe()
+    return StreamingResponse(
+        stream_subscription(subscription),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.get("/{advertisement_id}", response_model=AdvertisementRead)
-async def read_advertisement_by_id(advertisement_id: int, user: User = Depends(current_user)) -> AdvertisementRead:
+async def read_advertisement_by_id(
+    advertisement_id: int, fields: list[str] | None = Depends(advertisement_fields), user: User = Depends(current_user)
+) -> AdvertisementRead:
     """
     Asynchronously retrieves an advertisement by its ID.
 
+    With `fields`, only those columns are selected and only those keys are returned.
+
     Args:
         advertisement_id (int): The ID of the advertisement to retrieve.
+        fields (list[str] | None): The fields to return, or None for every field.
         user (User): The current user, required for authorization.
 
     Raises:
@@ -45,12 +222,67 @@ async def read_advertisement_by_id(advertisement_id: int, user: User = Depends(c
         AdvertisementRead: The advertisement corresponding to the given ID.
     """
     logger.info(f"Get advertisement with id {advertisement_id}")
+    if fields:
+        advertisement = await get_advertisement_fields_by_id(advertisement_id, fields)
+        view_buffer.record(advertisement_id)
+        return JSONResponse(advertisement)
     advertisement = await get_advertisement_by_id(advertisement_id)
     if not advertisement:
         raise HTTPException(status_code=404, detail="Advertisement not found")
+    view_buffer.record(advertisement_id)
     return advertisement
 
 
+# Length of the buckets, and number of buckets returned when the start of the range is not given
+STATS_BUCKET_SIZES = {"hour": timedelta(hours=1), "day": timedelta(days=1)}
+DEFAULT_STATS_BUCKETS = {"hour": 24, "day": 30}
+
+
+def to_utc(value: datetime) -> datetime:
+    """Converts a datetime to naive UTC, treating naive datetimes as UTC already."""
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+@router.get("/{advertisement_id}/stats", response_model=AdvertisementViewStatsRead)
+async def read_advertisement_view_stats(
+    advertisement_id: int,
+    start: datetime | None = Query(default=None, alias="from"),
+    end: datetime | None = Query(default=None, alias="to"),
+    granularity: ViewStatsGranularity = "hour",
+    user: User = Depends(current_user),
+) -> AdvertisementViewStatsRead:
+    """
+    Asynchronously retrieves the views of an advertisement per hour or per day.
+
+    Daily counts are rolled up periodically, so the current day may lag behind 
+    the hourly counts.
+
+    Args:
+        advertisement_id (int): The ID of the advertisement.
+        start (datetime | None): The start of the range, by default a day or a month before its end.
+        end (datetime | None): The exclusive end of the range, by default now.
+        granularity (ViewStatsGranularity): Whether to count the views per hour or per day.
+        user (User): The current user, required for authorization.
+
+    Raises:
+        HTTPException: If the range is invalid or too long, or the advertisement is not found.
+
+    Returns:
+        AdvertisementViewStatsRead: The view counts per bucket.
+    """
+    logger.info(f"Get view statistics of advertisement with id {advertisement_id}")
+    end = to_utc(end) if end else datetime.now(timezone.utc).replace(tzinfo=None)
+    bucket_size = STATS_BUCKET_SIZES[granularity]
+    start = to_utc(start) if start else end - bucket_size * DEFAULT_STATS_BUCKETS[granularity]
+    if start >= end:
+        raise HTTPException(status_code=400, detail="The start of the range must be before its end")
+    if (end - start) / bucket_size > advertisement_settings.VIEW_STATS_MAX_BUCKETS:
+        raise HTTPException(status_code=400, detail="The range has too many buckets")
+    return await get_advertisement_view_stats(advertisement_id, start, end, granularity)
+
+
 @router.post("/", status_code=status.HTTP_201_CREATED, response_model=AdvertisementRead)
 async def create_advertisement_endpoint(new_advertisement: AdvertisementCreate, user: User = Depends(current_user)) -> AdvertisementRead:
     """
@@ -60,6 +292,9 @@ async def create_advertisement_endpoint(new_advertisement: AdvertisementCreate,
         new_advertisement (AdvertisementCreate): The new advertisement data.
         user (User): The current user, required for authorization.
 
+    Raises:
+        HTTPException: If an advertisement with the same author and title exists.
+
     Returns:
         AdvertisementRead: The created advertisement.
     """
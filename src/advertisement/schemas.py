@@ -1,4 +1,11 @@
-from pydantic import BaseModel, Field
+from datetime import datetime
+from typing import Literal
+
+from pydantic import BaseModel, Field, conint
+
+# The largest ID of the integer primary key, larger IDs cannot be compared with it in a query
+ADVERTISEMENT_ID_MAX = 2**31 - 1
+
 
 class AdvertisementBase(BaseModel):
     """
@@ -32,3 +39,60 @@ class AdvertisementUpdate(AdvertisementRead):
     Inherits from AdvertisementRead, no additional fields required.
     """
     pass
+
+
+class AdvertisementBatchRequest(BaseModel):
+    """
+    Model for requesting several advertisements by their IDs.
+    """
+    ids: list[conint(ge=1, le=ADVERTISEMENT_ID_MAX)]
+
+
+class AdvertisementBatch(BaseModel):
+    """
+    Model for several advertisements retrieved by their IDs, in the requested order.
+    `missing` lists the requested IDs that were not found.
+    """
+    advertisements: list[AdvertisementRead]
+    missing: list[int]
+
+
+class AdvertisementChange(AdvertisementRead):
+    """
+    Model for an advertisement created or updated since a change feed cursor.
+    Inherits from AdvertisementRead and adds the timestamps.
+    """
+    created_at: datetime
+    updated_at: datetime
+
+
+class AdvertisementChanges(BaseModel):
+    """
+    Model for a page of the advertisement change feed.
+    `cursor` is passed back as `since` to get the next changes.
+    """
+    updated: list[AdvertisementChange]
+    deleted: list[int]
+    cursor: str | None
+    has_more: bool
+
+
+ViewStatsGranularity = Literal["hour", "day"]
+
+
+class ViewStatsBucket(BaseModel):
+    """
+    Model for the number of views in one hour or day, starting at `start`.
+    """
+    start: datetime
+    views: int
+
+
+class AdvertisementViewStatsRead(BaseModel):
+    """
+    Model for the view counts of an advertisement over time.
+    Buckets without views are left out.
+    """
+    advertisement_id: int
+    granularity: ViewStatsGranularity
+    buckets: list[ViewStatsBucket]
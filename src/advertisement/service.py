@@ -1,28 +1,238 @@
+from datetime import datetime, time, timedelta, timezone
+
 from fastapi import HTTPException
-from sqlalchemy import select
+from sqlalchemy import Integer, any_, bindparam, select, update, delete, text, func, tuple_
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import IntegrityError
 
+from config import settings
+from cursors import encode_cursor, decode_cursor
 from db import async_session_maker
-from advertisement.models import Advertisement
-from advertisement.schemas import AdvertisementCreate, AdvertisementRead, AdvertisementUpdate
+from advertisement.models import (
+    Advertisement, AdvertisementTombstone, AdvertisementViewStats, AdvertisementViewStatsDaily
+)
+from advertisement.events import advertisement_notification, RESYNC_NOTIFICATION
+from advertisement.schemas import (
+    AdvertisementCreate, AdvertisementRead, AdvertisementUpdate, AdvertisementChange, AdvertisementChanges,
+    AdvertisementBatch, ADVERTISEMENT_ID_MAX,
+    AdvertisementViewStatsRead, ViewStatsBucket, ViewStatsGranularity,
+)
 from logger import db_query_logger as logger
+from monitoring.metrics import metrics_registry
+from singleflight import SingleFlight
+
+
+advertisement_settings = settings.advertisement
+
+# Concurrent identical reads share one query
+advertisement_reads = SingleFlight()
+metrics_registry.add_cache("advertisement_reads", lambda: (advertisement_reads.hits, advertisement_reads.misses))
+ALL_ADVERTISEMENTS_KEY = ("advertisements",)
+
+
+def forget_advertisement_reads(*advertisement_ids: int):
+    """
+    Keeps the reads in flight from serving callers that arrive after a change to the advertisements.
+
+    Reads of every advertisement and batch reads are forgotten on any change, 
+    since a created advertisement may belong to them. Reads of a single 
+    advertisement are forgotten for the given IDs.
+    """
+    changed_ids = set(advertisement_ids)
+    advertisement_reads.forget_where(
+        lambda key: key[0] in ("advertisements", "advertisements_by_ids")
+        or (key[0] == "advertisement" and key[1] in changed_ids)
+    )
 
 
 async def get_advertisements_all() -> list[AdvertisementRead]:
     """
     Retrieves all advertisements from the database.
 
+    Concurrent calls share one query.
+
     Returns:
         list[AdvertisementRead]: A list of AdvertisementRead objects representing all the advertisements in the database.
     """
+    return await advertisement_reads.run(ALL_ADVERTISEMENTS_KEY, _load_advertisements_all)
+
+
+async def _load_advertisements_all() -> list[AdvertisementRead]:
+    """Queries all advertisements, in the order of their positions."""
     async with async_session_maker() as session:
         advertisements = await session.execute(select(Advertisement).order_by(Advertisement.position))
         return advertisements.scalars().all()
 
 
+async def get_advertisements_fields(fields: list[str]) -> list[dict]:
+    """
+    Retrieves the given fields of all advertisements, selecting only their columns.
+
+    Concurrent calls for the same fields share one query.
+
+    Args:
+        fields (list[str]): The names of the fields to retrieve.
+
+    Returns:
+        list[dict]: The fields of each advertisement, in the order of the list endpoint.
+    """
+    return await advertisement_reads.run(("advertisements", tuple(fields)), lambda: _load_advertisements_fields(fields))
+
+
+async def _load_advertisements_fields(fields: list[str]) -> list[dict]:
+    """Queries the given fields of all advertisements, in the order of their positions."""
+    async with async_session_maker() as session:
+        result = await session.execute(
+            select(*(getattr(Advertisement, field) for field in fields)).order_by(Advertisement.position)
+        )
+        return [dict(zip(fields, row)) for row in result]
+
+
+async def get_advertisement_fields_by_id(advertisement_id: int, fields: list[str]) -> dict:
+    """
+    Asynchronously retrieves the given fields of an advertisement, selecting only their columns.
+
+    Concurrent calls for the same ID and fields share one query.
+
+    Args:
+        advertisement_id (int): The ID of the advertisement to retrieve.
+        fields (list[str]): The names of the fields to retrieve.
+
+    Raises:
+        HTTPException: If no advertisement is found with the given ID, a 404 error is raised.
+
+    Returns:
+        dict: The requested fields of the advertisement.
+    """
+    return await advertisement_reads.run(
+        ("advertisement", advertisement_id, tuple(fields)),
+        lambda: _load_advertisement_fields(advertisement_id, fields),
+    )
+
+
+async def _load_advertisement_fields(advertisement_id: int, fields: list[str]) -> dict:
+    """Queries the given fields of an advertisement, raising a 404 error if it does not exist."""
+    async with async_session_maker() as session:
+        row = (await session.execute(
+            select(*(getattr(Advertisement, field) for field in fields)).where(Advertisement.id == advertisement_id)
+        )).first()
+
+        if row is None:
+            logger.warning(f"Advertisement with id {advertisement_id} not found")
+            raise HTTPException(status_code=404, detail="Advertisement not found")
+
+        return dict(zip(fields, row))
+
+
+async def get_advertisements_by_ids(advertisement_ids: list[int]) -> AdvertisementBatch:
+    """
+    Asynchronously retrieves several advertisements by their IDs with a single query.
+
+    The IDs are passed as one array parameter, so every batch size shares the same statement. 
+    Concurrent calls for the same IDs share one query.
+
+    Args:
+        advertisement_ids (list[int]): The IDs of the advertisements to retrieve.
+
+    Returns:
+        AdvertisementBatch: The advertisements in the order of the IDs, and the IDs that were not found.
+    """
+    ids = list(dict.fromkeys(advertisement_ids))
+    return await advertisement_reads.run(("advertisements_by_ids", tuple(ids)), lambda: _load_advertisements_by_ids(ids))
+
+
+async def _load_advertisements_by_ids(ids: list[int]) -> AdvertisementBatch:
+    """Queries the advertisements with the given distinct IDs."""
+    async with async_session_maker() as session:
+        found = {
+            advertisement.id: advertisement
+            for advertisement in await session.scalars(
+                select(Advertisement).where(Advertisement.id == any_(bindparam("ids", ids, type_=ARRAY(Integer))))
+            )
+        }
+    return AdvertisementBatch(
+        advertisements=[AdvertisementRead.model_validate(found[id], from_attributes=True) for id in ids if id in found],
+        missing=[id for id in ids if id not in found],
+    )
+
+
+async def get_advertisement_changes(since: str | None, limit: int) -> AdvertisementChanges:
+    """
+    Asynchronously retrieves the advertisements created, updated or deleted after the cursor.
+
+    Changes are returned in (timestamp, id) order. Without a cursor every 
+    advertisement is returned, page by page, and deletions are left out.
+
+    Args:
+        since (str | None): The cursor returned with the previous changes.
+        limit (int): The maximum number of changes to return.
+
+    Raises:
+        HTTPException: If the cursor is malformed, a 400 error is raised.
+
+    Returns:
+        AdvertisementChanges: The changes, and the cursor to pass to get the next ones.
+    """
+    after = None
+    if since:
+        timestamp, id = decode_cursor(since)
+        try:
+            timestamp, id = datetime.fromisoformat(timestamp), int(id)
+            # The timestamp columns hold naive UTC times
+            if timestamp.tzinfo is not None:
+                timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+        except (TypeError, ValueError, OverflowError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        if not 1 <= id <= ADVERTISEMENT_ID_MAX:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        after = (timestamp, id)
+
+    horizon = func.timezone("utc", func.now()) - timedelta(seconds=advertisement_settings.CHANGES_LAG_SECONDS)
+
+    def changed(timestamp_column, id_column):
+        conditions = [timestamp_column <= horizon]
+        if after is not None:
+            conditions.append(tuple_(timestamp_column, id_column) > tuple_(*after))
+        return conditions
+
+    async with async_session_maker() as session:
+        advertisements = (await session.scalars(
+            select(Advertisement)
+            .where(*changed(Advertisement.updated_at, Advertisement.id))
+            .order_by(Advertisement.updated_at, Advertisement.id)
+            .limit(limit + 1)
+        )).all()
+        tombstones = [] if after is None else (await session.execute(
+            select(AdvertisementTombstone.deleted_at, AdvertisementTombstone.advertisement_id)
+            .where(*changed(AdvertisementTombstone.deleted_at, AdvertisementTombstone.advertisement_id))
+            .order_by(AdvertisementTombstone.deleted_at, AdvertisementTombstone.advertisement_id)
+            .limit(limit + 1)
+        )).all()
+
+    changes = sorted(
+        [(advertisement.updated_at, advertisement.id, advertisement) for advertisement in advertisements]
+        + [(deleted_at, advertisement_id, None) for deleted_at, advertisement_id in tombstones],
+        key=lambda change: change[:2],
+    )
+    has_more, changes = len(changes) > limit, changes[:limit]
+    return AdvertisementChanges(
+        updated=[
+            AdvertisementChange.model_validate(advertisement, from_attributes=True)
+            for _, _, advertisement in changes if advertisement is not None
+        ],
+        deleted=[id for _, id, advertisement in changes if advertisement is None],
+        cursor=encode_cursor(list(changes[-1][:2])) if changes else since or None,
+        has_more=has_more,
+    )
+
+
 async def get_advertisement_by_id(advertisement_id: int) -> AdvertisementRead:
     """
     Asynchronously retrieves an advertisement by its ID.
 
+    Concurrent calls for the same ID share one query.
+
     Args:
         advertisement_id (int): The ID of the advertisement to retrieve.
 
@@ -32,6 +242,13 @@ async def get_advertisement_by_id(advertisement_id: int) -> AdvertisementRead:
     Returns:
         AdvertisementRead: The advertisement object corresponding to the provided ID.
     """
+    return await advertisement_reads.run(
+        ("advertisement", advertisement_id), lambda: _load_advertisement(advertisement_id)
+    )
+
+
+async def _load_advertisement(advertisement_id: int) -> AdvertisementRead:
+    """Queries an advertisement by its ID, raising a 404 error if it does not exist."""
     async with async_session_maker() as session:
         advertisement = await session.get(Advertisement, advertisement_id)
 
@@ -49,14 +266,28 @@ async def create_advertisement(new_advertisement: AdvertisementCreate):
     Args:
         new_advertisement (AdvertisementCreate): The data for the advertisement to create.
 
+    Raises:
+        HTTPException: If an advertisement with the same author and title exists, a 409 error is raised.
+
     Returns:
         Advertisement: The created advertisement object.
     """
     async with async_session_maker() as session:
         new_advertisement_data = new_advertisement.model_dump()
-        advertisement = Advertisement(**new_advertisement_data)
-        session.add(advertisement)
+        result = await session.execute(
+            insert(Advertisement)
+            .values(**new_advertisement_data)
+            .on_conflict_do_nothing(index_elements=[Advertisement.fingerprint])
+            .returning(Advertisement, advertisement_notification("create"))
+        )
+        advertisement = result.scalar_one_or_none()
+
+        if advertisement is None:
+            logger.warning(f"Advertisement {new_advertisement.title!r} by {new_advertisement.author!r} already exists")
+            raise HTTPException(status_code=409, detail="Advertisement with this author and title already exists")
+
         await session.commit()
+        forget_advertisement_reads()
         return advertisement
     
 
@@ -67,18 +298,25 @@ async def delete_advertisement(advertisement_id: int):
     Args:
         advertisement_id (int): The ID of the advertisement to delete.
 
+    Raises:
+        HTTPException: If no advertisement is found with the given ID, a 404 error is raised.
+
     Returns:
         dict: A confirmation message indicating successful deletion.
     """
     async with async_session_maker() as session:
-        advertisement = await session.get(Advertisement, advertisement_id)
+        result = await session.execute(
+            delete(Advertisement)
+            .where(Advertisement.id == advertisement_id)
+            .returning(Advertisement.id, advertisement_notification("delete"))
+        )
 
-        if advertisement is None:
+        if result.first() is None:
             raise HTTPException(status_code=404, detail=f"Advertisement with id {advertisement_id} not found")
-        
-        await session.delete(advertisement)
+
         await session.commit()
-        return {"status": f"Advertisement with id {advertisement.id} deleted successfully"}
+        forget_advertisement_reads(advertisement_id)
+        return {"status": f"Advertisement with id {advertisement_id} deleted successfully"}
 
 
 async def update_advertisement(updated_advertisement: AdvertisementUpdate) -> AdvertisementRead:
@@ -89,20 +327,216 @@ async def update_advertisement(updated_advertisement: AdvertisementUpdate) -> Ad
         updated_advertisement (AdvertisementUpdate): The updated data for the advertisement.
 
     Raises:
-        HTTPException: If the advertisement to update is not found.
+        HTTPException: If the advertisement to update is not found, or if another 
+                       advertisement has the same author and title.
 
     Returns:
         AdvertisementRead: The updated advertisement object.
     """
     async with async_session_maker() as session:
-        advertisement = await get_advertisement_by_id(updated_advertisement.id)
-        updated_data = updated_advertisement.model_dump(exclude_unset=True)
-        
-        # Update the advertisement's attributes with new values
-        for key, value in updated_data.items():
-            setattr(advertisement, key, value)
-        
-        session.add(advertisement)
+        updated_data = updated_advertisement.model_dump(exclude_unset=True, exclude={"id"})
+
+        try:
+            result = await session.execute(
+                update(Advertisement)
+                .where(Advertisement.id == updated_advertisement.id)
+                .values(**updated_data)
+                .returning(Advertisement, advertisement_notification("update"))
+            )
+        except IntegrityError:
+            logger.warning(f"Advertisement {updated_advertisement.title!r} by {updated_advertisement.author!r} already exists")
+            raise HTTPException(status_code=409, detail="Advertisement with this author and title already exists")
+        advertisement = result.scalar_one_or_none()
+
+        if not advertisement:
+            logger.warning(f"Advertisement with id {updated_advertisement.id} not found")
+            raise HTTPException(status_code=404, detail="Advertisement not found")
+
         await session.commit()
-        await session.refresh(advertisement)
+        forget_advertisement_reads(updated_advertisement.id)
         return advertisement
+
+
+# Gives the selected advertisements positions 1..n in their current order and shifts the others after them,
+# only as far as needed to keep their order below n, so the rows further down keep their positions
+MOVE_ADVERTISEMENTS_TO_TOP = text("""
+    WITH selected AS (
+        SELECT id, row_number() OVER (ORDER BY position NULLS LAST, id) AS position
+        FROM advertisement
+        WHERE id = ANY(:ids)
+    ), others AS (
+        SELECT id,
+               GREATEST(position, (SELECT count(*) FROM selected) + row_number() OVER (ORDER BY position, id)) AS position
+        FROM advertisement
+        WHERE position IS NOT NULL AND id <> ALL(:ids)
+    ), moved AS (
+        SELECT id, position FROM selected
+        UNION ALL
+        SELECT id, position FROM others
+    )
+    UPDATE advertisement SET position = moved.position
+    FROM moved
+    WHERE advertisement.id = moved.id AND advertisement.position IS DISTINCT FROM moved.position
+    RETURNING advertisement.id
+""")
+
+
+async def delete_advertisements(advertisement_ids: list[int]) -> int:
+    """
+    Asynchronously deletes the given advertisements with a single statement.
+
+    Args:
+        advertisement_ids (list[int]): The IDs of the advertisements to delete.
+
+    Returns:
+        int: The number of deleted advertisements.
+    """
+    async with async_session_maker() as session:
+        result = await session.execute(delete(Advertisement).where(Advertisement.id.in_(advertisement_ids)))
+        if result.rowcount:
+            await session.execute(RESYNC_NOTIFICATION)
+        await session.commit()
+        forget_advertisement_reads(*advertisement_ids)
+        logger.info(f"Deleted {result.rowcount} advertisements")
+        return result.rowcount
+
+
+async def move_advertisements_to_top(advertisement_ids: list[int]) -> int:
+    """
+    Asynchronously moves the given advertisements to the top of the list with a single statement.
+
+    The advertisements get the first positions, keeping their relative order. The 
+    other positioned advertisements are shifted down only as far as needed to stay 
+    in order after them, so only the rows whose position changes are written and 
+    the change feed and the caches are not churned by the rest of the list.
+
+    Args:
+        advertisement_ids (list[int]): The IDs of the advertisements to move.
+
+    Returns:
+        int: The number of advertisements whose position changed.
+    """
+    if not advertisement_ids:
+        return 0
+    async with async_session_maker() as session:
+        moved_ids = (await session.execute(MOVE_ADVERTISEMENTS_TO_TOP, {"ids": advertisement_ids})).scalars().all()
+        if moved_ids:
+            await session.execute(RESYNC_NOTIFICATION)
+        await session.commit()
+        forget_advertisement_reads(*moved_ids)
+        logger.info(f"Moved {len(advertisement_ids)} advertisements to the top, repositioning {len(moved_ids)}")
+        return len(moved_ids)
+
+
+# Adds a batch of hourly view counts, given as parallel arrays, in one statement
+RECORD_VIEWS = text("""
+    INSERT INTO advertisement_view_stats (advertisement_id, hour, views)
+    SELECT * FROM unnest(CAST(:ids AS integer[]), CAST(:hours AS timestamp[]), CAST(:views AS bigint[]))
+    ON CONFLICT (advertisement_id, hour) DO UPDATE SET views = advertisement_view_stats.views + EXCLUDED.views
+""")
+
+# Recomputes the daily counts of the days that have hours since the given time
+ROLLUP_VIEW_STATS = text("""
+    INSERT INTO advertisement_view_stats_daily (advertisement_id, day, views)
+    SELECT advertisement_id, CAST(hour AS date), sum(views)
+    FROM advertisement_view_stats
+    WHERE hour >= :since
+    GROUP BY advertisement_id, CAST(hour AS date)
+    ON CONFLICT (advertisement_id, day) DO UPDATE SET views = EXCLUDED.views
+""")
+
+
+async def record_advertisement_views(views: dict[tuple[int, datetime], int]) -> int:
+    """
+    Asynchronously adds view counts to the hourly statistics with a single statement.
+
+    Args:
+        views (dict[tuple[int, datetime], int]): The number of views by advertisement ID and hour.
+
+    Returns:
+        int: The number of hourly rows written.
+    """
+    if not views:
+        return 0
+    keys = list(views)
+    async with async_session_maker() as session:
+        result = await session.execute(RECORD_VIEWS, {
+            "ids": [advertisement_id for advertisement_id, _ in keys],
+            "hours": [hour for _, hour in keys],
+            "views": [views[key] for key in keys],
+        })
+        await session.commit()
+        return result.rowcount
+
+
+async def rollup_advertisement_view_stats() -> int:
+    """
+    Asynchronously rolls the hourly view statistics up into daily ones.
+
+    Only the days since the day before the last rolled up one are recomputed, 
+    which covers the hours still receiving late views, so a run reads the 
+    recent hours rather than the whole history. Concurrent runs are skipped.
+
+    Returns:
+        int: The number of daily rows written.
+    """
+    async with async_session_maker() as session:
+        locked = await session.scalar(
+            select(func.pg_try_advisory_xact_lock(func.hashtext("advertisement_view_stats_rollup")))
+        )
+        if not locked:
+            logger.info("View statistics rollup already running, skipped")
+            return 0
+        last_day = await session.scalar(select(func.max(AdvertisementViewStatsDaily.day)))
+        since = datetime.combine(last_day - timedelta(days=1), time()) if last_day else datetime.min
+        result = await session.execute(ROLLUP_VIEW_STATS, {"since": since})
+        await session.commit()
+        logger.info(f"Rolled up {result.rowcount} daily view statistics since {since}")
+        return result.rowcount
+
+
+async def get_advertisement_view_stats(
+    advertisement_id: int, start: datetime, end: datetime, granularity: ViewStatsGranularity
+) -> AdvertisementViewStatsRead:
+    """
+    Asynchronously retrieves the view counts of an advertisement between two UTC times.
+
+    Args:
+        advertisement_id (int): The ID of the advertisement.
+        start (datetime): The start of the range; the bucket containing it is included.
+        end (datetime): The exclusive end of the range.
+        granularity (ViewStatsGranularity): Whether to count the views per hour or per day.
+
+    Raises:
+        HTTPException: If no advertisement is found with the given ID, a 404 error is raised.
+
+    Returns:
+        AdvertisementViewStatsRead: The view counts per bucket.
+    """
+    if granularity == "hour":
+        bucket, stats = AdvertisementViewStats.hour, AdvertisementViewStats
+        # Every hour overlapping the range is included
+        start = start.replace(minute=0, second=0, microsecond=0)
+    else:
+        bucket, stats = AdvertisementViewStatsDaily.day, AdvertisementViewStatsDaily
+        # Every day overlapping the range is included
+        start, end = start.date(), (end - timedelta(microseconds=1)).date() + timedelta(days=1)
+
+    async with async_session_maker() as session:
+        if await session.get(Advertisement, advertisement_id) is None:
+            logger.warning(f"Advertisement with id {advertisement_id} not found")
+            raise HTTPException(status_code=404, detail="Advertisement not found")
+        rows = (await session.execute(
+            select(bucket, stats.views)
+            .where(stats.advertisement_id == advertisement_id, bucket >= start, bucket < end)
+            .order_by(bucket)
+        )).all()
+
+    return AdvertisementViewStatsRead(
+        advertisement_id=advertisement_id,
+        granularity=granularity,
+        buckets=[
+            ViewStatsBucket(start=value if granularity == "hour" else datetime.combine(value, time()), views=views)
+            for value, views in rows
+        ],
+    )
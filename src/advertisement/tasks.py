@@ -0,0 +1,16 @@
+from tasks_celery import async_task
+from logger import celery_logger as logger
+
+from advertisement.service import rollup_advertisement_view_stats
+
+
+@async_task
+async def rollup_advertisement_view_stats_task():
+    """
+    Celery task to roll the hourly advertisement view statistics up into daily ones.
+
+    This task is scheduled periodically by Celery beat and only recomputes 
+    the recent days, so its cost does not grow with the age of the statistics.
+    """
+    logger.info("Rolling up advertisement view statistics")
+    await rollup_advertisement_view_stats()
@@ -0,0 +1,147 @@
+import asyncio
+from collections import Counter
+from contextvars import Context
+from datetime import datetime, timezone
+from time import monotonic
+
+from config import settings
+from logger import app_logger as logger
+from monitoring.metrics import metrics_registry, MetricFamily
+from tasks_dispatch import dispatcher
+from advertisement.service import record_advertisement_views
+from advertisement.tasks import rollup_advertisement_view_stats_task
+
+
+advertisement_settings = settings.advertisement
+celery_settings = settings.celery
+
+
+class ViewBuffer:
+    """
+    Counts advertisement views in memory and writes them to the hourly statistics in batches.
+
+    Views are counted per advertisement and hour, and a background loop adds
+    the counts to the database every `flush_interval` seconds in one statement,
+    or sooner once `max_keys` counters are pending. Counts that fail to be
+    written are kept for the next flush, up to `max_pending_keys` counters,
+    beyond which the counters of the oldest hours are dropped.
+
+    With the in-process task backend there is no Celery beat, so the loop also
+    dispatches the daily rollup every `rollup_interval` seconds.
+
+    Args:
+        flush_interval (float): The time in seconds between flushes.
+        max_keys (int): The number of pending counters that triggers an early flush.
+        max_pending_keys (int): The number of counters kept while the writes fail.
+        rollup_interval (float): The time in seconds between daily rollups with the in-process backend.
+    """
+
+    def __init__(self, flush_interval: float, max_keys: int, max_pending_keys: int, rollup_interval: float):
+        self.flush_interval = flush_interval
+        self.max_keys = max_keys
+        self.max_pending_keys = max_pending_keys
+        self.rollup_interval = rollup_interval
+        self.flushed_count = 0
+        self.dropped_count = 0
+        self._views: Counter[tuple[int, datetime]] = Counter()
+        self._task: asyncio.Task | None = None
+        self._wakeup = asyncio.Event()
+        self._last_rollup = monotonic()
+
+    @property
+    def pending(self) -> int:
+        """The number of views waiting to be written."""
+        return sum(self._views.values())
+
+    def record(self, advertisement_id: int):
+        """Counts a view of the advertisement in the current hour."""
+        hour = datetime.now(timezone.utc).replace(tzinfo=None, minute=0, second=0, microsecond=0)
+        self._views[(advertisement_id, hour)] += 1
+        if len(self._views) >= self.max_keys:
+            self._wakeup.set()
+
+    async def flush(self) -> int:
+        """
+        Writes the pending view counts to the hourly statistics.
+
+        Returns:
+            int: The number of views written.
+        """
+        views, self._views = self._views, Counter()
+        try:
+            await record_advertisement_views(views)
+        except Exception:
+            self._views.update(views)
+            self._drop_oldest()
+            raise
+        flushed = sum(views.values())
+        self.flushed_count += flushed
+        return flushed
+
+    def _drop_oldest(self):
+        """Drops the counters of the oldest hours beyond `max_pending_keys`."""
+        excess = len(self._views) - self.max_pending_keys
+        if excess <= 0:
+            return
+        oldest = sorted(self._views, key=lambda key: key[1])[:excess]
+        dropped = sum(self._views.pop(key) for key in oldest)
+        self.dropped_count += dropped
+        logger.warning(f"Dropped {dropped} advertisement views of {excess} counters that could not be written")
+
+    def start(self):
+        """Starts the flush loop on the running event loop."""
+        if self._task is None:
+            self._task = asyncio.create_task(self.run(), context=Context())
+
+    async def stop(self):
+        """Stops the flush loop and writes the remaining view counts."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.error(f"Error flushing {self.pending} advertisement views on shutdown: {e}")
+
+    async def run(self):
+        """Flushes the view counts until cancelled."""
+        while True:
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Error flushing advertisement views: {e}")
+            if celery_settings.CELERY_TASK_BACKEND == "inprocess" and monotonic() - self._last_rollup >= self.rollup_interval:
+                self._last_rollup = monotonic()
+                try:
+                    await dispatcher.send(rollup_advertisement_view_stats_task)
+                except Exception as e:
+                    logger.error(f"Error dispatching the advertisement view stats rollup: {e}")
+
+
+view_buffer = ViewBuffer(
+    flush_interval=advertisement_settings.VIEW_FLUSH_INTERVAL,
+    max_keys=advertisement_settings.VIEW_BUFFER_MAX_KEYS,
+    max_pending_keys=advertisement_settings.VIEW_BUFFER_MAX_PENDING_KEYS,
+    rollup_interval=advertisement_settings.VIEW_ROLLUP_INTERVAL,
+)
+
+
+def collect_view_metrics() -> list[MetricFamily]:
+    """Collects the statistics of the advertisement view buffer."""
+    return [
+        ("advertisement_views_pending", "gauge", "Number of advertisement views waiting to be written.",
+         [({}, view_buffer.pending)]),
+        ("advertisement_views_flushed_total", "counter", "Number of advertisement views written to the statistics.",
+         [({}, view_buffer.flushed_count)]),
+        ("advertisement_views_dropped_total", "counter", "Number of advertisement views dropped after failed writes.",
+         [({}, view_buffer.dropped_count)]),
+    ]
+
+
+metrics_registry.add_collector(collect_view_metrics)
@@ -6,6 +6,7 @@ from fastapi_users.authentication import JWTStrategy
 from auth.manager import get_user_manager
 from user.models import User
 from config import settings
+from monitoring.timing import timed_dependency
 
 
 # Retrieve authentication settings from the application configuration
@@ -41,8 +42,11 @@ fastapi_users = FastAPIUsers[User, int](
 )
 
 
-# Get the current user from the FastAPIUsers instance
-current_user = fastapi_users.current_user()
+# Get the current user from the FastAPIUsers instance, timed as the `auth` phase of `Server-Timing`
+current_user = timed_dependency("auth", fastapi_users.current_user())
+
+# Get the current user, requiring an active superuser
+current_superuser = timed_dependency("auth", fastapi_users.current_user(active=True, superuser=True))
 
 
 async def verify_user(user: User = Depends(current_user)):
@@ -45,7 +45,7 @@ class UserManager(UUIDIDMixin, BaseUserManager[User, UUID]):
         """
         logger.debug(f"User {user.id} logged in.")
         if not user.is_verified:
-            await send_verification(user)
+            await send_verification(user, reuse_recent=True)
 
     async def on_after_request_verify(self, user: User, token: str, request: Optional[Request] = None):
         """
@@ -9,10 +9,12 @@ from user.service import verify_verification_token
 from user.schemas import UserRead, UserCreate
 from auth.base_config import current_user
 from auth.manager import send_verification
+from auth.service import verification_cooldown
 from auth.base_config import fastapi_users, auth_backend
+from monitoring.timing import TimedRoute
 
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
 
 
 # Add authentication router to the router. This includes routes for login, logout.
@@ -67,5 +69,6 @@ async def verify_user(token: str, user: User = Depends(current_user)) -> Redirec
         logger.warning(f"User with verification token {token} already verified")
         raise HTTPException(status_code=400, detail=f"User with this verification token {token} already verified")
     else:
-        await verify_verification_token(token)
+        verified_user = await verify_verification_token(token)
+        verification_cooldown.forget(verified_user.id)
     return RedirectResponse(url=settings.auth.VERIFY_REDIRECT, status_code=HTTP_302_FOUND)
@@ -1,5 +1,8 @@
 
 import secrets
+from datetime import datetime, timezone
+from time import monotonic
+from uuid import UUID
 
 from fastapi_users.password import PasswordHelper
 from pwdlib import PasswordHash
@@ -7,7 +10,11 @@ from pwdlib.hashers.argon2 import Argon2Hasher
 
 from config import settings
 from db import async_session_maker
-from mail.utils import send_email_verification_msg
+from mail.tasks import send_email
+from mail.utils import build_email_verification_msg
+from outbox.relay import outbox_relay
+from monitoring.metrics import metrics_registry
+from outbox.schemas import OutboxMessageCreate
 from user.models import User
 from user.service import update_user_verification_token
 from user.tasks import delete_user_verification_token_task
@@ -17,6 +24,70 @@ password_hash = PasswordHash((Argon2Hasher(),))
 password_helper = PasswordHelper(password_hash)
 
 
+class VerificationCooldown:
+    """
+    In-memory record of the verification tokens issued recently by this process.
+
+    It lets repeated logins reuse a fresh token without touching the database. 
+    Other processes fall back to the issue time stored with the token.
+
+    Args:
+        cooldown (int): The time in seconds during which an issued token is reused.
+        max_size (int): The number of entries after which expired ones are pruned.
+    """
+
+    def __init__(self, cooldown: int, max_size: int = 10000):
+        self.cooldown = cooldown
+        self.max_size = max_size
+        self._tokens: dict[UUID, tuple[str, float]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id: UUID) -> str | None:
+        """
+        Returns the token issued to the user within the cooldown, if any.
+
+        Args:
+            user_id (UUID): The unique identifier of the user.
+
+        Returns:
+            str | None: The token to reuse, or None if a new token must be issued.
+        """
+        entry = self._tokens.get(user_id)
+        if entry is None or entry[1] <= monotonic():
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry[0]
+
+    def set(self, user_id: UUID, token: str, issued_ago: float = 0.0):
+        """
+        Records a token issued to the user.
+
+        Args:
+            user_id (UUID): The unique identifier of the user.
+            token (str): The issued verification token.
+            issued_ago (float): How many seconds ago the token was issued.
+        """
+        if len(self._tokens) >= self.max_size:
+            now = monotonic()
+            self._tokens = {key: entry for key, entry in self._tokens.items() if entry[1] > now}
+        self._tokens[user_id] = (token, monotonic() + self.cooldown - issued_ago)
+
+    def forget(self, user_id: UUID):
+        """
+        Drops the token recorded for the user, once it is consumed or deleted.
+
+        Args:
+            user_id (UUID): The unique identifier of the user.
+        """
+        self._tokens.pop(user_id, None)
+
+
+verification_cooldown = VerificationCooldown(cooldown=settings.auth.VERIFY_RESEND_COOLDOWN)
+metrics_registry.add_cache("verification_token", lambda: (verification_cooldown.hits, verification_cooldown.misses))
+
+
 async def verify_password(stored_hashed_password: str, given_password: str) -> bool:
     """
     Verify if the given password matches the stored hashed password.
@@ -39,20 +110,47 @@ async def verify_password(stored_hashed_password: str, given_password: str) -> b
     return is_verified
 
 
-async def send_verification(user: User) -> str:
+async def send_verification(user: User, reuse_recent: bool = False) -> str:
     """
     Sends a verification email to the given user.
 
+    The new token, the email and the task that expires the token are written 
+    in one transaction through the outbox. With `reuse_recent`, used on login, 
+    the still valid token is returned and nothing is sent within 
+    `VERIFY_RESEND_COOLDOWN` seconds of the last email.
+
     Args:
         user (User): The user to send the verification email to.
+        reuse_recent (bool): Whether to reuse a token issued within the cooldown. Defaults to False.
 
     Returns:
         str: The verification token generated for the user.
     """
+    if reuse_recent and user.verification_token:
+        # The user row is current, so a token consumed or deleted meanwhile is not reused
+        token = verification_cooldown.get(user.id)
+        if token == user.verification_token:
+            return token
+        if user.verification_token_sent_at:
+            now = datetime.now(timezone.utc).replace(tzinfo=None)
+            issued_ago = (now - user.verification_token_sent_at).total_seconds()
+            if issued_ago < verification_cooldown.cooldown:
+                verification_cooldown.set(user.id, user.verification_token, issued_ago=issued_ago)
+                return user.verification_token
+
     token = secrets.token_hex(16)
-    await update_user_verification_token(user_id=user.id, token=token)
-    await send_email_verification_msg(user=user, verification_token=token)
-    delete_user_verification_token_task.apply_async(
-        (user.id,), countdown=settings.auth.VERIFY_TOKEN_EXPIRATION
-    )
+    outbox_messages = [
+        OutboxMessageCreate(
+            task=send_email.name,
+            kwargs=build_email_verification_msg(user=user, verification_token=token),
+        ),
+        OutboxMessageCreate(
+            task=delete_user_verification_token_task.name,
+            args=[str(user.id)],
+            countdown=settings.auth.VERIFY_TOKEN_EXPIRATION,
+        ),
+    ]
+    await update_user_verification_token(user_id=user.id, token=token, outbox_messages=outbox_messages)
+    verification_cooldown.set(user.id, token)
+    outbox_relay.wake()
     return token
\ No newline at end of file
@@ -1,5 +1,8 @@
+from functools import cached_property
 from pathlib import Path
+from typing import Literal
 
+from pydantic import model_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from dotenv import load_dotenv
 
@@ -19,11 +22,11 @@ class EnvSettings(BaseSettings):
     """
     Base settings class that loads environment variables into Pydantic settings.
     
-    This class provides a configuration dictionary for loading environment 
-    variables from the specified .env file with UTF-8 encoding and allows 
-    for extra fields.
+    The .env file is parsed once by `load_dotenv` at import, so the settings 
+    classes read the process environment instead of parsing the file again 
+    each. Variables already set in the environment take precedence over the file.
     """
-    model_config = SettingsConfigDict(env_file=str(ENV_PATH), env_file_encoding="utf-8", extra="allow")
+    model_config = SettingsConfigDict(extra="allow")
 
 
 class AdminSettings(EnvSettings):
@@ -86,17 +89,64 @@ class MailSettings(EnvSettings):
     MAIL_SERVER: str
     MAIL_TLS: str
     MAIL_SSL: str
+    MAIL_RATE_LIMIT: float = 10.0
+    MAIL_SUPPRESS_SEND: bool = False
 
 
 class CelerySettings(EnvSettings):
     """Settings for configuring the Celery task queue."""
     CELERY_BROKER_URL: str
     CELERY_RESULT_BACKEND: str
-
-
-class LoggingSettings:
-    """Settings related to logging, including the log file path."""
-    LOG_PATH = PROJECT_PATH / "logs"
+    CELERY_DB_POOL_SIZE: int = 2
+    CELERY_DB_MAX_OVERFLOW: int = 2
+    CELERY_TASK_BACKEND: Literal["celery", "inprocess"] = "celery"
+    CELERY_INPROCESS_WORKERS: int = 2
+    CELERY_INPROCESS_QUEUE_SIZE: int = 1000
+    CELERY_INPROCESS_DRAIN_TIMEOUT: float = 10.0
+    CELERY_PUBLISH_BUFFER_SIZE: int = 10000
+    CELERY_PUBLISH_BATCH_SIZE: int = 100
+    CELERY_PUBLISH_FLUSH_TIMEOUT: float = 10.0
+    CELERY_PUBLISH_CONFIRM: bool = True
+
+
+class OutboxSettings(EnvSettings):
+    """Settings for relaying the transactional outbox to the task dispatcher."""
+    OUTBOX_RELAY_ENABLED: bool = True
+    OUTBOX_BATCH_SIZE: int = 100
+    OUTBOX_POLL_INTERVAL: float = 1.0
+    OUTBOX_SEND_TIMEOUT: float = 10.0
+
+
+class LoggingSettings(EnvSettings):
+    """Settings related to logging, including the log file path, per-logger levels and sampling."""
+    LOG_PATH: Path = PROJECT_PATH / "logs"
+    LOG_LEVEL_APP: str = "INFO"
+    LOG_LEVEL_DB: str = "INFO"
+    LOG_LEVEL_CELERY: str = "INFO"
+    LOG_LEVEL_TEST: str = "DEBUG"
+    LOG_SAMPLE_RATE_APP: float = 1.0
+    LOG_SAMPLE_RATE_DB: float = 1.0
+    LOG_JSON: bool = False
+    LOG_MAX_BYTES: int = 5 * 1024 * 1024
+    LOG_BACKUP_COUNT: int = 2
+
+
+class MonitoringSettings(EnvSettings):
+    """Settings for collecting query and request performance statistics."""
+    SLOW_QUERY_THRESHOLD_MS: float = 200.0
+    QUERY_STATS_MAX_FINGERPRINTS: int = 1000
+    QUERY_BUDGET: int = 0
+    QUERY_BUDGET_MODE: Literal["warn", "raise"] = "warn"
+    QUERY_REPEAT_THRESHOLD: int = 5
+    QUERY_DEBUG_HEADERS: bool = False
+    METRICS_ENABLED: bool = True
+    METRICS_TOKEN: str = ""
+    SERVER_TIMING_ENABLED: bool = False
+    EXPLAIN_ENABLED: bool = True
+    EXPLAIN_THRESHOLD_MS: float = 500.0
+    EXPLAIN_INTERVAL: float = 300.0
+    EXPLAIN_MAX_PLANS: int = 100
+    EXPLAIN_ANALYZE: bool = False
 
 
 class MiddlewareSettings:
@@ -112,6 +162,25 @@ class APISettings(EnvSettings):
 class FixturesSettings:
     """Settings for loading fixture data from files."""
     FIXTURES_PATH = PROJECT_PATH / "src" / "fixtures"
+    FIXTURES_CHUNK_SIZE = 10000
+
+
+class AdvertisementSettings(EnvSettings):
+    """Settings for the advertisement batch reads, change feed, event stream and view statistics."""
+    BATCH_MAX_IDS: int = 100
+    CHANGES_PAGE_SIZE: int = 100
+    CHANGES_MAX_PAGE_SIZE: int = 1000
+    # Changes younger than this are held back, so rows of transactions still committing are not skipped
+    CHANGES_LAG_SECONDS: float = 1.0
+    STREAM_QUEUE_SIZE: int = 100
+    STREAM_HEARTBEAT_SECONDS: float = 15.0
+    STREAM_CONNECT_TIMEOUT: float = 5.0
+    STREAM_RECONNECT_SECONDS: float = 1.0
+    VIEW_FLUSH_INTERVAL: float = 5.0
+    VIEW_BUFFER_MAX_KEYS: int = 10000
+    VIEW_BUFFER_MAX_PENDING_KEYS: int = 100000
+    VIEW_ROLLUP_INTERVAL: float = 300.0
+    VIEW_STATS_MAX_BUCKETS: int = 1000
 
 
 class AuthSettings(EnvSettings):
@@ -119,22 +188,80 @@ class AuthSettings(EnvSettings):
     SECRET_MANAGER: str
     SECRET_JWT: str
     VERIFY_TOKEN_EXPIRATION: int
+    VERIFY_RESEND_COOLDOWN: int = 60
     VERIFY_REDIRECT: str = "http://localhost:8080/docs"
 
+    @model_validator(mode="after")
+    def check_resend_cooldown(self):
+        """Ensures a token reused within the cooldown is still valid."""
+        if self.VERIFY_RESEND_COOLDOWN >= self.VERIFY_TOKEN_EXPIRATION:
+            raise ValueError("VERIFY_RESEND_COOLDOWN must be shorter than VERIFY_TOKEN_EXPIRATION")
+        return self
+
 
 class Settings():
-    """Container class to group all application settings."""
-    api = APISettings()
-    auth = AuthSettings()
-    admin = AdminSettings()
-    database = DatabaseSettings()
-    middleware = MiddlewareSettings()
-    fixtures = FixturesSettings()
-    mail = MailSettings()
-    celery = CelerySettings()
-    test_database = TestDatabaseSettings()
-    test = TestSettings()
-    log = LoggingSettings()
-
-
-settings = Settings()  # Instantiate the settings class to access all configurations.
\ No newline at end of file
+    """
+    Container class to group all application settings.
+
+    Each group is created on first access, so a process only validates the 
+    settings it uses.
+    """
+
+    @cached_property
+    def api(self) -> APISettings:
+        return APISettings()
+
+    @cached_property
+    def auth(self) -> AuthSettings:
+        return AuthSettings()
+
+    @cached_property
+    def advertisement(self) -> AdvertisementSettings:
+        return AdvertisementSettings()
+
+    @cached_property
+    def admin(self) -> AdminSettings:
+        return AdminSettings()
+
+    @cached_property
+    def database(self) -> DatabaseSettings:
+        return DatabaseSettings()
+
+    @cached_property
+    def middleware(self) -> MiddlewareSettings:
+        return MiddlewareSettings()
+
+    @cached_property
+    def fixtures(self) -> FixturesSettings:
+        return FixturesSettings()
+
+    @cached_property
+    def mail(self) -> MailSettings:
+        return MailSettings()
+
+    @cached_property
+    def celery(self) -> CelerySettings:
+        return CelerySettings()
+
+    @cached_property
+    def outbox(self) -> OutboxSettings:
+        return OutboxSettings()
+
+    @cached_property
+    def test_database(self) -> TestDatabaseSettings:
+        return TestDatabaseSettings()
+
+    @cached_property
+    def test(self) -> TestSettings:
+        return TestSettings()
+
+    @cached_property
+    def log(self) -> LoggingSettings:
+        return LoggingSettings()
+
+    @cached_property
+    def monitoring(self) -> MonitoringSettings:
+        return MonitoringSettings()
+
+
+settings = Settings()  # Instantiate the settings class to access all configurations.
@@ -0,0 +1,28 @@
+import base64
+import json
+from datetime import datetime
+
+from starlette.exceptions import HTTPException
+
+
+def encode_cursor(values: list) -> str:
+    """Encodes the sort key of a row into an opaque URL-safe cursor."""
+    def default(value):
+        return value.isoformat() if isinstance(value, datetime) else str(value)
+    return base64.urlsafe_b64encode(json.dumps(values, default=default).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> list:
+    """
+    Decodes a cursor made by `encode_cursor`.
+
+    Raises:
+        HTTPException: If the cursor is malformed, a 400 error is raised.
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(values, list) or len(values) != 2:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
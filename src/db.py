@@ -1,33 +1,63 @@
 from typing import AsyncGenerator
-from time import time
+from time import perf_counter
 
 from fastapi import Depends
 from fastapi_users_db_sqlalchemy import SQLAlchemyUserDatabase
 
 from sqlalchemy import event
 from sqlalchemy.engine import Engine
-from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.engine import Connection
 from sqlalchemy.engine.interfaces import DBAPICursor, _DBAPIAnyExecuteParams
 from sqlalchemy.engine.interfaces import ExecutionContext
 
 from config import settings
 from logger import db_query_logger
+from monitoring.queries import query_stats
+from monitoring.metrics import metrics_registry, MetricFamily
+from monitoring.explain import explain_capture, SKIP_MONITORING
+from monitoring.requests import record_query
 from user.models import User
 
 
 test_db_settings = settings.test_database
 db_settings = settings.database
 test_settings = settings.test
+monitoring_settings = settings.monitoring
 
-if test_settings.IS_TESTING:
-    engine = create_async_engine(test_db_settings.DATABASE_URL_ASYNC)
-else:
-    engine = create_async_engine(db_settings.DATABASE_URL_ASYNC)
-    
+
+def create_db_engine(**kwargs) -> AsyncEngine:
+    """
+    Creates an asynchronous engine for the application or, when testing, the test database.
+
+    Args:
+        **kwargs: Extra engine options, such as the pool size, passed to `create_async_engine`.
+
+    Returns:
+        AsyncEngine: The asynchronous database engine.
+    """
+    if test_settings.IS_TESTING:
+        return create_async_engine(test_db_settings.DATABASE_URL_ASYNC, **kwargs)
+    return create_async_engine(db_settings.DATABASE_URL_ASYNC, **kwargs)
+
+
+engine = create_db_engine()
 async_session_maker = async_sessionmaker(engine, expire_on_commit=False)
 
 
+def collect_pool_metrics() -> list[MetricFamily]:
+    """Collects the connection pool statistics of the application engine."""
+    pool = engine.pool
+    return [
+        ("db_pool_size", "gauge", "Number of connections the pool keeps open.", [({}, pool.size())]),
+        ("db_pool_checked_out", "gauge", "Number of connections in use.", [({}, pool.checkedout())]),
+        ("db_pool_overflow", "gauge", "Number of connections open beyond the pool size.", [({}, max(pool.overflow(), 0))]),
+    ]
+
+
+metrics_registry.add_collector(collect_pool_metrics)
+
+
 @event.listens_for(Engine, "before_cursor_execute")
 def before_cursor_execute(
     conn: Connection,
@@ -40,8 +70,7 @@ def before_cursor_execute(
     """
     Event listener that is called before executing a cursor operation.
 
-    This function logs the start time of the query and the SQL statement 
-    along with its parameters before the execution of the query starts, 
+    This function stores the start time of the query in the execution context, 
     allowing for tracing of query performance.
 
     Args:
@@ -54,9 +83,7 @@ def before_cursor_execute(
                                             the execution lifecycle.
         executemany (bool): A flag indicating whether the execution is for multiple statements.
     """
-    context._query_start_time = time()
-    db_query_logger.debug("Start Query:\n%s" % statement)
-    db_query_logger.debug("Parameters:\n%r" % (parameters,))
+    context._query_start_time = perf_counter()
 
 
 @event.listens_for(Engine, "after_cursor_execute")
@@ -71,8 +98,14 @@ def after_cursor_execute(
     """
     Event listener that is called after executing a cursor operation.
 
-    This function logs the total time taken for the query execution and marks 
-    the completion of the query, allowing for performance tracking.
+    This function records the time taken for the query execution and the number 
+    of rows in the statistics of the query fingerprint and counts the query in 
+    the current request. Queries slower than `SLOW_QUERY_THRESHOLD_MS` are logged 
+    along with their parameters, and the plans of queries slower than 
+    `EXPLAIN_THRESHOLD_MS` are captured with the engine of the connection, so 
+    queries of other engines, such as the one of the Celery task runner, are 
+    explained on their own pool and event loop. Connections with the 
+    `skip_monitoring` execution option are ignored.
 
     Args:
         conn (Connection): The database connection being used.
@@ -83,9 +116,17 @@ def after_cursor_execute(
                                     used to retrieve any information stored during execution.
         executemany (bool): A flag indicating whether the execution was for multiple statements.
     """
-    total = time() - context._query_start_time
-    db_query_logger.debug("Query Complete!\n\n")
-    db_query_logger.debug("Total Time: %.02fms" % (total * 1000))
+    if context.execution_options.get(SKIP_MONITORING):
+        return
+    duration_ms = (perf_counter() - context._query_start_time) * 1000
+    query_stats.record(statement, duration_ms, cursor.rowcount)
+    record_query(statement, duration_ms)
+    if duration_ms >= monitoring_settings.SLOW_QUERY_THRESHOLD_MS:
+        db_query_logger.warning(
+            "Slow query (%.02fms, %d rows):\n%s\nParameters:\n%r", duration_ms, cursor.rowcount, statement, parameters
+        )
+    if monitoring_settings.EXPLAIN_ENABLED and not executemany:
+        explain_capture.maybe_capture(AsyncEngine(conn.engine), statement, parameters, duration_ms)
 
 
 async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
@@ -1,38 +1,212 @@
+import argparse
+import asyncio
+import csv
+import hashlib
+from itertools import islice
 from pathlib import Path
+from time import perf_counter
+from typing import Iterator
 
-import pandas as pd
+from sqlalchemy import select, text
+from sqlalchemy.dialects.postgresql import insert
 
+from config import settings
+from db import engine
 from logger import app_logger as logger
-from advertisement.schemas import AdvertisementCreate
 from advertisement.models import Advertisement
-from advertisement.service import get_advertisements_all, create_advertisement
+from fixtures.models import FixtureLoad
 
 
-async def load_advertisement_fixture(file_path: Path | str):
+# Temporary table each chunk of the CSV is copied into before it is merged
+STAGING_TABLE = "advertisement_staging"
+STAGING_COLUMNS = ("line", "title", "author", "views_count", "position")
+
+CREATE_STAGING_TABLE = text(f"""
+    CREATE TEMPORARY TABLE IF NOT EXISTS {STAGING_TABLE} (
+        line bigint, title text, author text, views_count integer, position integer
+    )
+""")
+
+# Inserts the staged rows in the file order, the first of the duplicates wins
+MERGE_STAGING_TABLE = text(f"""
+    INSERT INTO advertisement (title, author, views_count, position)
+    SELECT title, author, views_count, position
+    FROM {STAGING_TABLE}
+    ORDER BY line
+    ON CONFLICT (fingerprint) DO NOTHING
+""")
+
+
+def read_advertisement_rows(file_path: Path | str, stats: dict) -> Iterator[tuple]:
+    """
+    Streams the valid advertisement rows of a CSV file.
+
+    Rows with missing or malformed values, or with a title longer than the column 
+    allows, are skipped and counted in `stats["skipped"]`.
+
+    Args:
+        file_path (Path | str): The path to the CSV file with the `title`, `author`, 
+                                `views_count` and `position` columns.
+        stats (dict): The load statistics updated with the number of read and skipped rows.
+
+    Yields:
+        tuple: The line number, title, author, views count and position of a row.
+    """
+    max_title_length = Advertisement.__table__.c.title.type.length
+    with open(file_path, newline="", encoding="utf-8") as file:
+        for line, row in enumerate(csv.DictReader(file), start=1):
+            stats["read"] += 1
+            try:
+                title, author = row["title"], row["author"]
+                views_count = int(row["views_count"] or 0)
+                position = int(row["position"]) if row["position"] else None
+            except (KeyError, TypeError, ValueError):
+                stats["skipped"] += 1
+                continue
+            if not title or not author or len(title) > max_title_length:
+                stats["skipped"] += 1
+                continue
+            yield line, title, author, views_count, position
+
+
+async def load_advertisement_fixture(file_path: Path | str, chunk_size: int | None = None) -> dict:
     """
-    Asynchronously loads data from a CSV file located at the given file path and creates new advertisements if they do not already exist.
+    Asynchronously loads advertisements from a CSV file, skipping those whose author and title already exist.
+
+    The file is streamed in chunks, so memory stays bounded whatever its size. 
+    Each chunk is copied into a temporary staging table with `COPY` and merged 
+    into the advertisement table with a single `INSERT ... SELECT`, which skips 
+    duplicates through the unique fingerprint index.
 
     Args:
         file_path (Path | str): The path to the CSV file containing the data to be loaded.
+        chunk_size (int | None): The number of rows per chunk. Defaults to `FIXTURES_CHUNK_SIZE`.
 
     Returns:
-        None
+        dict: The number of read, inserted and skipped rows, the duration in seconds 
+              and the rows read per second.
     """
+    chunk_size = chunk_size or settings.fixtures.FIXTURES_CHUNK_SIZE
     logger.debug(f"Loading data from {file_path}")
-    df = pd.read_csv(file_path)
-    all_advertisements = await get_advertisements_all()
-    all_adv_hashes = {hash(adv) for adv in all_advertisements}
-    
-    for _, row in df.iterrows():
-        data = {
-            'id': row['id'],
-            'title': row['title'],
-            'author': row['author'],
-            'views_count': row['views_count'],
-            'position': row['position']
-        }
-        advertisement = Advertisement(**data)
-        if hash(advertisement) not in all_adv_hashes:
-            await create_advertisement(AdvertisementCreate(**data))
-        
-        
\ No newline at end of file
+    stats = {"read": 0, "inserted": 0, "skipped": 0}
+    started_at = perf_counter()
+
+    async with engine.connect() as connection:
+        await connection.execute(CREATE_STAGING_TABLE)
+        await connection.commit()
+        raw_connection = await connection.get_raw_connection()
+
+        rows = read_advertisement_rows(file_path, stats)
+        while chunk := list(islice(rows, chunk_size)):
+            await raw_connection.driver_connection.copy_records_to_table(
+                STAGING_TABLE, records=chunk, columns=STAGING_COLUMNS
+            )
+            result = await connection.execute(MERGE_STAGING_TABLE)
+            await connection.execute(text(f"TRUNCATE {STAGING_TABLE}"))
+            await connection.commit()
+            stats["inserted"] += result.rowcount
+            logger.debug(f"Loaded {stats['read']} rows from {file_path}")
+
+    stats["seconds"] = perf_counter() - started_at
+    stats["rows_per_second"] = stats["read"] / stats["seconds"] if stats["seconds"] else 0.0
+    logger.info(
+        f"Loaded {file_path}: {stats['read']} rows read, {stats['inserted']} inserted, "
+        f"{stats['skipped']} skipped in {stats['seconds']:.2f}s ({stats['rows_per_second']:.0f} rows/s)"
+    )
+    return stats
+
+
+def file_checksum(file_path: Path | str) -> str:
+    """
+    Computes the SHA-256 checksum of a file without reading it into memory at once.
+
+    Args:
+        file_path (Path | str): The path to the file.
+
+    Returns:
+        str: The hexadecimal checksum.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as file:
+        while block := file.read(1024 * 1024):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+async def get_loaded_checksum(name: str) -> str | None:
+    """
+    Asynchronously retrieves the checksum of the last loaded version of a fixture.
+
+    Args:
+        name (str): The name of the fixture.
+
+    Returns:
+        str | None: The checksum, or None if the fixture was never loaded.
+    """
+    async with engine.connect() as connection:
+        result = await connection.execute(select(FixtureLoad.checksum).where(FixtureLoad.name == name))
+        return result.scalar_one_or_none()
+
+
+async def load_advertisement_fixture_once(file_path: Path | str) -> dict | None:
+    """
+    Asynchronously loads the advertisement fixture unless this version of the file was loaded already.
+
+    Processes starting together, such as the workers of one server, check the 
+    recorded checksum first and skip without a lock when it matches. Otherwise 
+    they queue on a Postgres advisory lock, so exactly one of them loads the file 
+    while the others wait, find the new checksum and skip.
+
+    Args:
+        file_path (Path | str): The path to the CSV file containing the data to be loaded.
+
+    Returns:
+        dict | None: The load statistics, or None if the file was loaded already.
+    """
+    name = Path(file_path).name
+    checksum = await asyncio.to_thread(file_checksum, file_path)
+    if await get_loaded_checksum(name) == checksum:
+        logger.debug(f"Fixture {name} is up to date, skipping")
+        return None
+
+    async with engine.connect() as lock_connection:
+        # A session-level lock is held until it is released, whatever the transactions in between
+        await lock_connection.execute(text("SELECT pg_advisory_lock(hashtext(:key))"), {"key": f"fixture:{name}"})
+        await lock_connection.commit()
+        try:
+            if await get_loaded_checksum(name) == checksum:
+                logger.debug(f"Fixture {name} was loaded by another process, skipping")
+                return None
+            stats = await load_advertisement_fixture(file_path)
+            async with engine.begin() as connection:
+                values = {"name": name, "checksum": checksum, "rows": stats["read"]}
+                await connection.execute(
+                    insert(FixtureLoad).values(**values).on_conflict_do_update(
+                        index_elements=[FixtureLoad.name],
+                        set_={"checksum": checksum, "rows": stats["read"], "loaded_at": text("TIMEZONE('utc', now())")},
+                    )
+                )
+            return stats
+        finally:
+            await lock_connection.execute(text("SELECT pg_advisory_unlock(hashtext(:key))"), {"key": f"fixture:{name}"})
+            await lock_connection.commit()
+
+
+async def main(file_path: Path, chunk_size: int | None):
+    """Loads the file and releases the database connections."""
+    try:
+        stats = await load_advertisement_fixture(file_path, chunk_size=chunk_size)
+        print(
+            f"{stats['read']} rows read, {stats['inserted']} inserted, {stats['skipped']} skipped "
+            f"in {stats['seconds']:.2f}s ({stats['rows_per_second']:.0f} rows/s)"
+        )
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load advertisements from a CSV file.")
+    parser.add_argument("file_path", type=Path, help="The CSV file with title, author, views_count and position columns.")
+    parser.add_argument("--chunk-size", type=int, default=None, help="The number of rows copied per chunk.")
+    arguments = parser.parse_args()
+    asyncio.run(main(arguments.file_path, arguments.chunk_size))
@@ -0,0 +1,21 @@
+from datetime import datetime
+
+from sqlalchemy import String, Integer, text
+from sqlalchemy.orm import Mapped, mapped_column
+
+from base import Base
+
+
+class FixtureLoad(Base):
+    """Model recording the checksum of the last loaded version of a fixture file."""
+    __tablename__ = "fixture_load"
+    __table_args__ = {'extend_existing': True}
+
+    name: Mapped[str] = mapped_column(String(255), primary_key=True)
+
+    checksum: Mapped[str] = mapped_column(String(64))
+    rows: Mapped[int] = mapped_column(Integer, default=0)  # Rows read from the file
+    loaded_at: Mapped[datetime] = mapped_column(server_default=text("TIMEZONE('utc', now())"))
+
+    def __str__(self):
+        return f"{self.name} ({self.checksum[:12]})"
@@ -1,5 +1,11 @@
+import atexit
+import copy
+import json
 import logging
-from logging.handlers import RotatingFileHandler
+import os
+import queue
+import random
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 
 from config import settings
 
@@ -17,58 +23,169 @@ def create_log_files_if_not_exist():
         log_settings.LOG_PATH.mkdir(parents=True)
 
 
-def setup_logger(logger_name: str, filename: str = 'app.log'):
+class JsonFormatter(logging.Formatter):
+    """Formats log records as single-line JSON objects."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "logger": record.name,
+            "level": record.levelname,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc_info"] = record.exc_text
+        if record.stack_info:
+            entry["stack_info"] = self.formatStack(record.stack_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class RecordQueueHandler(QueueHandler):
     """
-    Sets up a logger with a file handler that rotates logs.
+    Queue handler that keeps the exception and stack of a record as separate text.
+
+    The base handler merges them into the message, which would leave JSON log 
+    lines without their `exc_info` and `stack_info` fields.
+    """
+
+    exception_formatter = logging.Formatter()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.message = record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            # Tracebacks cannot be pickled, their text can
+            record.exc_text = self.exception_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
 
-    This function configures a logger with a specified name, setting its level 
-    to DEBUG. If the log files do not exist, it creates them. It also configures 
-    a rotating file handler that limits the size of the log file and keeps a 
-    backup count of previous log files.
+
+class SamplingFilter(logging.Filter):
+    """
+    Passes only a share of the records below WARNING, to keep high-volume loggers cheap.
 
     Args:
-        logger_name (str): The name of the logger to be created
-        filename (str, optional): The name of the log file. Defaults to 'app.log'.
+        rate (float): The share of records to keep, between 0 and 1.
     """
-    logger = logging.getLogger(logger_name)
-    logger.setLevel(logging.DEBUG)
 
-    log_settings = settings.log
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
 
-    create_log_files_if_not_exist()
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno >= logging.WARNING or random.random() < self.rate
 
-    if not (log_settings.LOG_PATH / filename).exists():
-        (log_settings.LOG_PATH / filename).touch()
-        
-    file_handler = RotatingFileHandler(filename=log_settings.LOG_PATH / filename, maxBytes=5*1024*1024, backupCount=2)
-    file_handler.setLevel(logging.DEBUG)
 
-    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-    file_handler.setFormatter(formatter)
+class LogPipeline:
+    """
+    Moves log file writes off the calling thread.
 
-    logger.addHandler(file_handler)
+    Loggers only put records into a queue through a `RecordQueueHandler`. A single 
+    `QueueListener` thread takes them from the queue and writes them to the 
+    rotating log files, each file receiving the records of its own logger.
+    """
 
-    return logger
+    def __init__(self):
+        self.queue: queue.SimpleQueue = queue.SimpleQueue()
+        self.queue_handlers: list[QueueHandler] = []
+        self.file_handlers: list[logging.Handler] = []
+        self.listener: QueueListener | None = None
+
+    def add_logger(self, logger: logging.Logger, filename: str):
+        """
+        Routes the records of the logger to the given log file through the queue.
+
+        Args:
+            logger (logging.Logger): The logger to route.
+            filename (str): The name of the log file in the log directory.
+        """
+        log_settings = settings.log
+
+        file_handler = RotatingFileHandler(
+            filename=log_settings.LOG_PATH / filename,
+            maxBytes=log_settings.LOG_MAX_BYTES,
+            backupCount=log_settings.LOG_BACKUP_COUNT,
+            encoding="utf-8",
+            delay=True,
+        )
+        if log_settings.LOG_JSON:
+            file_handler.setFormatter(JsonFormatter())
+        else:
+            file_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+        file_handler.addFilter(logging.Filter(logger.name))
+        self.file_handlers.append(file_handler)
+
+        queue_handler = RecordQueueHandler(self.queue)
+        logger.addHandler(queue_handler)
+        self.queue_handlers.append(queue_handler)
+        if self.listener is not None:
+            self.listener.handlers = tuple(self.file_handlers)
+
+    def start(self):
+        """Starts the listener thread that writes the queued records."""
+        if self.listener is None:
+            self.listener = QueueListener(self.queue, *self.file_handlers, respect_handler_level=True)
+            self.listener.start()
+
+    def stop(self):
+        """Writes the queued records and stops the listener thread."""
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+
+    def after_fork(self):
+        """Gives a forked child process its own queue and listener thread."""
+        self.queue = queue.SimpleQueue()
+        for queue_handler in self.queue_handlers:
+            queue_handler.queue = self.queue
+        self.listener = None
+        self.start()
+
+
+log_pipeline = LogPipeline()
+atexit.register(log_pipeline.stop)
+# Threads do not survive fork, so Celery and Gunicorn worker processes need their own listener
+os.register_at_fork(after_in_child=log_pipeline.after_fork)
+
+
+def setup_logger(logger_name: str, filename: str = 'app.log', level: str = 'DEBUG', sample_rate: float = 1.0):
+    """
+    Sets up a logger that writes to a rotating log file on a background thread.
 
+    This function configures a logger with a specified name and level. The log 
+    file is opened on the first record written to it. Records are handed to the 
+    log pipeline queue, so the calling thread never waits for file writes or rotations.
 
-def clear_log_files():
+    Args:
+        logger_name (str): The name of the logger to be created
+        filename (str, optional): The name of the log file. Defaults to 'app.log'.
+        level (str, optional): The minimum level of the logged records. Defaults to 'DEBUG'.
+        sample_rate (float, optional): The share of records below WARNING to keep. Defaults to 1.0.
     """
-    Clears all log files in the specified log directory.
+    logger = logging.getLogger(logger_name)
+    logger.setLevel(level.upper())
 
-    Parameters:
-        None
+    create_log_files_if_not_exist()
 
-    Returns:
-        None
-    """
-    log_settings = settings.log
-    for file in log_settings.LOG_PATH.glob('*.log'):
-        with open (file, 'w') as f:
-            f.write('')
+    if sample_rate < 1:
+        logger.addFilter(SamplingFilter(sample_rate))
+
+    log_pipeline.add_logger(logger, filename)
+
+    return logger
 
 
-clear_log_files()
-app_logger = setup_logger(logger_name='AppLogger')
-db_query_logger = setup_logger(logger_name='DBQueryLogger', filename='db.log')
-celery_logger = setup_logger(logger_name='CeleryLogger', filename='celery.log')
-test_logger = setup_logger(logger_name='TestLogger', filename='test.log')
+log_settings = settings.log
+app_logger = setup_logger(
+    logger_name='AppLogger', level=log_settings.LOG_LEVEL_APP, sample_rate=log_settings.LOG_SAMPLE_RATE_APP
+)
+db_query_logger = setup_logger(
+    logger_name='DBQueryLogger', filename='db.log', 
+    level=log_settings.LOG_LEVEL_DB, sample_rate=log_settings.LOG_SAMPLE_RATE_DB
+)
+celery_logger = setup_logger(logger_name='CeleryLogger', filename='celery.log', level=log_settings.LOG_LEVEL_CELERY)
+test_logger = setup_logger(logger_name='TestLogger', filename='test.log', level=log_settings.LOG_LEVEL_TEST)
+log_pipeline.start()
@@ -15,5 +15,6 @@ mail_config = ConnectionConfig(
     MAIL_PORT=mail_settings.MAIL_PORT,
     MAIL_SERVER=mail_settings.MAIL_SERVER,
     MAIL_SSL_TLS=bool(mail_settings.MAIL_SSL),
-    USE_CREDENTIALS=True
+    USE_CREDENTIALS=True,
+    SUPPRESS_SEND=int(mail_settings.MAIL_SUPPRESS_SEND),
 )
\ No newline at end of file
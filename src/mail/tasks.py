@@ -1,13 +1,17 @@
 import asyncio
+from email.message import EmailMessage
+from time import monotonic
 
+from aiosmtplib import SMTP, SMTPRecipientsRefused
 from fastapi_mail import FastMail, MessageSchema
 
-from tasks_celery import celery_app
+from config import settings
+from tasks_celery import async_task
 from logger import celery_logger as logger
 from mail.mail import mail_config
 
-@celery_app.task
-def send_email(subject: str, recipients: list[str], body: str):
+@async_task
+async def send_email(subject: str, recipients: list[str], body: str):
     """
     Asynchronously sends an email to the specified recipients using FastMail within a Celery task.
 
@@ -33,8 +37,109 @@ def send_email(subject: str, recipients: list[str], body: str):
 
     fm = FastMail(mail_config)
 
-    loop = asyncio.get_event_loop()
     try:
-        loop.run_until_complete(fm.send_message(message))
+        await fm.send_message(message)
     except Exception as e:
         logger.error(f"Error sending email with subject {subject} to {recipients}: {e}")
+
+
+async def _send_messages(messages: list[dict], rate_limit: float) -> dict:
+    """
+    Sends the given messages over a single SMTP connection, pacing them to the rate limit.
+
+    Args:
+        messages (list[dict]): Messages with `subject`, `recipients` and `body` keys.
+        rate_limit (float): The maximum number of messages sent per second, 0 disables pacing.
+
+    Returns:
+        dict: A summary with the number of recipients, the recipients the server accepted and the per-recipient failures.
+    """
+    summary = {"total": 0, "sent": 0, "failed": []}
+    interval = 1 / rate_limit if rate_limit > 0 else 0
+    next_send_at = monotonic()
+
+    smtp = SMTP(
+        hostname=mail_config.MAIL_SERVER,
+        port=mail_config.MAIL_PORT,
+        username=mail_config.MAIL_USERNAME if mail_config.USE_CREDENTIALS else None,
+        password=mail_config.MAIL_PASSWORD if mail_config.USE_CREDENTIALS else None,
+        timeout=mail_config.TIMEOUT,
+        use_tls=mail_config.MAIL_SSL_TLS,
+        start_tls=mail_config.MAIL_STARTTLS,
+        validate_certs=mail_config.VALIDATE_CERTS,
+    )
+    if not mail_config.SUPPRESS_SEND:
+        await smtp.connect()
+    try:
+        for message in messages:
+            subject, recipients = message["subject"], message["recipients"]
+            summary["total"] += len(recipients)
+            delay = next_send_at - monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            next_send_at = max(next_send_at, monotonic()) + interval
+
+            email = EmailMessage()
+            email["Subject"] = subject
+            email["From"] = mail_config.MAIL_FROM
+            email["To"] = ", ".join(recipients)
+            email.set_content(message["body"], subtype="html")
+            try:
+                refused = {}
+                if not mail_config.SUPPRESS_SEND:
+                    refused, _ = await smtp.send_message(email)
+            except SMTPRecipientsRefused as e:
+                refused = {error.recipient: error for error in e.recipients}
+            except Exception as e:
+                refused = {recipient: e for recipient in recipients}
+
+            for recipient, error in refused.items():
+                summary["failed"].append({"recipient": recipient, "subject": subject, "error": str(error)})
+            summary["sent"] += len(recipients) - len(refused)
+    finally:
+        if smtp.is_connected:
+            try:
+                await smtp.quit()
+            except Exception:
+                smtp.close()
+
+    return summary
+
+
+@async_task
+async def send_bulk_email(messages: list[dict], rate_limit: float | None = None) -> dict:
+    """
+    Sends a batch of emails over one SMTP connection within a single Celery task.
+
+    Messages are paced to at most `rate_limit` messages per second. A failure for 
+    one recipient does not stop the batch: it is recorded in the returned summary 
+    and the remaining recipients and messages are still sent.
+
+    Args:
+        messages (list[dict]): Messages with `subject`, `recipients` and `body` keys.
+        rate_limit (float | None): Messages per second. Defaults to `MAIL_RATE_LIMIT`.
+
+    Returns:
+        dict: A summary with the `total` and `sent` numbers of recipients and a 
+              `failed` list of `{recipient, subject, error}` entries.
+    """
+    if rate_limit is None:
+        rate_limit = settings.mail.MAIL_RATE_LIMIT
+    logger.info(f"Sending {len(messages)} emails at up to {rate_limit} messages per second")
+
+    try:
+        summary = await _send_messages(messages, rate_limit)
+    except Exception as e:
+        logger.error(f"Error sending bulk email batch of {len(messages)} messages: {e}")
+        summary = {
+            "total": sum(len(message["recipients"]) for message in messages),
+            "sent": 0,
+            "failed": [
+                {"recipient": recipient, "subject": message["subject"], "error": str(e)}
+                for message in messages for recipient in message["recipients"]
+            ],
+        }
+
+    for failure in summary["failed"]:
+        logger.error(f"Error sending email with subject {failure['subject']} to {failure['recipient']}: {failure['error']}")
+    return summary
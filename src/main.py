@@ -2,25 +2,34 @@ from contextlib import asynccontextmanager
 
 import uvicorn
 from fastapi import FastAPI, Depends
-from sqladmin import Admin
 
 from fastapi.middleware.cors import CORSMiddleware
-from admin.auth_backend import AdminAuth
-from advertisement.admin import AdvertisementAdmin
-from user.admin import UserAdmin
 
 from db import engine
 from logger import app_logger as logger
 from config import settings
+from tasks_dispatch import dispatcher
+from outbox.relay import outbox_relay
+from advertisement.events import advertisement_events
+from advertisement.view_stats import view_buffer
 
 from auth.router import router as auth_router
 from auth.base_config import verify_user
-from fixtures.loader import load_advertisement_fixture
 from advertisement.router import router as advertisement_router
+from monitoring.router import router as monitoring_router, metrics_router
+from monitoring.requests import QueryCountMiddleware
+from monitoring.metrics import MetricsMiddleware
+from monitoring.timing import ServerTimingMiddleware
 
 
 async def init_admin():
     """Initialize the admin interface with authentication and views."""
+    # Imported here to keep sqladmin and its templates off the import path of workers
+    from sqladmin import Admin
+    from admin.auth_backend import AdminAuth
+    from advertisement.admin import AdvertisementAdmin
+    from user.admin import UserAdmin
+
     admin_settings = settings.admin
     admin = Admin(
         app=app,
@@ -35,14 +44,26 @@ async def init_admin():
 async def start_up(app: FastAPI):
     """Perform startup procedures when the application starts."""
     logger.debug("App started")
-    # Load initial data for advertisements from the CSV file
-    await load_advertisement_fixture(file_path=settings.fixtures.FIXTURES_PATH / "data" / "advertisements.csv")
+    from fixtures.loader import load_advertisement_fixture_once
+
+    # Load initial data for advertisements from the CSV file, once per version of the file
+    await load_advertisement_fixture_once(file_path=settings.fixtures.FIXTURES_PATH / "data" / "advertisements.csv")
     await init_admin()
+    await dispatcher.start()
+    if settings.outbox.OUTBOX_RELAY_ENABLED:
+        outbox_relay.start()
+    view_buffer.start()
 
 
 async def shut_down(app: FastAPI):
     """Clean up resources on application shutdown."""
     logger.debug("Shutting down")
+    await outbox_relay.stop()
+    await advertisement_events.stop()
+    # Write the views counted since the last flush
+    await view_buffer.stop()
+    # Let the task backend finish the queued tasks
+    await dispatcher.stop()
 
 
 @asynccontextmanager
@@ -73,6 +94,21 @@ app.add_middleware(
 )
 
 
+# Count the queries of every request to catch N+1 patterns and query count regressions
+app.add_middleware(QueryCountMiddleware)
+
+
+# Count requests and measure their latency per route for the `/metrics` endpoint
+if settings.monitoring.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+    app.include_router(metrics_router, tags=["Monitoring"])
+
+
+# Break the latency of every request down into phases in the `Server-Timing` header
+if settings.monitoring.SERVER_TIMING_ENABLED:
+    app.add_middleware(ServerTimingMiddleware)
+
+
 # Include routers for advertisements and authentication
 app.include_router(
     advertisement_router,
@@ -85,6 +121,11 @@ app.include_router(
     tags=["Auth"], 
     prefix="/auth"
 )
+app.include_router(
+    monitoring_router,
+    tags=["Monitoring"],
+    prefix=f"/api/v{settings.api.API_VERSION}/monitoring"
+)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,140 @@
+import asyncio
+import re
+from collections import deque
+from contextvars import Context
+from datetime import datetime, timezone
+from time import monotonic
+
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from config import settings
+from logger import db_query_logger as logger
+from monitoring.queries import fingerprint
+
+
+# Execution option marking connections whose queries are not monitored, such as the EXPLAIN ones
+SKIP_MONITORING = "skip_monitoring"
+
+_EXPLAINABLE = re.compile(r"^\s*(SELECT|WITH|INSERT|UPDATE|DELETE)\b", re.IGNORECASE)
+_ANALYZABLE = re.compile(r"^\s*SELECT\b", re.IGNORECASE)
+_LOCKING = re.compile(r"\bFOR\s+(NO\s+KEY\s+)?(UPDATE|SHARE)\b", re.IGNORECASE)
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_CALL = re.compile(r"\b(\w+)\s*\(")
+# Keywords followed by parentheses, and functions without side effects, that a query may run under ANALYZE
+_SAFE_CALLS = frozenset({
+    "select", "from", "where", "and", "or", "not", "in", "any", "all", "exists", "as", "on", "join", "using",
+    "over", "filter", "values", "cast", "coalesce", "nullif", "greatest", "least",
+    "count", "sum", "min", "max", "avg", "row_number", "rank", "lower", "upper", "btrim", "length", "md5",
+})
+
+
+class ExplainCapture:
+    """
+    Captures the execution plans of slow queries in a bounded ring buffer.
+
+    A query over the threshold is explained again on a separate connection in 
+    the background, so the request that ran it is not delayed. Queries are only 
+    planned with `EXPLAIN`. With `analyze`, plain reads that call no function 
+    outside of `_SAFE_CALLS` are run with `EXPLAIN (ANALYZE, BUFFERS)` inside a 
+    transaction that is rolled back, since running a query again repeats side 
+    effects that a rollback does not undo, such as session advisory locks. Each 
+    fingerprint is captured at most once per interval and one capture runs at 
+    a time.
+
+    Args:
+        threshold_ms (float): The duration in milliseconds above which a query is captured.
+        interval (float): The minimal time in seconds between two captures of one fingerprint.
+        max_plans (int): The number of most recent plans kept.
+        analyze (bool): Whether to run the side-effect free reads with `ANALYZE`. Defaults to False.
+    """
+
+    def __init__(self, threshold_ms: float, interval: float, max_plans: int, analyze: bool = False):
+        self.threshold_ms = threshold_ms
+        self.interval = interval
+        self.analyze = analyze
+        self.plans: deque[dict] = deque(maxlen=max_plans)
+        self._captured_at: dict[str, float] = {}
+        self._task: asyncio.Task | None = None
+
+    def maybe_capture(self, engine: AsyncEngine, statement: str, parameters, duration_ms: float):
+        """
+        Schedules a capture of the plan of the query if it is slow and was not captured recently.
+
+        Args:
+            engine (AsyncEngine): The engine to open the separate connection with.
+            statement (str): The executed SQL statement.
+            parameters: The parameters passed to the statement.
+            duration_ms (float): The execution time in milliseconds.
+        """
+        if duration_ms < self.threshold_ms or not _EXPLAINABLE.match(statement):
+            return
+        if self._task is not None and not self._task.done():
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+
+        key = fingerprint(statement)
+        now = monotonic()
+        if now - self._captured_at.get(key, float("-inf")) < self.interval:
+            return
+        self._captured_at[key] = now
+        # Run outside of the request context, so the EXPLAIN is not counted as one of its queries
+        self._task = loop.create_task(self.capture(engine, statement, parameters, duration_ms), context=Context())
+
+    async def capture(self, engine: AsyncEngine, statement: str, parameters, duration_ms: float) -> dict | None:
+        """
+        Explains the query and stores its plan.
+
+        Args:
+            engine (AsyncEngine): The engine to open the separate connection with.
+            statement (str): The SQL statement to explain.
+            parameters: The parameters passed to the statement.
+            duration_ms (float): The execution time of the slow query in milliseconds.
+
+        Returns:
+            dict | None: The stored plan, or None if the query could not be explained.
+        """
+        analyze = self.analyze and self.is_analyzable(statement)
+        options = "ANALYZE, BUFFERS, FORMAT JSON" if analyze else "FORMAT JSON"
+        try:
+            async with engine.connect() as connection:
+                connection = await connection.execution_options(**{SKIP_MONITORING: True})
+                result = await connection.exec_driver_sql(f"EXPLAIN ({options}) {statement}", parameters or ())
+                plan = result.scalar_one()
+                await connection.rollback()
+        except Exception as error:
+            logger.warning(f"Failed to explain the slow query: {error}\n{statement}")
+            return None
+
+        entry = {
+            "fingerprint": fingerprint(statement),
+            "duration_ms": duration_ms,
+            "analyzed": analyze,
+            "captured_at": datetime.now(timezone.utc),
+            "plan": plan,
+        }
+        self.plans.append(entry)
+        return entry
+
+    @staticmethod
+    def is_analyzable(statement: str) -> bool:
+        """Returns whether the statement is a non-locking read calling only side-effect free functions."""
+        if not _ANALYZABLE.match(statement) or _LOCKING.search(statement):
+            return False
+        calls = _CALL.findall(_STRING_LITERAL.sub("''", statement))
+        return all(call.lower() in _SAFE_CALLS for call in calls)
+
+    def latest(self, limit: int) -> list[dict]:
+        """Returns the most recent plans, newest first."""
+        return list(reversed(self.plans))[:limit]
+
+
+monitoring_settings = settings.monitoring
+explain_capture = ExplainCapture(
+    threshold_ms=monitoring_settings.EXPLAIN_THRESHOLD_MS,
+    interval=monitoring_settings.EXPLAIN_INTERVAL,
+    max_plans=monitoring_settings.EXPLAIN_MAX_PLANS,
+    analyze=monitoring_settings.EXPLAIN_ANALYZE,
+)
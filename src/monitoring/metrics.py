@@ -0,0 +1,236 @@
+from bisect import bisect_left
+from time import perf_counter
+from typing import Callable, Iterable
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+# Upper bounds of the request latency histogram buckets, in seconds
+REQUEST_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, float("inf"))
+
+# A metric family produced by a collector: name, type, help and the (labels, value) samples
+MetricFamily = tuple[str, str, str, list[tuple[dict, float]]]
+
+
+def _escape(value) -> str:
+    """Escapes a label value for the Prometheus text format."""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: dict) -> str:
+    """Renders labels in the Prometheus text format."""
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    """Renders a sample value in the Prometheus text format."""
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """
+    Monotonic counter with labels, pre-aggregated in memory.
+
+    Args:
+        name (str): The metric name.
+        help (str): The metric description.
+        labelnames (tuple[str, ...]): The names of the labels.
+    """
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.values: dict[tuple, float] = {} if labelnames else {(): 0}
+
+    def inc(self, *labels: str, amount: float = 1):
+        """Increases the counter of the given label values."""
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def collect(self) -> Iterable[str]:
+        """Renders the counter in the Prometheus text format."""
+        for labels, value in list(self.values.items()):
+            yield f"{self.name}{_format_labels(dict(zip(self.labelnames, labels)))} {_format_value(value)}"
+
+
+class Gauge(Counter):
+    """Gauge with labels that can go up and down."""
+    type = "gauge"
+
+    def dec(self, *labels: str, amount: float = 1):
+        """Decreases the gauge of the given label values."""
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram:
+    """
+    Histogram with labels and fixed buckets, pre-aggregated in memory.
+
+    Args:
+        name (str): The metric name.
+        help (str): The metric description.
+        labelnames (tuple[str, ...]): The names of the labels.
+        buckets (tuple[float, ...]): The upper bounds of the buckets, ending with infinity.
+    """
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = (), buckets: tuple[float, ...] = REQUEST_LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self.values: dict[tuple, list] = {}
+
+    def observe(self, value: float, *labels: str):
+        """Adds an observation for the given label values."""
+        series = self.values.get(labels)
+        if series is None:
+            # Bucket counts followed by the sum of the observations
+            series = self.values.setdefault(labels, [0] * len(self.buckets) + [0.0])
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def collect(self) -> Iterable[str]:
+        """Renders the histogram in the Prometheus text format."""
+        for labels, series in list(self.values.items()):
+            yield from render_histogram(self.name, dict(zip(self.labelnames, labels)), self.buckets, series[:-1], series[-1])
+
+
+def render_histogram(name: str, labels: dict, buckets: tuple[float, ...], counts: list[int], total: float) -> Iterable[str]:
+    """
+    Renders histogram bucket counts in the Prometheus text format.
+
+    Args:
+        name (str): The metric name.
+        labels (dict): The labels of the series.
+        buckets (tuple[float, ...]): The upper bounds of the buckets.
+        counts (list[int]): The non-cumulative number of observations per bucket.
+        total (float): The sum of the observations.
+
+    Returns:
+        Iterable[str]: The lines of the series.
+    """
+    cumulative = 0
+    for upper, count in zip(buckets, counts):
+        cumulative += count
+        yield f"{name}_bucket{_format_labels({**labels, 'le': _format_value(upper)})} {cumulative}"
+    yield f"{name}_sum{_format_labels(labels)} {_format_value(float(total))}"
+    yield f"{name}_count{_format_labels(labels)} {cumulative}"
+
+
+class MetricsRegistry:
+    """
+    Metrics of this process exposed in the Prometheus text format.
+
+    Hot paths update pre-aggregated metrics without locks. Statistics that are 
+    already kept elsewhere, such as pool or cache counters, are read by 
+    collectors only when the metrics are scraped.
+    """
+
+    def __init__(self):
+        self.metrics: list[Counter | Histogram] = []
+        self.collectors: list[Callable[[], list[MetricFamily]]] = []
+        self.caches: dict[str, Callable[[], tuple[int, int]]] = {}
+
+    def register(self, metric: Counter | Histogram) -> Counter | Histogram:
+        """Registers a metric and returns it."""
+        self.metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector: Callable[[], list[MetricFamily]]):
+        """Registers a function that returns metric families when the metrics are scraped."""
+        self.collectors.append(collector)
+
+    def add_cache(self, name: str, counters: Callable[[], tuple[int, int]]):
+        """
+        Registers a cache whose hit rate is exposed as `cache_hits_total` and `cache_misses_total`.
+
+        Args:
+            name (str): The value of the `cache` label.
+            counters (Callable[[], tuple[int, int]]): A function returning the hits and misses of the cache.
+        """
+        self.caches[name] = counters
+
+    def _collect_caches(self) -> list[MetricFamily]:
+        """Collects the hits and misses of the registered caches."""
+        hits, misses = [], []
+        for name, counters in self.caches.items():
+            cache_hits, cache_misses = counters()
+            hits.append(({"cache": name}, cache_hits))
+            misses.append(({"cache": name}, cache_misses))
+        return [
+            ("cache_hits_total", "counter", "Number of cache lookups that found an entry.", hits),
+            ("cache_misses_total", "counter", "Number of cache lookups that found no entry.", misses),
+        ]
+
+    def render(self) -> str:
+        """Renders all the metrics in the Prometheus text format."""
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.collect())
+        for collector in [*self.collectors, self._collect_caches]:
+            for name, metric_type, help, samples in collector():
+                lines.append(f"# HELP {name} {help}")
+                lines.append(f"# TYPE {name} {metric_type}")
+                if metric_type == "histogram":
+                    for labels, (buckets, counts, total) in samples:
+                        lines.extend(render_histogram(name, labels, buckets, counts, total))
+                else:
+                    lines.extend(f"{name}{_format_labels(labels)} {_format_value(value)}" for labels, value in samples)
+        return "\n".join(lines) + "\n"
+
+
+metrics_registry = MetricsRegistry()
+
+http_requests_total = metrics_registry.register(Counter(
+    "http_requests_total", "Number of HTTP requests.", ("method", "route", "status")
+))
+http_request_duration_seconds = metrics_registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency in seconds.", ("method", "route")
+))
+http_requests_in_flight = metrics_registry.register(Gauge(
+    "http_requests_in_flight", "Number of HTTP requests being handled."
+))
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware that counts HTTP requests and measures their latency per route.
+
+    Requests are labelled with the route path template, so `/advertisement/{advertisement_id}` 
+    is one series whatever the id is.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started_at = perf_counter()
+        status = "500"
+
+        async def send_with_status(message: Message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        http_requests_in_flight.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            http_requests_in_flight.dec()
+            route = scope.get("route")
+            route_path = route.path if route is not None else "<unmatched>"
+            http_requests_total.inc(scope["method"], route_path, status)
+            http_request_duration_seconds.observe(perf_counter() - started_at, scope["method"], route_path)
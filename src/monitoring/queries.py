@@ -0,0 +1,201 @@
+import re
+from bisect import bisect_left
+from functools import lru_cache
+from threading import Lock
+
+from config import settings
+from monitoring.metrics import metrics_registry, MetricFamily
+
+
+# Upper bounds of the query latency histogram buckets, in milliseconds
+LATENCY_BUCKETS_MS = (0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, float("inf"))
+
+# Fingerprint under which queries are aggregated once the registry is full
+OTHER_FINGERPRINT = "<other>"
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+# Type casts, such as the `$1::INTEGER` rendered by the asyncpg dialect
+_CAST = re.compile(r"::\w+(?:\s*\(\s*\d+(?:\s*,\s*\d+)?\s*\))?(?:\[\])*")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PARAMETER = re.compile(r"\$\d+|%\(\w+\)s|%s|(?<!:):\w+|\?")
+_IN_LIST = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", re.IGNORECASE)
+_VALUES_LIST = re.compile(r"\bVALUES\s*(\([^()]*\))(?:\s*,\s*\([^()]*\))+", re.IGNORECASE)
+_WHITESPACE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=4096)
+def fingerprint(statement: str) -> str:
+    """
+    Normalizes an SQL statement, so that executions differing only in values share one fingerprint.
+
+    Literals and bound parameters are replaced with `?` and their type casts are 
+    dropped, `IN` lists and multi-row `VALUES` lists are collapsed, and whitespace 
+    is normalized.
+
+    Args:
+        statement (str): The SQL statement.
+
+    Returns:
+        str: The normalized statement.
+    """
+    normalized = _STRING_LITERAL.sub("?", statement)
+    normalized = _CAST.sub("", normalized)
+    normalized = _PARAMETER.sub("?", normalized)
+    normalized = _NUMBER_LITERAL.sub("?", normalized)
+    normalized = _IN_LIST.sub("IN (...)", normalized)
+    normalized = _VALUES_LIST.sub(r"VALUES \1, ...", normalized)
+    return _WHITESPACE.sub(" ", normalized).strip()
+
+
+class LatencyHistogram:
+    """Histogram of latencies over the fixed `LATENCY_BUCKETS_MS` buckets."""
+
+    def __init__(self):
+        self.buckets = [0] * len(LATENCY_BUCKETS_MS)
+        self.count = 0
+        self.total_ms = 0.0
+
+    def observe(self, duration_ms: float):
+        """Adds a latency to the histogram."""
+        self.buckets[bisect_left(LATENCY_BUCKETS_MS, duration_ms)] += 1
+        self.count += 1
+        self.total_ms += duration_ms
+
+    def percentile(self, q: float) -> float:
+        """
+        Estimates a latency percentile by interpolating inside the matching bucket.
+
+        Args:
+            q (float): The percentile as a share, for example 0.95.
+
+        Returns:
+            float: The estimated latency in milliseconds.
+        """
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        lower = 0.0
+        for upper, bucket_count in zip(LATENCY_BUCKETS_MS, self.buckets):
+            if bucket_count and seen + bucket_count >= rank:
+                if upper == float("inf"):
+                    return lower
+                return lower + (upper - lower) * (rank - seen) / bucket_count
+            seen += bucket_count
+            lower = upper
+        return lower
+
+
+class QueryStats:
+    """Aggregated executions of one query fingerprint."""
+
+    def __init__(self, fingerprint: str):
+        self.fingerprint = fingerprint
+        self.latency = LatencyHistogram()
+        self.max_ms = 0.0
+        self.rows = 0
+
+    def observe(self, duration_ms: float, rows: int):
+        """Adds one execution of the query."""
+        self.latency.observe(duration_ms)
+        self.max_ms = max(self.max_ms, duration_ms)
+        self.rows += max(rows, 0)
+
+    def to_dict(self) -> dict:
+        """Returns the aggregated statistics with latencies in milliseconds."""
+        count = self.latency.count
+        return {
+            "fingerprint": self.fingerprint,
+            "calls": count,
+            "total_ms": self.latency.total_ms,
+            "mean_ms": self.latency.total_ms / count if count else 0.0,
+            "p50_ms": self.latency.percentile(0.5),
+            "p95_ms": self.latency.percentile(0.95),
+            "p99_ms": self.latency.percentile(0.99),
+            "max_ms": self.max_ms,
+            "rows": self.rows,
+        }
+
+
+class QueryStatsRegistry:
+    """
+    Per-fingerprint query statistics of this process.
+
+    Args:
+        max_fingerprints (int): The number of fingerprints tracked separately, 
+                                the rest are aggregated under `<other>`.
+    """
+
+    def __init__(self, max_fingerprints: int):
+        self.max_fingerprints = max_fingerprints
+        self._stats: dict[str, QueryStats] = {}
+        self._lock = Lock()
+
+    def record(self, statement: str, duration_ms: float, rows: int):
+        """
+        Records one execution of the statement.
+
+        Args:
+            statement (str): The executed SQL statement.
+            duration_ms (float): The execution time in milliseconds.
+            rows (int): The number of returned or affected rows, negative if unknown.
+        """
+        key = fingerprint(statement)
+        stats = self._stats.get(key)
+        if stats is None:
+            with self._lock:
+                if key not in self._stats and len(self._stats) >= self.max_fingerprints:
+                    key = OTHER_FINGERPRINT
+                stats = self._stats.setdefault(key, QueryStats(key))
+        stats.observe(duration_ms, rows)
+
+    def top(self, limit: int, order_by: str = "total_ms") -> list[dict]:
+        """
+        Returns the statistics of the most expensive fingerprints.
+
+        Args:
+            limit (int): The number of fingerprints to return.
+            order_by (str): The statistic to sort by, in descending order.
+
+        Returns:
+            list[dict]: The statistics of the top fingerprints.
+        """
+        stats = [query_stats.to_dict() for query_stats in list(self._stats.values())]
+        return sorted(stats, key=lambda item: item[order_by], reverse=True)[:limit]
+
+    def latency(self) -> tuple[list[int], float]:
+        """
+        Returns the latency histogram of all the queries.
+
+        Returns:
+            tuple[list[int], float]: The number of queries per `LATENCY_BUCKETS_MS` 
+                                     bucket and their total time in milliseconds.
+        """
+        buckets = [0] * len(LATENCY_BUCKETS_MS)
+        total_ms = 0.0
+        for stats in list(self._stats.values()):
+            buckets = [count + bucket_count for count, bucket_count in zip(buckets, stats.latency.buckets)]
+            total_ms += stats.latency.total_ms
+        return buckets, total_ms
+
+    def reset(self):
+        """Forgets all the collected statistics."""
+        with self._lock:
+            self._stats = {}
+
+
+query_stats = QueryStatsRegistry(max_fingerprints=settings.monitoring.QUERY_STATS_MAX_FINGERPRINTS)
+
+
+def collect_query_metrics() -> list[MetricFamily]:
+    """Collects the query latency histogram of this process."""
+    buckets, total_ms = query_stats.latency()
+    latency_buckets = tuple(upper / 1000 for upper in LATENCY_BUCKETS_MS)
+    return [
+        ("db_query_duration_seconds", "histogram", "Database query latency in seconds.",
+         [({}, (latency_buckets, buckets, total_ms / 1000))]),
+    ]
+
+
+metrics_registry.add_collector(collect_query_metrics)
+metrics_registry.add_cache("query_fingerprint", lambda: fingerprint.cache_info()[:2])
@@ -0,0 +1,144 @@
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from config import settings
+from logger import app_logger as logger
+from monitoring.queries import fingerprint
+
+
+# Load monitoring settings from the application configuration
+monitoring_settings = settings.monitoring
+
+
+class QueryBudgetExceeded(Exception):
+    """Raised when a request runs more queries than `QUERY_BUDGET` allows."""
+    pass
+
+
+class QueryTracker:
+    """
+    Counts the queries run within a request or a `track_queries` block.
+
+    Trackers nest: a query is counted by the current tracker and all the trackers 
+    it was started in, so a test can wrap a request and see the queries counted 
+    by the middleware.
+    """
+
+    def __init__(self, parent: "QueryTracker | None" = None):
+        self.parent = parent
+        self.count = 0
+        self.total_ms = 0.0
+        self.fingerprints: Counter[str] = Counter()
+
+    def record(self, statement: str, duration_ms: float):
+        """Counts one executed statement."""
+        key = fingerprint(statement)
+        tracker = self
+        while tracker is not None:
+            tracker.count += 1
+            tracker.total_ms += duration_ms
+            tracker.fingerprints[key] += 1
+            tracker = tracker.parent
+
+    @property
+    def max_repeats(self) -> int:
+        """The number of executions of the most repeated fingerprint."""
+        return max(self.fingerprints.values(), default=0)
+
+    def repeated(self, threshold: int) -> list[tuple[str, int]]:
+        """
+        Returns the fingerprints executed at least `threshold` times, the usual sign of an N+1 pattern.
+
+        Args:
+            threshold (int): The minimal number of executions.
+
+        Returns:
+            list[tuple[str, int]]: The repeated fingerprints with their execution counts.
+        """
+        return [(key, count) for key, count in self.fingerprints.most_common() if count >= threshold]
+
+
+_current_tracker: ContextVar[QueryTracker | None] = ContextVar("query_tracker", default=None)
+
+
+def record_query(statement: str, duration_ms: float):
+    """
+    Counts an executed statement in the current query tracker, if there is one.
+
+    Args:
+        statement (str): The executed SQL statement.
+        duration_ms (float): The execution time in milliseconds.
+    """
+    tracker = _current_tracker.get()
+    if tracker is not None:
+        tracker.record(statement, duration_ms)
+
+
+@contextmanager
+def track_queries() -> Iterator[QueryTracker]:
+    """
+    Counts the queries run inside the block, including those of nested requests.
+
+    Yields:
+        QueryTracker: The tracker of the block.
+    """
+    tracker = QueryTracker(parent=_current_tracker.get())
+    token = _current_tracker.set(tracker)
+    try:
+        yield tracker
+    finally:
+        _current_tracker.reset(token)
+
+
+class QueryCountMiddleware:
+    """
+    ASGI middleware that counts the queries of every HTTP request.
+
+    Requests running a fingerprint `QUERY_REPEAT_THRESHOLD` times or exceeding 
+    `QUERY_BUDGET` queries are logged. With `QUERY_BUDGET_MODE` set to `raise` 
+    an over-budget request fails instead, which makes query regressions fail 
+    the tests. With `QUERY_DEBUG_HEADERS` the counts are returned in the 
+    `X-Query-Count`, `X-Query-Time-Ms` and `X-Query-Max-Repeats` headers.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self.budget = monitoring_settings.QUERY_BUDGET
+        self.budget_mode = monitoring_settings.QUERY_BUDGET_MODE
+        self.repeat_threshold = monitoring_settings.QUERY_REPEAT_THRESHOLD
+        self.debug_headers = monitoring_settings.QUERY_DEBUG_HEADERS
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with track_queries() as tracker:
+            async def send_with_query_count(message: Message):
+                if message["type"] == "http.response.start":
+                    self.check(scope, tracker)
+                    if self.debug_headers:
+                        headers = MutableHeaders(scope=message)
+                        headers.append("X-Query-Count", str(tracker.count))
+                        headers.append("X-Query-Time-Ms", f"{tracker.total_ms:.2f}")
+                        headers.append("X-Query-Max-Repeats", str(tracker.max_repeats))
+                await send(message)
+
+            await self.app(scope, receive, send_with_query_count)
+
+    def check(self, scope: Scope, tracker: QueryTracker):
+        """Reports repeated fingerprints and enforces the query budget of the request."""
+        request = f"{scope['method']} {scope['path']}"
+        for key, count in tracker.repeated(self.repeat_threshold):
+            logger.warning(f"{request} ran the same query {count} times, possible N+1: {key}")
+
+        if self.budget and tracker.count > self.budget:
+            message = f"{request} ran {tracker.count} queries, the budget is {self.budget}"
+            if self.budget_mode == "raise":
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
@@ -0,0 +1,106 @@
+import secrets
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+
+from config import settings
+from logger import app_logger as logger
+from auth.base_config import current_superuser
+from user.models import User
+from monitoring.queries import query_stats
+from monitoring.metrics import metrics_registry
+from monitoring.explain import explain_capture
+from monitoring.schemas import QueryStatsRead, QueryStatsOrder, ExplainPlanRead
+from monitoring.timing import TimedRoute
+
+
+monitoring_settings = settings.monitoring
+
+router = APIRouter(route_class=TimedRoute)
+metrics_router = APIRouter()
+
+
+def check_metrics_token(authorization: str | None = Header(default=None)):
+    """
+    Checks that a metrics scrape carries the `METRICS_TOKEN` bearer token.
+
+    Args:
+        authorization (str | None): The Authorization header of the request.
+
+    Raises:
+        HTTPException: If no token is configured or the request does not carry it, a 401 error is raised.
+    """
+    token = monitoring_settings.METRICS_TOKEN
+    if not token or not secrets.compare_digest((authorization or "").encode(), f"Bearer {token}".encode()):
+        raise HTTPException(status_code=401, detail="Invalid metrics token", headers={"WWW-Authenticate": "Bearer"})
+
+
+@metrics_router.get(
+    "/metrics", response_class=PlainTextResponse, include_in_schema=False, dependencies=[Depends(check_metrics_token)]
+)
+async def read_metrics() -> PlainTextResponse:
+    """
+    Asynchronously renders the metrics of this process in the Prometheus text format.
+
+    Scrapers authenticate with the `METRICS_TOKEN` bearer token.
+
+    Returns:
+        PlainTextResponse: The metrics, one sample per line.
+    """
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4")
+
+
+@router.get("/queries", response_model=list[QueryStatsRead])
+async def read_query_stats(
+        limit: int = Query(default=20, ge=1, le=1000),
+        order_by: QueryStatsOrder = "total_ms",
+        user: User = Depends(current_superuser),
+    ) -> list[QueryStatsRead]:
+    """
+    Asynchronously retrieves the most expensive query fingerprints of this process.
+
+    Args:
+        limit (int): The number of fingerprints to return.
+        order_by (QueryStatsOrder): The statistic to sort the fingerprints by.
+        user (User): The current user, required to be a superuser.
+
+    Returns:
+        list[QueryStatsRead]: The statistics of the top fingerprints.
+    """
+    logger.info(f"Get top {limit} query fingerprints by {order_by}")
+    return query_stats.top(limit=limit, order_by=order_by)
+
+
+@router.delete("/queries")
+async def reset_query_stats(user: User = Depends(current_superuser)) -> dict:
+    """
+    Asynchronously resets the query statistics of this process.
+
+    Args:
+        user (User): The current user, required to be a superuser.
+
+    Returns:
+        dict: A confirmation message indicating the statistics have been reset.
+    """
+    logger.info("Reset query statistics")
+    query_stats.reset()
+    return {"detail": "Query statistics reset"}
+
+
+@router.get("/plans", response_model=list[ExplainPlanRead])
+async def read_explain_plans(
+        limit: int = Query(default=20, ge=1, le=1000),
+        user: User = Depends(current_superuser),
+    ) -> list[ExplainPlanRead]:
+    """
+    Asynchronously retrieves the execution plans captured for the slow queries of this process.
+
+    Args:
+        limit (int): The number of plans to return, newest first.
+        user (User): The current user, required to be a superuser.
+
+    Returns:
+        list[ExplainPlanRead]: The captured plans.
+    """
+    logger.info(f"Get {limit} captured query plans")
+    return explain_capture.latest(limit=limit)
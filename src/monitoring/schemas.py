@@ -0,0 +1,36 @@
+from datetime import datetime
+from typing import Any, Literal
+
+from pydantic import BaseModel
+
+
+class QueryStatsRead(BaseModel):
+    """
+    Model for reading the aggregated statistics of one query fingerprint.
+    Latencies are in milliseconds.
+    """
+    fingerprint: str
+    calls: int
+    total_ms: float
+    mean_ms: float
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    max_ms: float
+    rows: int
+
+
+# Statistics the query fingerprints can be sorted by
+QueryStatsOrder = Literal["total_ms", "calls", "mean_ms", "p95_ms", "p99_ms", "max_ms", "rows"]
+
+
+class ExplainPlanRead(BaseModel):
+    """
+    Model for reading the captured execution plan of a slow query.
+    The plan is in the PostgreSQL JSON format and includes actual timings when analyzed.
+    """
+    fingerprint: str
+    duration_ms: float
+    analyzed: bool
+    captured_at: datetime
+    plan: Any
@@ -0,0 +1,136 @@
+import asyncio
+from contextvars import ContextVar
+from functools import wraps
+from time import perf_counter
+from typing import Callable
+
+from fastapi.routing import APIRoute
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from monitoring.requests import track_queries
+
+
+class RequestTiming:
+    """Time spent in each phase of a request, in milliseconds."""
+
+    def __init__(self):
+        self.started_at = perf_counter()
+        self.handler_ended_at: float | None = None
+        self.phases: dict[str, float] = {}
+
+    def add(self, phase: str, duration_ms: float):
+        """Adds time spent in the phase."""
+        self.phases[phase] = self.phases.get(phase, 0.0) + duration_ms
+
+    def header(self) -> str:
+        """Renders the phases as a `Server-Timing` header value."""
+        return ", ".join(f"{phase};dur={duration_ms:.2f}" for phase, duration_ms in self.phases.items())
+
+
+_current_timing: ContextVar[RequestTiming | None] = ContextVar("request_timing", default=None)
+
+
+def timed_dependency(phase: str, dependency: Callable) -> Callable:
+    """
+    Wraps an asynchronous dependency, so that its time is reported as the given phase.
+
+    The wrapper keeps the signature of the dependency, so FastAPI resolves its 
+    sub-dependencies as before.
+
+    Args:
+        phase (str): The name of the phase in the `Server-Timing` header.
+        dependency (Callable): The asynchronous dependency.
+
+    Returns:
+        Callable: The wrapped dependency.
+    """
+    @wraps(dependency)
+    async def wrapper(*args, **kwargs):
+        timing = _current_timing.get()
+        if timing is None:
+            return await dependency(*args, **kwargs)
+        started_at = perf_counter()
+        try:
+            return await dependency(*args, **kwargs)
+        finally:
+            timing.add(phase, (perf_counter() - started_at) * 1000)
+    return wrapper
+
+
+def _timed_endpoint(endpoint: Callable) -> Callable:
+    """Wraps an endpoint, so that its time is reported as the `handler` phase."""
+    def finish(timing: RequestTiming, started_at: float):
+        timing.handler_ended_at = perf_counter()
+        timing.add("handler", (timing.handler_ended_at - started_at) * 1000)
+
+    if asyncio.iscoroutinefunction(endpoint):
+        @wraps(endpoint)
+        async def async_wrapper(*args, **kwargs):
+            timing = _current_timing.get()
+            if timing is None:
+                return await endpoint(*args, **kwargs)
+            started_at = perf_counter()
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                finish(timing, started_at)
+        return async_wrapper
+
+    @wraps(endpoint)
+    def wrapper(*args, **kwargs):
+        timing = _current_timing.get()
+        if timing is None:
+            return endpoint(*args, **kwargs)
+        started_at = perf_counter()
+        try:
+            return endpoint(*args, **kwargs)
+        finally:
+            finish(timing, started_at)
+    return wrapper
+
+
+class TimedRoute(APIRoute):
+    """Route that reports the time spent in its endpoint as the `handler` phase."""
+
+    def get_route_handler(self) -> Callable:
+        self.dependant.call = _timed_endpoint(self.dependant.call)
+        return super().get_route_handler()
+
+
+class ServerTimingMiddleware:
+    """
+    ASGI middleware that reports where the time of a request goes in the `Server-Timing` header.
+
+    The header contains the `auth` phase of the timed authentication dependencies, 
+    the `db` time of all the queries, the `handler` time of endpoints on a 
+    `TimedRoute`, the `serialize` time from the end of the handler until the 
+    response starts and the `total` time. Phases overlap, since the queries run 
+    during authentication and in the handler.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timing = RequestTiming()
+        token = _current_timing.set(timing)
+        try:
+            with track_queries() as tracker:
+                async def send_with_timing(message: Message):
+                    if message["type"] == "http.response.start":
+                        now = perf_counter()
+                        timing.add("db", tracker.total_ms)
+                        if timing.handler_ended_at is not None:
+                            timing.add("serialize", (now - timing.handler_ended_at) * 1000)
+                        timing.add("total", (now - timing.started_at) * 1000)
+                        MutableHeaders(scope=message).append("Server-Timing", timing.header())
+                    await send(message)
+
+                await self.app(scope, receive, send_with_timing)
+        finally:
+            _current_timing.reset(token)
@@ -0,0 +1,24 @@
+from datetime import datetime
+
+from sqlalchemy import String, Integer, text
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Mapped, mapped_column
+
+from base import Base
+
+
+class OutboxMessage(Base):
+    """Model representing a background task written in the same transaction as the change that caused it."""
+    __tablename__ = "outbox"
+    __table_args__ = {'extend_existing': True}
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+
+    task: Mapped[str] = mapped_column(String(255))
+    args: Mapped[list] = mapped_column(JSONB, default=list)
+    kwargs: Mapped[dict] = mapped_column(JSONB, default=dict)
+    countdown: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(server_default=text("TIMEZONE('utc', now())"))
+
+    def __str__(self):
+        return f"({self.id}) {self.task}"
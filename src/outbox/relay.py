@@ -0,0 +1,79 @@
+import asyncio
+from contextvars import Context
+
+from config import settings
+from logger import celery_logger as logger
+from outbox.service import count_unknown_outbox_messages, relay_outbox_messages
+
+# Import the task modules so that every task referenced by the outbox is registered
+import mail.tasks  # noqa: F401
+import user.tasks  # noqa: F401
+
+
+# Load outbox settings from the application configuration
+outbox_settings = settings.outbox
+
+
+class OutboxRelay:
+    """
+    Background loop that drains the outbox into the task dispatcher.
+
+    The relay polls the outbox every `OUTBOX_POLL_INTERVAL` seconds and keeps 
+    relaying full batches without waiting. Writers in the same process call 
+    `wake` after committing, so their messages are relayed right away.
+    """
+
+    def __init__(self, batch_size: int, poll_interval: float):
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self._task: asyncio.Task | None = None
+        self._wakeup = asyncio.Event()
+
+    def start(self):
+        """Starts the relay loop on the running event loop."""
+        if self._task is None:
+            self._task = asyncio.create_task(self.run(), context=Context())
+
+    async def stop(self):
+        """Stops the relay loop."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def wake(self):
+        """Makes a running relay check the outbox immediately."""
+        self._wakeup.set()
+
+    async def run(self):
+        """Relays outbox messages until cancelled."""
+        logger.info("Outbox relay started")
+        try:
+            unknown = await count_unknown_outbox_messages()
+        except Exception as e:
+            logger.error(f"Error counting outbox messages: {e}")
+            unknown = 0
+        if unknown:
+            logger.warning(f"{unknown} outbox messages reference tasks unknown to this process, leaving them")
+        while True:
+            try:
+                relayed = await relay_outbox_messages(self.batch_size)
+            except Exception as e:
+                logger.error(f"Error relaying outbox messages: {e}")
+                relayed = 0
+            if relayed < self.batch_size:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+
+outbox_relay = OutboxRelay(
+    batch_size=outbox_settings.OUTBOX_BATCH_SIZE,
+    poll_interval=outbox_settings.OUTBOX_POLL_INTERVAL,
+)
+
+
+if __name__ == "__main__":
+    asyncio.run(outbox_relay.run())  # Run the relay as a standalone process
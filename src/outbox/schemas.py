@@ -0,0 +1,12 @@
+from pydantic import BaseModel, Field
+
+
+class OutboxMessageCreate(BaseModel):
+    """
+    Model for writing a task intent into the outbox.
+    The arguments must be JSON serializable.
+    """
+    task: str = Field(...)
+    args: list = Field(default_factory=list)
+    kwargs: dict = Field(default_factory=dict)
+    countdown: int | None = Field(default=None, ge=0)
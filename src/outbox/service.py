@@ -0,0 +1,114 @@
+from datetime import datetime, timezone
+
+from sqlalchemy import select, delete, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import settings
+from db import async_session_maker
+from logger import celery_logger as logger
+from mail.tasks import send_email, send_bulk_email
+from outbox.models import OutboxMessage
+from outbox.schemas import OutboxMessageCreate
+from tasks_celery import celery_app
+from tasks_dispatch import dispatcher, TaskMessage
+
+
+# Load outbox settings from the application configuration
+outbox_settings = settings.outbox
+
+# Tasks whose undelayed messages in a batch are relayed as one call of a bulk task,
+# which takes the list of their keyword arguments, such as a wave of verification emails
+BULK_TASKS = {send_email.name: send_bulk_email}
+
+
+def add_outbox_messages(session: AsyncSession, messages: list[OutboxMessageCreate]):
+    """
+    Adds task intents to the outbox within the session's transaction.
+
+    The messages are written when the session commits, together with the rest 
+    of the changes, and are relayed to the task dispatcher afterwards.
+
+    Args:
+        session (AsyncSession): The session of the transaction that causes the tasks.
+        messages (list[OutboxMessageCreate]): The tasks to write into the outbox.
+    """
+    session.add_all([OutboxMessage(**message.model_dump()) for message in messages])
+
+
+async def count_unknown_outbox_messages() -> int:
+    """
+    Asynchronously counts the outbox messages that reference a task not registered in this process.
+
+    Returns:
+        int: The number of messages the relay of this process leaves in the outbox.
+    """
+    async with async_session_maker() as session:
+        query = select(func.count()).select_from(OutboxMessage).where(OutboxMessage.task.not_in(list(celery_app.tasks)))
+        return (await session.execute(query)).scalar_one()
+
+
+async def relay_outbox_messages(batch_size: int) -> int:
+    """
+    Asynchronously moves a batch of outbox messages to the task dispatcher.
+
+    The batch is locked with `FOR UPDATE SKIP LOCKED`, so several relays can run 
+    at the same time. The delay of a message is counted from the moment it was 
+    written. Each message is deleted only once the dispatcher has confirmed that 
+    its backend accepted it, so the messages that failed are relayed again.
+
+    Undelayed messages of a task in `BULK_TASKS` are relayed together as one call 
+    of its bulk task. Messages referencing a task that is not registered in this 
+    process are left in the outbox, for a process that knows the task, such as a 
+    newer release.
+
+    Args:
+        batch_size (int): The maximum number of messages to relay.
+
+    Returns:
+        int: The number of messages relayed and deleted from the outbox.
+    """
+    async with async_session_maker() as session:
+        query = (
+            select(OutboxMessage)
+            .where(OutboxMessage.task.in_(list(celery_app.tasks)))
+            .order_by(OutboxMessage.id)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        )
+        messages = (await session.execute(query)).scalars().all()
+        if not messages:
+            return 0
+
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        groups: list[list[OutboxMessage]] = []
+        task_messages = []
+        bulk_groups: dict[str, list[OutboxMessage]] = {}
+        for message in messages:
+            if message.task in BULK_TASKS and not message.countdown and not message.args:
+                bulk_groups.setdefault(message.task, []).append(message)
+                continue
+            countdown = None
+            if message.countdown:
+                countdown = max(message.countdown - (now - message.created_at).total_seconds(), 0)
+            groups.append([message])
+            task_messages.append(TaskMessage(
+                task=celery_app.tasks[message.task],
+                args=tuple(message.args),
+                kwargs=message.kwargs,
+                countdown=countdown,
+            ))
+        for task_name, bulk_messages in bulk_groups.items():
+            groups.append(bulk_messages)
+            task_messages.append(TaskMessage(
+                task=BULK_TASKS[task_name],
+                args=([message.kwargs for message in bulk_messages],),
+            ))
+        accepted = await dispatcher.send_confirmed(task_messages, timeout=outbox_settings.OUTBOX_SEND_TIMEOUT)
+
+        relayed_ids = [message.id for group, ok in zip(groups, accepted) if ok for message in group]
+        if len(relayed_ids) < len(messages):
+            logger.warning(f"{len(messages) - len(relayed_ids)} outbox messages were not accepted, keeping them")
+        if relayed_ids:
+            await session.execute(delete(OutboxMessage).where(OutboxMessage.id.in_(relayed_ids)))
+        await session.commit()
+        return len(relayed_ids)
@@ -0,0 +1,83 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Hashable, TypeVar
+
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key into a single call.
+
+    The first caller for a key starts the call as a separate task, and callers
+    arriving while it runs await the same task instead of starting their own,
+    so a burst of identical reads costs one query. Callers await the task
+    through `asyncio.shield`, so a cancelled caller, even the first one, does
+    not cancel the call for the others.
+
+    The task copies the context of the first caller, so the queries of a shared
+    call are counted by the `QueryTracker` of the first caller only, and the
+    callers that joined it see no queries of their own.
+
+    `hits` counts the callers that joined a call in flight and `misses` the
+    callers that started one.
+    """
+
+    def __init__(self):
+        self._calls: dict[Hashable, asyncio.Task] = {}
+        self.hits = 0
+        self.misses = 0
+
+    async def run(self, key: Hashable, func: Callable[[], Awaitable[T]]) -> T:
+        """
+        Returns the result of the call in flight for the key, or of a new call of `func`.
+
+        Args:
+            key (Hashable): The key identifying identical calls.
+            func (Callable[[], Awaitable[T]]): The function starting the call.
+
+        Returns:
+            T: The result of the call. Its exception is raised to every caller.
+        """
+        task = self._calls.get(key)
+        if task is not None:
+            self.hits += 1
+        else:
+            self.misses += 1
+            task = asyncio.ensure_future(func())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        return await asyncio.shield(task)
+
+    def forget(self, key: Hashable):
+        """
+        Makes later callers start a new call instead of joining the one in flight.
+
+        Writers call it after changing the data, so no caller arriving after
+        the change receives a result read before it.
+
+        Args:
+            key (Hashable): The key of the call.
+        """
+        self._calls.pop(key, None)
+
+    def forget_where(self, predicate: Callable[[Hashable], bool]):
+        """
+        Makes later callers start new calls for every key matching the predicate.
+
+        Args:
+            predicate (Callable[[Hashable], bool]): Returns True for the keys to forget.
+        """
+        for key in [key for key in self._calls if predicate(key)]:
+            del self._calls[key]
+
+    def clear(self):
+        """Makes later callers start new calls for every key."""
+        self._calls.clear()
+
+    def _finish(self, key: Hashable, task: asyncio.Task[Any]):
+        """Removes the finished call, and retrieves its exception in case every caller was cancelled."""
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            task.exception()
@@ -1,6 +1,14 @@
+import asyncio
+from functools import wraps
+from typing import Any, Callable, Coroutine
+
 from celery import Celery
+from celery.signals import worker_process_init, worker_process_shutdown
+from sqlalchemy.ext.asyncio import AsyncEngine
 
 from config import settings
+from db import create_db_engine, engine, async_session_maker
+from logger import celery_logger as logger
 
 
 # Load Celery settings from the application configuration
@@ -22,8 +30,108 @@ celery_app.conf.update(
     result_serializer="json",
     timezone="UTC",
     enable_utc=True,
+    # Wait for the broker to confirm every published message
+    broker_transport_options={"confirm_publish": celery_settings.CELERY_PUBLISH_CONFIRM},
+    # Periodic tasks, run by the beat embedded in the worker
+    beat_schedule={
+        "rollup-advertisement-view-stats": {
+            "task": "advertisement.tasks.rollup_advertisement_view_stats_task",
+            "schedule": settings.advertisement.VIEW_ROLLUP_INTERVAL,
+        },
+    },
 )
 
 
+class AsyncTaskRunner:
+    """
+    Runs coroutines of Celery tasks on one long-lived event loop per worker process.
+
+    The runner owns a database engine with its own sized pool. While it is started, 
+    `async_session_maker` is bound to that engine, so the services used by task 
+    bodies keep warm connections that belong to the runner's loop.
+    """
+
+    def __init__(self):
+        self.loop: asyncio.AbstractEventLoop | None = None
+        self.engine: AsyncEngine | None = None
+
+    def start(self):
+        """Creates the event loop and the database pool if they do not exist yet."""
+        if self.loop is not None:
+            return
+        self.loop = asyncio.new_event_loop()
+        self.engine = create_db_engine(
+            pool_size=celery_settings.CELERY_DB_POOL_SIZE,
+            max_overflow=celery_settings.CELERY_DB_MAX_OVERFLOW,
+            pool_pre_ping=True,
+        )
+        async_session_maker.configure(bind=self.engine)
+        logger.info(f"Async task runner started with a pool of {celery_settings.CELERY_DB_POOL_SIZE} connections")
+
+    def run(self, coro: Coroutine) -> Any:
+        """
+        Runs the coroutine to completion on the runner's event loop.
+
+        Args:
+            coro (Coroutine): The coroutine to run.
+
+        Returns:
+            Any: The result of the coroutine.
+        """
+        self.start()
+        return self.loop.run_until_complete(coro)
+
+    def stop(self):
+        """Disposes the database pool, closes the event loop and rebinds the default engine."""
+        if self.loop is None:
+            return
+        self.loop.run_until_complete(self.engine.dispose())
+        self.loop.close()
+        async_session_maker.configure(bind=engine)
+        self.loop, self.engine = None, None
+        logger.info("Async task runner stopped")
+
+
+async_runner = AsyncTaskRunner()
+
+
+@worker_process_init.connect
+def start_async_runner(**kwargs):
+    """Starts the async task runner in every freshly forked worker process."""
+    async_runner.start()
+
+
+@worker_process_shutdown.connect
+def stop_async_runner(**kwargs):
+    """Disposes the async task runner when the worker process shuts down."""
+    async_runner.stop()
+
+
+def async_task(func: Callable[..., Coroutine] | None = None, **options):
+    """
+    Registers a coroutine function as a Celery task that runs on the async task runner.
+
+    Can be used both as `@async_task` and as `@async_task(**options)`, where the 
+    options are passed to `celery_app.task`. The coroutine function is kept as the 
+    task's `coroutine` attribute, so in-process dispatchers can await it directly.
+
+    Args:
+        func (Callable[..., Coroutine] | None): The coroutine function implementing the task.
+        **options: Celery task options.
+
+    Returns:
+        The registered Celery task, or a decorator when called with options only.
+    """
+    def decorator(func: Callable[..., Coroutine]):
+        @wraps(func)
+        def run(*args, **kwargs):
+            return async_runner.run(func(*args, **kwargs))
+        return celery_app.task(coroutine=staticmethod(func), **options)(run)
+
+    if func is not None:
+        return decorator(func)
+    return decorator
+
+
 # Ensure tasks are discovered
-celery_app.autodiscover_tasks(["mail", "user"])
\ No newline at end of file
+celery_app.autodiscover_tasks(["mail", "user", "advertisement"])
@@ -0,0 +1,293 @@
+import abc
+import asyncio
+from concurrent.futures import wait
+from contextvars import Context
+from time import monotonic
+from itertools import count
+from dataclasses import dataclass, field
+
+from celery import Task
+
+from config import settings
+from logger import celery_logger as logger
+from tasks_celery import celery_app
+from tasks_publisher import TaskPublisher
+from monitoring.metrics import metrics_registry, MetricFamily
+
+
+# Load Celery settings from the application configuration
+celery_settings = settings.celery
+
+
+@dataclass
+class TaskMessage:
+    """A task invocation waiting to be executed by a dispatcher."""
+    task: Task
+    args: tuple = ()
+    kwargs: dict = field(default_factory=dict)
+    countdown: float | None = None
+
+
+class TaskDispatcher(abc.ABC):
+    """
+    Base class for the backends that execute background tasks.
+
+    Request handlers hand tasks to the configured dispatcher instead of calling 
+    Celery directly, so the same code runs with a broker or fully in-process.
+    """
+
+    async def start(self):
+        """Prepares the dispatcher for sending tasks."""
+        pass
+
+    async def stop(self):
+        """Releases the resources held by the dispatcher."""
+        pass
+
+    async def flush(self):
+        """Waits until the tasks sent so far are handed over to the backend."""
+        pass
+
+    def stats(self) -> dict:
+        """
+        Returns the dispatcher statistics.
+
+        Returns:
+            dict: The statistics, such as the number of tasks waiting to be handled.
+        """
+        return {}
+
+    @abc.abstractmethod
+    async def send(self, task: Task, *args, countdown: float | None = None, **kwargs):
+        """
+        Schedules the task for execution.
+
+        Args:
+            task (Task): The task to execute.
+            *args: Positional arguments for the task.
+            countdown (float | None): The delay in seconds before the task runs.
+            **kwargs: Keyword arguments for the task.
+        """
+
+    async def send_confirmed(self, messages: list[TaskMessage], timeout: float) -> list[bool]:
+        """
+        Schedules the tasks and waits until the backend has accepted each of them.
+
+        Args:
+            messages (list[TaskMessage]): The tasks to schedule.
+            timeout (float): The time in seconds to wait for the backend.
+
+        Returns:
+            list[bool]: Whether each task was accepted, in the order of the messages.
+        """
+        deadline = monotonic() + timeout
+        accepted = []
+        for message in messages:
+            try:
+                await asyncio.wait_for(
+                    self.send(message.task, *message.args, countdown=message.countdown, **message.kwargs),
+                    timeout=max(deadline - monotonic(), 0),
+                )
+            except Exception as e:
+                logger.error(f"Error sending task {message.task.name}: {e!r}")
+                accepted.append(False)
+            else:
+                accepted.append(True)
+        return accepted
+
+
+class CeleryDispatcher(TaskDispatcher):
+    """
+    Dispatcher that publishes tasks to the Celery broker.
+
+    Messages are handed to a background `TaskPublisher`, so sending a task only 
+    queues it locally and never blocks the event loop on broker I/O.
+
+    Args:
+        publisher (TaskPublisher): The publisher that delivers messages to the broker.
+        flush_timeout (float): The time in seconds to wait for buffered messages on flush and shutdown.
+    """
+
+    def __init__(self, publisher: TaskPublisher, flush_timeout: float):
+        self.publisher = publisher
+        self.flush_timeout = flush_timeout
+
+    async def start(self):
+        self.publisher.start()
+
+    async def stop(self):
+        await asyncio.to_thread(self.publisher.stop, self.flush_timeout)
+
+    async def flush(self):
+        if self.publisher.depth:
+            await asyncio.to_thread(self.publisher.flush, self.flush_timeout)
+
+    def stats(self) -> dict:
+        return self.publisher.stats()
+
+    async def send(self, task: Task, *args, countdown: float | None = None, **kwargs):
+        await self.publisher.publish(task, args, kwargs, countdown=countdown)
+
+    async def send_confirmed(self, messages: list[TaskMessage], timeout: float) -> list[bool]:
+        confirmations = [
+            await self.publisher.publish(message.task, message.args, message.kwargs, countdown=message.countdown)
+            for message in messages
+        ]
+        await asyncio.to_thread(wait, confirmations, timeout)
+        return [confirmation.done() and confirmation.exception() is None for confirmation in confirmations]
+
+
+class InProcessDispatcher(TaskDispatcher):
+    """
+    Dispatcher that executes tasks on the application's event loop.
+
+    Tasks are put into a bounded queue consumed by a fixed number of worker 
+    coroutines. Delayed tasks are kept as loop timers until they are due. On 
+    shutdown the queue is drained, while delayed tasks that are not due yet 
+    cannot outlive the process and are logged with their arguments, so they 
+    can be replayed.
+
+    Args:
+        workers (int): The number of worker coroutines.
+        queue_size (int): The maximum number of queued tasks.
+        drain_timeout (float): The time in seconds to wait for the queue to drain on shutdown.
+    """
+
+    def __init__(self, workers: int, queue_size: int, drain_timeout: float):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.drain_timeout = drain_timeout
+        self._queue: asyncio.Queue[TaskMessage] | None = None
+        self._workers: list[asyncio.Task] = []
+        self._scheduled: dict[int, tuple[asyncio.TimerHandle, TaskMessage]] = {}
+        self._scheduled_ids = count()
+        self._pending_puts: set[asyncio.Task] = set()
+        self.executed_count = 0
+        self.failed_count = 0
+
+    async def start(self):
+        if self._queue is not None:
+            return
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        # Workers get an empty context, so they are not tied to the request that started them
+        self._workers = [asyncio.create_task(self._work(), context=Context()) for _ in range(self.workers)]
+        logger.info(f"In-process task dispatcher started with {self.workers} workers")
+
+    async def stop(self):
+        if self._queue is None:
+            return
+        now = asyncio.get_running_loop().time()
+        for handle, message in self._scheduled.values():
+            handle.cancel()
+            logger.error(
+                f"Dropping delayed task {message.task.name} due in {handle.when() - now:.0f}s on shutdown, "
+                f"args={message.args!r} kwargs={message.kwargs!r}"
+            )
+        self._scheduled.clear()
+
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=self.drain_timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Task queue not drained in {self.drain_timeout}s, {self._queue.qsize()} tasks dropped")
+
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._queue, self._workers = None, []
+        logger.info("In-process task dispatcher stopped")
+
+    def stats(self) -> dict:
+        return {
+            "depth": self._queue.qsize() if self._queue is not None else 0,
+            "scheduled": len(self._scheduled),
+            "executed": self.executed_count,
+            "failed": self.failed_count,
+        }
+
+    async def send(self, task: Task, *args, countdown: float | None = None, **kwargs):
+        await self.start()
+        message = TaskMessage(task=task, args=args, kwargs=kwargs)
+        if countdown:
+            scheduled_id = next(self._scheduled_ids)
+            handle = asyncio.get_running_loop().call_later(
+                countdown, self._enqueue_scheduled, scheduled_id, message
+            )
+            self._scheduled[scheduled_id] = (handle, message)
+        else:
+            await self._queue.put(message)
+
+    def _enqueue_scheduled(self, scheduled_id: int, message: TaskMessage):
+        """Moves a delayed task into the queue once it is due."""
+        self._scheduled.pop(scheduled_id, None)
+        put = asyncio.create_task(self._queue.put(message))
+        self._pending_puts.add(put)
+        put.add_done_callback(self._pending_puts.discard)
+
+    async def _work(self):
+        """Executes queued tasks until cancelled."""
+        while True:
+            message = await self._queue.get()
+            try:
+                await self._execute(message)
+                self.executed_count += 1
+            except Exception as e:
+                self.failed_count += 1
+                logger.error(f"Error executing task {message.task.name}: {e}")
+            finally:
+                self._queue.task_done()
+
+    @staticmethod
+    async def _execute(message: TaskMessage):
+        """Awaits the task coroutine, or runs a synchronous task body in a thread."""
+        coroutine = getattr(message.task, "coroutine", None)
+        if coroutine is not None:
+            await coroutine(*message.args, **message.kwargs)
+        else:
+            await asyncio.to_thread(message.task.run, *message.args, **message.kwargs)
+
+
+# Metric name, type and description of each dispatcher statistic
+DISPATCHER_METRICS = {
+    "depth": ("tasks_queue_depth", "gauge", "Number of tasks waiting to be published or executed."),
+    "scheduled": ("tasks_scheduled", "gauge", "Number of delayed tasks that are not due yet."),
+    "published": ("tasks_published_total", "counter", "Number of tasks published to the broker."),
+    "executed": ("tasks_executed_total", "counter", "Number of tasks executed in process."),
+    "failed": ("tasks_failed_total", "counter", "Number of tasks that failed to be published or executed."),
+    "latency_avg": ("tasks_publish_latency_avg_seconds", "gauge", "Average time until the broker confirms a task."),
+    "latency_max": ("tasks_publish_latency_max_seconds", "gauge", "Longest time until the broker confirmed a task."),
+}
+
+
+def collect_dispatcher_metrics() -> list[MetricFamily]:
+    """Collects the statistics of the task dispatcher."""
+    labels = {"backend": celery_settings.CELERY_TASK_BACKEND}
+    return [
+        (*DISPATCHER_METRICS[key], [(labels, value)])
+        for key, value in dispatcher.stats().items()
+        if key in DISPATCHER_METRICS
+    ]
+
+
+def create_dispatcher() -> TaskDispatcher:
+    """
+    Creates the task dispatcher selected by `CELERY_TASK_BACKEND`.
+
+    Returns:
+        TaskDispatcher: The Celery or in-process task dispatcher.
+    """
+    if celery_settings.CELERY_TASK_BACKEND == "inprocess":
+        return InProcessDispatcher(
+            workers=celery_settings.CELERY_INPROCESS_WORKERS,
+            queue_size=celery_settings.CELERY_INPROCESS_QUEUE_SIZE,
+            drain_timeout=celery_settings.CELERY_INPROCESS_DRAIN_TIMEOUT,
+        )
+    publisher = TaskPublisher(
+        app=celery_app,
+        buffer_size=celery_settings.CELERY_PUBLISH_BUFFER_SIZE,
+        batch_size=celery_settings.CELERY_PUBLISH_BATCH_SIZE,
+    )
+    return CeleryDispatcher(publisher=publisher, flush_timeout=celery_settings.CELERY_PUBLISH_FLUSH_TIMEOUT)
+
+
+dispatcher = create_dispatcher()
+metrics_registry.add_collector(collect_dispatcher_metrics)
@@ -0,0 +1,188 @@
+import asyncio
+import queue
+from concurrent.futures import Future
+from threading import Lock, Thread
+from time import monotonic, perf_counter
+
+from celery import Celery, Task
+
+from logger import celery_logger as logger
+
+
+# Sentinel put into the buffer to stop the publisher thread
+_STOP = object()
+
+
+class TaskPublishError(Exception):
+    """Raised when buffered task messages could not be published to the broker."""
+    pass
+
+
+class TaskPublisher:
+    """
+    Publishes Celery tasks to the broker from a background thread.
+
+    Kombu publishing is blocking socket I/O, so request handlers only put the 
+    message into a bounded in-memory buffer and return. The publisher thread 
+    takes messages from the buffer in batches and publishes every batch through 
+    one producer connection, waiting for the broker's publisher confirms.
+
+    Args:
+        app (Celery): The Celery application used to acquire producers.
+        buffer_size (int): The maximum number of messages waiting to be published.
+        batch_size (int): The maximum number of messages published per producer acquisition.
+    """
+
+    def __init__(self, app: Celery, buffer_size: int, batch_size: int):
+        self.app = app
+        self.batch_size = batch_size
+        self._buffer: queue.Queue = queue.Queue(maxsize=buffer_size)
+        self._thread: Thread | None = None
+        self._lock = Lock()
+
+        self.published_count = 0
+        self.failed_count = 0
+        self.latency_sum = 0.0
+        self.latency_max = 0.0
+
+    @property
+    def depth(self) -> int:
+        """The number of messages waiting in the buffer."""
+        return self._buffer.qsize()
+
+    def stats(self) -> dict:
+        """
+        Returns the buffer depth and the publish counters and latencies.
+
+        Latency is measured from the moment a message is buffered until the broker 
+        confirms it.
+
+        Returns:
+            dict: The publisher statistics, with latencies in seconds.
+        """
+        return {
+            "depth": self.depth,
+            "published": self.published_count,
+            "failed": self.failed_count,
+            "latency_avg": self.latency_sum / self.published_count if self.published_count else 0.0,
+            "latency_max": self.latency_max,
+        }
+
+    def start(self):
+        """Starts the publisher thread if it is not running yet."""
+        with self._lock:
+            if self._thread is None:
+                self._thread = Thread(target=self._run, name="TaskPublisher", daemon=True)
+                self._thread.start()
+
+    def stop(self, timeout: float | None = None):
+        """
+        Publishes the buffered messages and stops the publisher thread.
+
+        Args:
+            timeout (float | None): The time in seconds to wait for the buffer to be flushed.
+        """
+        with self._lock:
+            if self._thread is None:
+                return
+            started_at = monotonic()
+            try:
+                self._buffer.put(_STOP, timeout=timeout)
+            except queue.Full:
+                logger.warning(f"Task publish buffer still full after {timeout}s, {self.depth} messages dropped")
+                self._thread = None
+                return
+            self._thread.join(None if timeout is None else max(timeout - (monotonic() - started_at), 0))
+            if self._thread.is_alive():
+                logger.warning(f"Task publisher not flushed in {timeout}s, {self.depth} messages dropped")
+            self._thread = None
+
+    def flush(self, timeout: float | None = None):
+        """
+        Blocks until every buffered message has been handled by the publisher thread.
+
+        Args:
+            timeout (float | None): The time in seconds to wait for the buffer to be handled.
+
+        Raises:
+            TaskPublishError: If the buffer is not handled in time, or some of the messages could not be published.
+        """
+        failed_count = self.failed_count
+        deadline = None if timeout is None else monotonic() + timeout
+        # Same as `Queue.join`, with a deadline
+        with self._buffer.all_tasks_done:
+            while self._buffer.unfinished_tasks:
+                remaining = None if deadline is None else deadline - monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise TaskPublishError(f"{self._buffer.unfinished_tasks} task messages not published in {timeout}s")
+                self._buffer.all_tasks_done.wait(remaining)
+        if self.failed_count > failed_count:
+            raise TaskPublishError(f"{self.failed_count - failed_count} task messages were not published")
+
+    async def publish(self, task: Task, args: tuple, kwargs: dict, countdown: float | None = None) -> Future:
+        """
+        Buffers the task message for publishing without blocking the event loop.
+
+        When the buffer is full, waits in a thread until there is room for the message.
+
+        Args:
+            task (Task): The task to publish.
+            args (tuple): Positional arguments for the task.
+            kwargs (dict): Keyword arguments for the task.
+            countdown (float | None): The delay in seconds before the task runs.
+
+        Returns:
+            Future: Resolved once the broker confirms the message, or set to the publishing error.
+        """
+        self.start()
+        confirmation = Future()
+        message = (task, args, kwargs, countdown, perf_counter(), confirmation)
+        try:
+            self._buffer.put_nowait(message)
+        except queue.Full:
+            logger.warning(f"Task publish buffer is full, waiting to publish {task.name}")
+            await asyncio.to_thread(self._buffer.put, message)
+        return confirmation
+
+    def _run(self):
+        """Takes batches of messages from the buffer and publishes them until stopped."""
+        stopping = False
+        while not stopping:
+            batch = [self._buffer.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._buffer.get_nowait())
+                except queue.Empty:
+                    break
+            if _STOP in batch:
+                stopping = True
+            messages = [message for message in batch if message is not _STOP]
+            if messages:
+                self._publish_batch(messages)
+            for _ in batch:
+                self._buffer.task_done()
+
+    def _publish_batch(self, batch: list[tuple]):
+        """Publishes the batch through a single producer, one confirmed message at a time."""
+        handled = 0
+        try:
+            with self.app.producer_or_acquire() as producer:
+                for task, args, kwargs, countdown, buffered_at, confirmation in batch:
+                    handled += 1
+                    try:
+                        task.apply_async(args, kwargs, countdown=countdown, producer=producer)
+                    except Exception as e:
+                        self.failed_count += 1
+                        confirmation.set_exception(e)
+                        logger.error(f"Error publishing task {task.name}: {e}")
+                        continue
+                    latency = perf_counter() - buffered_at
+                    self.published_count += 1
+                    self.latency_sum += latency
+                    self.latency_max = max(self.latency_max, latency)
+                    confirmation.set_result(None)
+        except Exception as e:
+            self.failed_count += len(batch) - handled
+            for message in batch[handled:]:
+                message[-1].set_exception(e)
+            logger.error(f"Error publishing a batch of {len(batch)} task messages: {e}")
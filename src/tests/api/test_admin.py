@@ -0,0 +1,137 @@
+from urllib.parse import urlencode
+
+import pytest
+from fastapi import FastAPI
+from httpx import AsyncClient
+from sqladmin import Admin
+from sqlalchemy import delete, select
+from starlette.requests import Request
+
+from conftest import test_urls
+from db import engine, async_session_maker
+from advertisement.admin import AdvertisementAdmin
+from advertisement.models import Advertisement
+from advertisement.service import delete_advertisements, move_advertisements_to_top
+from user.models import User
+from user.service import delete_users, verify_users, deactivate_users
+
+
+def make_request(**params) -> Request:
+    return Request({
+        "type": "http", "method": "GET", "path": "/admin/advertisement/list",
+        "query_string": urlencode(params).encode(), "headers": [],
+    })
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("sort", ["asc", "desc"])
+async def test_admin_list_keyset_pagination(sort: str):
+    admin = Admin(app=FastAPI(), engine=engine)
+    admin.add_view(AdvertisementAdmin)
+    view = admin.views[0]
+    async with async_session_maker() as session:
+        session.add_all([
+            Advertisement(title=f"Admin title {number}", author="Admin author", position=number % 7 or None)
+            for number in range(23)
+        ])
+        await session.commit()
+        expected = (await session.execute(
+            select(Advertisement.id).order_by(
+                *(column.desc() if sort == "desc" else column.asc() for column in (Advertisement.position, Advertisement.id))
+            )
+        )).scalars().all()
+
+    # Walk forwards through every page, then back to the first one
+    pages, params = [], {"sortBy": "position", "sort": sort, "pageSize": 10}
+    pagination = await view.list(make_request(**params))
+    pages.append([row.id for row in pagination.rows])
+    while pagination.has_next:
+        pagination = await view.list(make_request(**params, page=pagination.page + 1, after=pagination.next_cursor))
+        pages.append([row.id for row in pagination.rows])
+    while pagination.has_previous:
+        pagination = await view.list(make_request(**params, page=pagination.page - 1, before=pagination.previous_cursor))
+    first_page = [row.id for row in pagination.rows]
+
+    async with async_session_maker() as session:
+        await session.execute(delete(Advertisement).where(Advertisement.author == "Admin author"))
+        await session.commit()
+
+    assert [id for page in pages for id in page] == expected
+    assert first_page == pages[0] and pagination.page == 1
+
+
+@pytest.mark.asyncio
+async def test_admin_move_to_top_action(auth_async_verified_client: AsyncClient):
+    async with async_session_maker() as session:
+        advertisements = [
+            Advertisement(title=f"Action title {number}", author="Action author", position=position)
+            for number, position in enumerate([1, 2, 3, 10, 20])
+        ]
+        session.add_all(advertisements)
+        await session.commit()
+        ids = [advertisement.id for advertisement in advertisements]
+
+    async def read_rows() -> dict:
+        async with async_session_maker() as session:
+            return {id: updated_at for id, updated_at in (await session.execute(
+                select(Advertisement.id, Advertisement.updated_at).where(Advertisement.id.in_(ids))
+            )).all()}
+
+    before = await read_rows()
+    await move_advertisements_to_top([ids[4], ids[2]])
+    after = await read_rows()
+
+    urls = test_urls["advertisement"]
+    read = {}
+    for id in ids:
+        response = await auth_async_verified_client.get(urls.get("get_advertisement") + str(id))
+        assert response.status_code == 200
+        read[id] = response.json()["position"]
+    listed = (await auth_async_verified_client.get(urls.get("get_all_advertisements"))).json()
+    batch = await auth_async_verified_client.get(urls.get("batch"), params={"ids": ",".join(map(str, ids))})
+    changes = await auth_async_verified_client.get(urls.get("changes"))
+    await delete_advertisements(ids)
+
+    assert (read[ids[2]], read[ids[4]]) == (1, 2)
+    assert min(read.values()) >= 1
+    assert sorted(ids, key=read.get) == [ids[2], ids[4], ids[0], ids[1], ids[3]]
+    assert [item["id"] for item in listed if item["id"] in ids] == [ids[2], ids[4], ids[0], ids[1], ids[3]]
+    assert batch.status_code == 200 and changes.status_code == 200
+    # The advertisement far enough down the list keeps its position and is not written
+    assert read[ids[3]] == 10 and after[ids[3]] == before[ids[3]]
+
+
+@pytest.mark.asyncio
+async def test_admin_user_actions():
+    async with async_session_maker() as session:
+        users = [
+            User(
+                username=f"action_user_{number}", email=f"action_user_{number}@example.com",
+                hashed_password="hash", verification_token=f"action_token_{number}",
+            )
+            for number in range(3)
+        ]
+        session.add_all(users)
+        await session.commit()
+        ids = [user.id for user in users]
+
+    verified = await verify_users(ids[:2])
+    deactivated = await deactivate_users(ids[1:])
+    async with async_session_maker() as session:
+        states = {
+            id: (is_verified, is_active, token)
+            for id, is_verified, is_active, token in (await session.execute(
+                select(User.id, User.is_verified, User.is_active, User.verification_token).where(User.id.in_(ids))
+            )).all()
+        }
+    deleted = await delete_users(ids)
+    async with async_session_maker() as session:
+        remaining = (await session.execute(select(User.id).where(User.id.in_(ids)))).scalars().all()
+
+    assert (verified, deactivated, deleted) == (2, 2, 3)
+    assert [states[id] for id in ids] == [
+        (True, True, None),
+        (True, False, None),
+        (False, False, "action_token_2"),
+    ]
+    assert remaining == []
@@ -1,8 +1,22 @@
+import asyncio
+import json
+from datetime import datetime
+
 import pytest
+import uvicorn
 from httpx import AsyncClient
 
 from conftest import test_urls
-from advertisement.service import delete_advertisement
+from main import app
+from cursors import encode_cursor
+from advertisement.service import (
+    delete_advertisement, get_advertisement_by_id, get_advertisement_fields_by_id, get_advertisements_by_ids,
+    get_advertisements_fields, rollup_advertisement_view_stats,
+)
+from advertisement.events import advertisement_events
+import advertisement.view_stats
+from advertisement.view_stats import view_buffer, ViewBuffer
+from monitoring.requests import track_queries
 
 
 @pytest.mark.asyncio
@@ -37,21 +51,38 @@ async def test_create_advertisement_incorrect(auth_async_verified_client: AsyncC
     assert response.status_code == 422
 
 
+@pytest.mark.asyncio
+async def test_create_advertisement_duplicate(
+    auth_async_verified_client: AsyncClient, advertisement_data: dict
+):
+    create_response = await auth_async_verified_client.post(
+        test_urls["advertisement"].get("create_advertisement"), json=advertisement_data
+    )
+    response = await auth_async_verified_client.post(
+        test_urls["advertisement"].get("create_advertisement"),
+        json={**advertisement_data, "title": f"  {advertisement_data['title'].upper()} "},
+    )
+    assert response.status_code == 409
+    await delete_advertisement(create_response.json().get("id"))
+
+
 @pytest.mark.asyncio
 async def test_get_all_advertisements(
     auth_async_verified_client: AsyncClient, advertisement_data: dict
 ):
     created_ids = []
-    for _ in range(5):
+    for number in range(5):
         create_response = await auth_async_verified_client.post(
             test_urls["advertisement"].get("create_advertisement"),
-            json=advertisement_data,
+            json={**advertisement_data, "title": f"string {number}"},
         )
         created_ids.append(create_response.json().get("id"))
-    response = await auth_async_verified_client.get(
-        test_urls["advertisement"].get("get_all_advertisements")
-    )
+    with track_queries() as queries:
+        response = await auth_async_verified_client.get(
+            test_urls["advertisement"].get("get_all_advertisements")
+        )
     assert response.status_code == 200
+    assert queries.count == 2  # current user, advertisements
     for id in created_ids:
         await delete_advertisement(id)
 
@@ -74,15 +105,17 @@ async def test_update_advertisement_successfully(
     advertisement_data = create_response.json()
     new_data = advertisement_data.copy()
     new_data["title"] = "new string"  # замените "title" на ключ вашего объявления
-    response = await auth_async_verified_client.put(
-        test_urls["advertisement"].get("update_advertisement"), json=new_data
-    )
+    with track_queries() as queries:
+        response = await auth_async_verified_client.put(
+            test_urls["advertisement"].get("update_advertisement"), json=new_data
+        )
     updated_data = response.json()
     assert (
         response.status_code == 200
         and updated_data.get("title") == "new string"
         and updated_data.get("city") == advertisement_data.get("city")
     )
+    assert queries.count == 2  # current user, update
     await delete_advertisement(advertisement_data.get("id"))
 
 
@@ -112,13 +145,15 @@ async def test_get_user_advertisement(
         test_urls["advertisement"].get("create_advertisement"), json=advertisement_data
     )
     created_data = create_response.json()
-    response = await auth_async_verified_client.get(
-        test_urls["advertisement"].get("get_advertisement")
-        + f"{created_data.get('id')}"
-    )
+    with track_queries() as queries:
+        response = await auth_async_verified_client.get(
+            test_urls["advertisement"].get("get_advertisement")
+            + f"{created_data.get('id')}"
+        )
     assert response.status_code == 200 and response.json().get(
         "id"
     ) == created_data.get("id")
+    assert queries.count == 2  # current user, advertisement
     await delete_advertisement(created_data.get("id"))
 
 
@@ -138,8 +173,255 @@ async def test_delete_advertisement_successfully(
         test_urls["advertisement"].get("create_advertisement"), json=advertisement_data
     )
     created_data = create_response.json()
-    response = await auth_async_verified_client.delete(
-        test_urls["advertisement"].get("delete_advertisement")
-        + f"{created_data.get('id')}"
-    )
+    with track_queries() as queries:
+        response = await auth_async_verified_client.delete(
+            test_urls["advertisement"].get("delete_advertisement")
+            + f"{created_data.get('id')}"
+        )
     assert response.status_code in [200, 204]
+    assert queries.count == 2  # current user, delete
+
+
+@pytest.mark.asyncio
+async def test_get_advertisement_changes(
+    auth_async_verified_client: AsyncClient, advertisement_data: dict
+):
+    created_ids = []
+    for number in range(2):
+        create_response = await auth_async_verified_client.post(
+            test_urls["advertisement"].get("create_advertisement"),
+            json={**advertisement_data, "title": f"changed {number}"},
+        )
+        created_ids.append(create_response.json().get("id"))
+    url = test_urls["advertisement"].get("changes")
+    changes = {"cursor": None, "has_more": True}
+    while changes["has_more"]:
+        params = {"since": changes["cursor"]} if changes["cursor"] else {}
+        changes = (await auth_async_verified_client.get(url, params=params)).json()
+    cursor = changes["cursor"]
+
+    await auth_async_verified_client.put(
+        test_urls["advertisement"].get("update_advertisement"),
+        json={**advertisement_data, "id": created_ids[0], "title": "changed again"},
+    )
+    await delete_advertisement(created_ids[1])
+
+    response = await auth_async_verified_client.get(url, params={"since": cursor})
+    changes = response.json()
+    assert response.status_code == 200
+    assert [(item["id"], item["title"]) for item in changes["updated"]] == [(created_ids[0], "changed again")]
+    assert changes["deleted"] == [created_ids[1]]
+    response = await auth_async_verified_client.get(url, params={"since": changes["cursor"]})
+    assert response.json()["updated"] == [] and response.json()["deleted"] == []
+    assert (await auth_async_verified_client.get(url, params={"since": "invalid"})).status_code == 400
+    await delete_advertisement(created_ids[0])
+
+
+@pytest.mark.asyncio
+async def test_get_advertisement_changes_crafted_cursor(auth_async_verified_client: AsyncClient):
+    url = test_urls["advertisement"].get("changes")
+    response = await auth_async_verified_client.get(
+        url, params={"since": encode_cursor(["2024-01-01T00:00:00", 1099511627776])}
+    )
+    assert response.status_code == 400
+
+    # A timezone-aware timestamp is read as the same UTC time
+    naive = await auth_async_verified_client.get(url, params={"since": encode_cursor(["2024-01-01T00:00:00", 1])})
+    aware = await auth_async_verified_client.get(
+        url, params={"since": encode_cursor(["2024-01-01T03:00:00+03:00", 1])}
+    )
+    assert naive.status_code == aware.status_code == 200
+    assert aware.json()["updated"] == naive.json()["updated"]
+
+
+@pytest.mark.asyncio
+async def test_advertisement_events(
+    auth_async_verified_client: AsyncClient, advertisement_data: dict
+):
+    subscription = await advertisement_events.subscribe()
+    create_response = await auth_async_verified_client.post(
+        test_urls["advertisement"].get("create_advertisement"), json=advertisement_data
+    )
+    created_data = create_response.json()
+    await auth_async_verified_client.put(
+        test_urls["advertisement"].get("update_advertisement"), json={**created_data, "title": "streamed"}
+    )
+    await delete_advertisement(created_data.get("id"))
+    messages = [await asyncio.wait_for(subscription.queue.get(), timeout=5) for _ in range(3)]
+    assert [message.split("\n")[0] for message in messages] == ["event: create", "event: update", "event: delete"]
+    assert json.loads(messages[1].split("\n")[1][6:])["data"]["title"] == "streamed"
+
+    # A subscriber that falls behind gets a single resync event instead of the backlog
+    for _ in range(subscription.queue.maxsize + 1):
+        subscription.push(messages[0])
+    assert subscription.queue.qsize() == 1 and subscription.queue.get_nowait().startswith("event: resync")
+    advertisement_events.unsubscribe(subscription)
+    await advertisement_events.stop()
+
+
+@pytest.mark.asyncio
+async def test_advertisement_stream(
+    auth_async_verified_client: AsyncClient, advertisement_data: dict
+):
+    # The test transport buffers whole responses, so the endless stream is read from a real server
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=0, lifespan="off", log_level="warning"))
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+    port = server.servers[0].sockets[0].getsockname()[1]
+
+    async def next_event(lines) -> list[str]:
+        event = []
+        while not event or event[-1]:
+            event.append(await asyncio.wait_for(anext(lines), timeout=5))
+        return event[:-1]
+
+    try:
+        async with AsyncClient(
+            base_url=f"http://127.0.0.1:{port}", cookies=auth_async_verified_client.cookies
+        ) as client:
+            async with client.stream("GET", test_urls["advertisement"].get("stream")) as response:
+                lines = response.aiter_lines()
+                ready = await next_event(lines)
+                create_response = await auth_async_verified_client.post(
+                    test_urls["advertisement"].get("create_advertisement"), json=advertisement_data
+                )
+                created = await next_event(lines)
+    finally:
+        server.should_exit = True
+        await serving
+        await advertisement_events.stop()
+    await delete_advertisement(create_response.json().get("id"))
+
+    assert response.status_code == 200 and response.headers["content-type"].startswith("text/event-stream")
+    assert ready[0] == "event: ready"
+    assert created[0] == "event: create"
+    assert json.loads(created[1][6:])["id"] == create_response.json().get("id")
+
+
+@pytest.mark.asyncio
+async def test_advertisement_view_stats(
+    auth_async_verified_client: AsyncClient, advertisement_data: dict
+):
+    create_response = await auth_async_verified_client.post(
+        test_urls["advertisement"].get("create_advertisement"), json=advertisement_data
+    )
+    url = test_urls["advertisement"].get("get_advertisement") + f"{create_response.json().get('id')}"
+    for _ in range(3):
+        await auth_async_verified_client.get(url)
+    await view_buffer.flush()
+    await rollup_advertisement_view_stats()
+
+    for granularity in ["hour", "day"]:
+        response = await auth_async_verified_client.get(f"{url}/stats", params={"granularity": granularity})
+        assert response.status_code == 200
+        assert [bucket["views"] for bucket in response.json()["buckets"]] == [3]
+    response = await auth_async_verified_client.get(
+        f"{url}/stats", params={"from": "2020-01-01T00:00:00Z", "to": "2021-01-01T00:00:00Z"}
+    )
+    assert response.status_code == 400
+    await delete_advertisement(create_response.json().get("id"))
+
+
+@pytest.mark.asyncio
+async def test_get_advertisements_sparse_fields(
+    auth_async_verified_client: AsyncClient, advertisement_data: dict
+):
+    create_response = await auth_async_verified_client.post(
+        test_urls["advertisement"].get("create_advertisement"), json=advertisement_data
+    )
+    created_id = create_response.json().get("id")
+    response = await auth_async_verified_client.get(
+        test_urls["advertisement"].get("get_all_advertisements"), params={"fields": "id,title"}
+    )
+    assert response.status_code == 200 and response.json() == [{"id": created_id, "title": "string"}]
+    response = await auth_async_verified_client.get(
+        test_urls["advertisement"].get("get_advertisement") + f"{created_id}", params={"fields": "title"}
+    )
+    assert response.status_code == 200 and response.json() == {"title": "string"}
+    response = await auth_async_verified_client.get(
+        test_urls["advertisement"].get("get_all_advertisements"), params={"fields": "id,password"}
+    )
+    assert response.status_code == 400
+    await delete_advertisement(created_id)
+
+
+@pytest.mark.asyncio
+async def test_get_advertisements_batch(
+    auth_async_verified_client: AsyncClient, advertisement_data: dict
+):
+    created_ids = []
+    for number in range(3):
+        create_response = await auth_async_verified_client.post(
+            test_urls["advertisement"].get("create_advertisement"),
+            json={**advertisement_data, "title": f"batch {number}"},
+        )
+        created_ids.append(create_response.json().get("id"))
+    missing_id = 2**31 - 1
+    requested_ids = [created_ids[2], missing_id, created_ids[0], created_ids[1]]
+    with track_queries() as queries:
+        response = await auth_async_verified_client.get(
+            test_urls["advertisement"].get("batch"), params={"ids": ",".join(map(str, requested_ids))}
+        )
+    assert response.status_code == 200
+    assert [item["id"] for item in response.json()["advertisements"]] == [created_ids[2], created_ids[0], created_ids[1]]
+    assert response.json()["missing"] == [missing_id]
+    assert queries.count == 2  # current user, advertisements
+    assert {id for id, _ in view_buffer._views} >= set(created_ids)
+    response = await auth_async_verified_client.post(test_urls["advertisement"].get("batch"), json={"ids": requested_ids})
+    assert response.status_code == 200 and response.json()["missing"] == [missing_id]
+    for ids in ["1,a", "0", "1099511627776"]:
+        response = await auth_async_verified_client.get(test_urls["advertisement"].get("batch"), params={"ids": ids})
+        assert response.status_code == 400
+    response = await auth_async_verified_client.post(
+        test_urls["advertisement"].get("batch"), json={"ids": [1099511627776]}
+    )
+    assert response.status_code == 422
+    for id in created_ids:
+        await delete_advertisement(id)
+
+
+@pytest.mark.asyncio
+async def test_get_advertisement_single_flight(
+    auth_async_verified_client: AsyncClient, advertisement_data: dict
+):
+    create_response = await auth_async_verified_client.post(
+        test_urls["advertisement"].get("create_advertisement"), json=advertisement_data
+    )
+    created_id = create_response.json().get("id")
+    with track_queries() as queries:
+        advertisements = await asyncio.gather(*(get_advertisement_by_id(created_id) for _ in range(10)))
+    assert queries.count == 1 and {advertisement.id for advertisement in advertisements} == {created_id}
+    with track_queries() as queries:
+        await asyncio.gather(
+            *(get_advertisement_fields_by_id(created_id, ["id", "title"]) for _ in range(5)),
+            *(get_advertisements_fields(["id"]) for _ in range(5)),
+            *(get_advertisements_by_ids([created_id]) for _ in range(5)),
+        )
+    assert queries.count == 3
+
+    # A cancelled caller does not cancel the query for the callers that joined it
+    first = asyncio.create_task(get_advertisement_by_id(created_id))
+    await asyncio.sleep(0)
+    second = asyncio.create_task(get_advertisement_by_id(created_id))
+    await asyncio.sleep(0)
+    first.cancel()
+    assert (await second).id == created_id
+    await delete_advertisement(created_id)
+
+
+@pytest.mark.asyncio
+async def test_view_buffer_drops_oldest_views_on_failed_writes(monkeypatch):
+    async def unavailable_database(views):
+        raise ConnectionError("database unavailable")
+
+    monkeypatch.setattr(advertisement.view_stats, "record_advertisement_views", unavailable_database)
+    buffer = ViewBuffer(flush_interval=60, max_keys=10, max_pending_keys=2, rollup_interval=300)
+    for hour in range(3):
+        buffer._views[(1, datetime(2024, 1, 1, hour))] += hour + 1
+
+    with pytest.raises(ConnectionError):
+        await buffer.flush()
+
+    assert set(buffer._views) == {(1, datetime(2024, 1, 1, 1)), (1, datetime(2024, 1, 1, 2))}
+    assert (buffer.pending, buffer.dropped_count) == (5, 1)
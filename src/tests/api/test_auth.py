@@ -2,6 +2,7 @@ import pytest
 from httpx import AsyncClient
 
 from conftest import test_urls
+from auth.service import send_verification
 from user.service import get_user_by_username, delete_user
 
 
@@ -147,4 +148,27 @@ async def test_verify_account_unsuccessfully(auth_async_verified_client: AsyncCl
         url=test_urls["auth"].get("verify_account"),
         params={},
     )
-    assert response.status_code == 422
\ No newline at end of file
+    assert response.status_code == 422
+
+@pytest.mark.asyncio
+async def test_repeated_login_reuses_verification_token(async_client: AsyncClient, user_data: dict):
+    db_user = await get_user_by_username(username=user_data.get("username"))
+    if db_user:
+        await delete_user(db_user)
+    _ = await async_client.post(url=test_urls["auth"].get("register"), json=user_data)
+    tokens = []
+    for _ in range(2):
+        await async_client.post(
+            url=test_urls["auth"].get("login"),
+            data={
+                "username": user_data.get("email"),
+                "password": user_data.get("password"),
+            },
+        )
+        user = await get_user_by_username(username=user_data.get("username"))
+        tokens.append(user.verification_token)
+    # An explicit resend always issues a new token
+    resent_token = await send_verification(user)
+    assert tokens[0] is not None and tokens[0] == tokens[1]
+    assert resent_token != tokens[0]
+    await delete_user(user)
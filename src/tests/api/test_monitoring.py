@@ -0,0 +1,128 @@
+import pytest
+from httpx import AsyncClient, ASGITransport
+from sqlalchemy import update
+from sqlalchemy.pool import NullPool
+
+from conftest import test_urls
+from config import settings
+from main import app
+from db import async_session_maker, engine, create_db_engine
+from monitoring.queries import fingerprint
+from monitoring.timing import ServerTimingMiddleware
+from monitoring.explain import ExplainCapture, explain_capture
+from user.models import User
+from user.service import get_user_by_username, delete_user
+
+
+def test_query_fingerprint_ignores_values():
+    assert fingerprint("SELECT * FROM advertisement WHERE id = $1") == fingerprint(
+        "SELECT *  FROM advertisement\nWHERE id = 42"
+    )
+    assert fingerprint("SELECT * FROM advertisement WHERE id IN ($1, $2, $3)") == (
+        "SELECT * FROM advertisement WHERE id IN (...)"
+    )
+
+
+def test_query_fingerprint_ignores_asyncpg_casts():
+    assert fingerprint("SELECT advertisement.id FROM advertisement WHERE advertisement.id IN ($1::INTEGER)") == (
+        fingerprint("SELECT advertisement.id FROM advertisement WHERE advertisement.id IN ($1::INTEGER, $2::INTEGER)")
+    ) == "SELECT advertisement.id FROM advertisement WHERE advertisement.id IN (...)"
+    assert fingerprint("UPDATE advertisement SET title=$1::VARCHAR(100) WHERE id = $2::INTEGER") == (
+        "UPDATE advertisement SET title=? WHERE id = ?"
+    )
+    assert fingerprint("SELECT * FROM advertisement WHERE id = ANY($1::INTEGER[])") == (
+        "SELECT * FROM advertisement WHERE id = ANY(?)"
+    )
+
+
+@pytest.mark.asyncio
+async def test_query_stats_forbidden(auth_async_verified_client: AsyncClient):
+    response = await auth_async_verified_client.get(test_urls["monitoring"].get("queries"))
+    assert response.status_code == 403
+
+
+@pytest.mark.asyncio
+async def test_query_stats_successfully(auth_async_verified_client: AsyncClient, user_data: dict):
+    async with async_session_maker() as session:
+        await session.execute(
+            update(User).where(User.username == user_data.get("username")).values(is_superuser=True)
+        )
+        await session.commit()
+    response = await auth_async_verified_client.get(
+        test_urls["monitoring"].get("queries"), params={"limit": 5, "order_by": "calls"}
+    )
+    stats = response.json()
+    assert response.status_code == 200 and 0 < len(stats) <= 5
+    assert stats == sorted(stats, key=lambda item: item["calls"], reverse=True)
+    await delete_user(await get_user_by_username(username=user_data.get("username")))
+
+
+@pytest.mark.asyncio
+async def test_metrics_successfully(auth_async_verified_client: AsyncClient):
+    await auth_async_verified_client.get(test_urls["advertisement"].get("get_all_advertisements"))
+    response = await auth_async_verified_client.get(
+        test_urls["monitoring"].get("metrics"),
+        headers={"Authorization": f"Bearer {settings.monitoring.METRICS_TOKEN}"},
+    )
+    assert response.status_code == 200
+    assert 'http_requests_total{method="GET",route="/api/v1/advertisement/",status="200"}' in response.text
+    assert "db_pool_checked_out" in response.text and "db_query_duration_seconds_count" in response.text
+    assert 'cache_hits_total{cache="verification_token"}' in response.text
+
+
+@pytest.mark.asyncio
+async def test_metrics_without_token(async_client: AsyncClient):
+    response = await async_client.get(test_urls["monitoring"].get("metrics"))
+    wrong_token_response = await async_client.get(
+        test_urls["monitoring"].get("metrics"), headers={"Authorization": "Bearer wrong-token"}
+    )
+    assert response.status_code == 401 and wrong_token_response.status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_server_timing_successfully(auth_async_verified_client: AsyncClient):
+    async with AsyncClient(
+        transport=ASGITransport(app=ServerTimingMiddleware(app)),
+        base_url=settings.test.BASE_URL,
+        cookies=auth_async_verified_client.cookies,
+    ) as client:
+        response = await client.get(test_urls["advertisement"].get("get_all_advertisements"))
+    assert response.status_code == 200
+    phases = [entry.split(";")[0] for entry in response.headers["Server-Timing"].split(", ")]
+    assert phases == ["auth", "handler", "db", "serialize", "total"]
+
+
+@pytest.mark.asyncio
+async def test_explain_capture_successfully():
+    capture = ExplainCapture(threshold_ms=0, interval=60, max_plans=2, analyze=True)
+    read = await capture.capture(engine, "SELECT * FROM advertisement WHERE id = $1", (1,), duration_ms=1.0)
+    write = await capture.capture(engine, "DELETE FROM advertisement WHERE id = $1", (1,), duration_ms=1.0)
+    assert read["analyzed"] and "Execution Time" in read["plan"][0]
+    assert not write["analyzed"] and "Execution Time" not in write["plan"][0]
+    assert capture.latest(limit=5) == [write, read]
+
+
+@pytest.mark.asyncio
+async def test_explain_capture_does_not_run_functions():
+    capture = ExplainCapture(threshold_ms=0, interval=60, max_plans=2, analyze=True)
+    lock = await capture.capture(engine, "SELECT pg_advisory_lock(hashtext($1))", ("explain-test",), duration_ms=1.0)
+    async with engine.connect() as connection:
+        advisory_locks = (await connection.exec_driver_sql(
+            "SELECT count(*) FROM pg_locks WHERE locktype = 'advisory'"
+        )).scalar_one()
+    assert not lock["analyzed"] and "Execution Time" not in lock["plan"][0]
+    assert advisory_locks == 0
+    assert not ExplainCapture(threshold_ms=0, interval=60, max_plans=2).analyze
+
+
+@pytest.mark.asyncio
+async def test_explain_capture_uses_engine_of_query(monkeypatch):
+    captured_engines = []
+    monkeypatch.setattr(
+        explain_capture, "maybe_capture", lambda engine, *args: captured_engines.append(engine.sync_engine)
+    )
+    other_engine = create_db_engine(poolclass=NullPool)
+    async with other_engine.connect() as connection:
+        await connection.exec_driver_sql("SELECT 1")
+    await other_engine.dispose()
+    assert captured_engines and set(captured_engines) == {other_engine.sync_engine}
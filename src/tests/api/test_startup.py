@@ -0,0 +1,31 @@
+import os
+import subprocess
+import sys
+
+from config import PROJECT_PATH
+from logger import test_logger as logger
+
+
+# Modules that must stay off the import path of the application
+LAZY_MODULES = ("pandas", "sqladmin", "fixtures.loader")
+
+
+def test_import_time():
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=PROJECT_PATH / "src",
+        env=os.environ,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    # Lines look like "import time:   self [us] | cumulative | module"
+    cumulative_us = {}
+    for line in result.stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            _, cumulative, module = line.split("|")
+            if cumulative.strip().isdigit():
+                cumulative_us[module.strip()] = int(cumulative)
+
+    logger.info(f"Importing main takes {cumulative_us['main'] / 1000:.1f}ms")
+    assert not [module for module in LAZY_MODULES if module in cumulative_us]
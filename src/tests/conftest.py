@@ -1,10 +1,18 @@
 import asyncio
+import os
 
 from typing import AsyncGenerator, Generator
 import pytest
 import pytest_asyncio
 from httpx import AsyncClient, ASGITransport
 
+# Run background tasks in-process and skip SMTP, so the suite needs no broker or mail server
+os.environ.setdefault("CELERY_TASK_BACKEND", "inprocess")
+os.environ.setdefault("MAIL_SUPPRESS_SEND", "true")
+os.environ.setdefault("METRICS_TOKEN", "test-metrics-token")
+# Serve changes as soon as they are committed, the suite has no concurrent writers
+os.environ.setdefault("CHANGES_LAG_SECONDS", "0")
+
 from config import settings
 from main import app
 from user.service import get_user_by_username
@@ -28,6 +36,14 @@ test_urls = {
         "update_advertisement": f"{api_prefix}/advertisement/",
         "get_advertisement": f"{api_prefix}/advertisement/",
         "delete_advertisement": f"{api_prefix}/advertisement/",
+        "changes": f"{api_prefix}/advertisement/changes",
+        "batch": f"{api_prefix}/advertisement/batch",
+        "stream": f"{api_prefix}/advertisement/stream",
+    },
+    "monitoring": {
+        "queries": f"{api_prefix}/monitoring/queries",
+        "metrics": "/metrics",
+        "plans": f"{api_prefix}/monitoring/plans",
     },
 }
 
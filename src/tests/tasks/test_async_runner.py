@@ -0,0 +1,35 @@
+import asyncio
+
+from sqlalchemy import event, text
+
+from db import engine, async_session_maker
+from tasks_celery import AsyncTaskRunner
+
+
+# Number of task bodies executed by the runner
+TASKS_COUNT = 20
+
+
+async def task_body() -> asyncio.AbstractEventLoop:
+    async with async_session_maker() as session:
+        await session.execute(text("SELECT 1"))
+    return asyncio.get_running_loop()
+
+
+def test_async_runner_reuses_loop_and_connections():
+    runner = AsyncTaskRunner()
+    runner.start()
+    connections = []
+    event.listen(runner.engine.sync_engine, "connect", lambda *args: connections.append(args))
+    try:
+        runner_loop, runner_engine = runner.loop, runner.engine
+        loops = {runner.run(task_body()) for _ in range(TASKS_COUNT)}
+        assert runner.engine is runner_engine
+        assert async_session_maker.kw["bind"] is runner_engine
+    finally:
+        runner.stop()
+
+    # Every task ran on the same loop, over the one connection opened by the first task
+    assert loops == {runner_loop}
+    assert len(connections) == 1
+    assert async_session_maker.kw["bind"] is engine
@@ -0,0 +1,56 @@
+import pytest
+from aiosmtplib import SMTPRecipientRefused
+
+import mail.tasks
+from mail.mail import mail_config
+from mail.tasks import send_bulk_email
+
+
+messages = [
+    {"subject": "Wave", "recipients": ["first@example.com", "second@example.com"], "body": "<p>Hello</p>"},
+    {"subject": "Wave", "recipients": ["third@example.com"], "body": "<p>Hello</p>"},
+]
+
+
+class FakeSMTP:
+    """Stand-in for the SMTP client, refusing every recipient starting with "second"."""
+    sent = []
+
+    def __init__(self, **kwargs):
+        self.is_connected = False
+
+    async def connect(self):
+        self.is_connected = True
+
+    async def send_message(self, message):
+        recipients = message["To"].split(", ")
+        FakeSMTP.sent.append(recipients)
+        refused = {
+            recipient: SMTPRecipientRefused(550, "Mailbox unavailable", recipient)
+            for recipient in recipients if recipient.startswith("second")
+        }
+        return refused, "OK"
+
+    async def quit(self):
+        self.is_connected = False
+
+
+@pytest.mark.asyncio
+async def test_send_bulk_email_suppressed():
+    assert mail_config.SUPPRESS_SEND
+
+    summary = await send_bulk_email.coroutine(messages, rate_limit=0)
+
+    assert summary == {"total": 3, "sent": 3, "failed": []}
+
+
+@pytest.mark.asyncio
+async def test_send_bulk_email_counts_recipients(monkeypatch):
+    monkeypatch.setattr(mail.tasks, "mail_config", mail_config.model_copy(update={"SUPPRESS_SEND": 0}))
+    monkeypatch.setattr(mail.tasks, "SMTP", FakeSMTP)
+
+    summary = await send_bulk_email.coroutine(messages, rate_limit=0)
+
+    assert FakeSMTP.sent == [["first@example.com", "second@example.com"], ["third@example.com"]]
+    assert (summary["total"], summary["sent"]) == (3, 2)
+    assert [failure["recipient"] for failure in summary["failed"]] == ["second@example.com"]
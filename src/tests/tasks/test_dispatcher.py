@@ -0,0 +1,51 @@
+import asyncio
+import logging
+from types import SimpleNamespace
+
+import pytest
+
+from tasks_dispatch import InProcessDispatcher
+
+
+def make_task(name: str, results: list, fail: bool = False) -> SimpleNamespace:
+    """Builds a stand-in for an async Celery task that records its arguments."""
+    async def coroutine(*args, **kwargs):
+        if fail:
+            raise RuntimeError("task failed")
+        results.append((name, args, kwargs))
+
+    return SimpleNamespace(name=name, coroutine=coroutine)
+
+
+@pytest.mark.asyncio
+async def test_inprocess_dispatcher_executes_tasks():
+    results = []
+    dispatcher = InProcessDispatcher(workers=2, queue_size=10, drain_timeout=5)
+    await dispatcher.start()
+    try:
+        await dispatcher.send(make_task("ok", results), 1, key="value")
+        await dispatcher.send(make_task("broken", results, fail=True))
+        await dispatcher.send(SimpleNamespace(name="sync", run=lambda value: results.append(("sync", value))), 2)
+        await dispatcher.send(make_task("delayed", results), countdown=0.05)
+        assert dispatcher.stats()["scheduled"] == 1
+        await asyncio.sleep(0.2)
+    finally:
+        await dispatcher.stop()
+
+    assert ("ok", (1,), {"key": "value"}) in results
+    assert ("sync", 2) in results
+    assert ("delayed", (), {}) in results
+    assert dispatcher.stats() == {"depth": 0, "scheduled": 0, "executed": 3, "failed": 1}
+
+
+@pytest.mark.asyncio
+async def test_inprocess_dispatcher_logs_delayed_tasks_on_stop(caplog):
+    results = []
+    dispatcher = InProcessDispatcher(workers=1, queue_size=10, drain_timeout=5)
+    await dispatcher.send(make_task("expire_token", results), 42, countdown=3600)
+    with caplog.at_level(logging.ERROR, logger="CeleryLogger"):
+        await dispatcher.stop()
+
+    assert results == []
+    assert dispatcher.stats()["scheduled"] == 0
+    assert any("expire_token" in record.getMessage() and "42" in record.getMessage() for record in caplog.records)
@@ -0,0 +1,54 @@
+import asyncio
+import csv
+
+import pytest
+from sqlalchemy import delete
+
+from db import async_session_maker
+from advertisement.models import Advertisement
+from fixtures.loader import load_advertisement_fixture, load_advertisement_fixture_once
+from fixtures.models import FixtureLoad
+
+
+@pytest.mark.asyncio
+async def test_load_advertisement_fixture(tmp_path):
+    file_path = tmp_path / "advertisements.csv"
+    with open(file_path, "w", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file)
+        writer.writerow(["id", "title", "author", "views_count", "position"])
+        writer.writerows([
+            [1, "Loader title 1", "Loader author", 10, 1],
+            [2, "Loader title 2", "Loader author", 20, ""],
+            [3, "Loader title 1", "Loader author", 30, 3],
+            [4, "Loader title 3", "Loader author", "many", 4],
+            [5, "x" * 101, "Loader author", 50, 5],
+        ])
+
+    first = await load_advertisement_fixture(file_path, chunk_size=2)
+    second = await load_advertisement_fixture(file_path, chunk_size=2)
+    async with async_session_maker() as session:
+        await session.execute(delete(Advertisement).where(Advertisement.author == "Loader author"))
+        await session.commit()
+
+    assert (first["read"], first["inserted"], first["skipped"]) == (5, 2, 2)
+    assert (second["read"], second["inserted"], second["skipped"]) == (5, 0, 2)
+
+
+@pytest.mark.asyncio
+async def test_load_advertisement_fixture_once(tmp_path):
+    file_path = tmp_path / "once.csv"
+    with open(file_path, "w", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file)
+        writer.writerow(["id", "title", "author", "views_count", "position"])
+        writer.writerow([1, "Once title", "Once author", 10, 1])
+
+    # Workers starting together: exactly one of them loads the file
+    results = await asyncio.gather(*(load_advertisement_fixture_once(file_path) for _ in range(4)))
+    loaded_again = await load_advertisement_fixture_once(file_path)
+    async with async_session_maker() as session:
+        await session.execute(delete(Advertisement).where(Advertisement.author == "Once author"))
+        await session.execute(delete(FixtureLoad).where(FixtureLoad.name == file_path.name))
+        await session.commit()
+
+    assert len([stats for stats in results if stats is not None]) == 1
+    assert loaded_again is None
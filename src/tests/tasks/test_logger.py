@@ -0,0 +1,27 @@
+import json
+import logging
+import queue
+import sys
+
+from logger import JsonFormatter, RecordQueueHandler
+
+
+def test_json_formatter_keeps_exception_and_stack():
+    logger = logging.getLogger("JsonFormatterTest")
+    try:
+        raise ValueError("broken value")
+    except ValueError:
+        record = logger.makeRecord(
+            logger.name, logging.ERROR, __file__, 0, "Failed with %s", ("value",),
+            exc_info=sys.exc_info(), sinfo="Stack (most recent call last):\n  frame",
+        )
+
+    # Records reach the file formatters through the log pipeline queue
+    records = queue.SimpleQueue()
+    RecordQueueHandler(records).handle(record)
+    entry = json.loads(JsonFormatter().format(records.get_nowait()))
+
+    assert entry["message"] == "Failed with value"
+    assert entry["level"] == "ERROR"
+    assert "ValueError: broken value" in entry["exc_info"]
+    assert entry["stack_info"].endswith("frame")
@@ -0,0 +1,111 @@
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import delete, select
+
+import outbox.service
+from db import async_session_maker
+from outbox.models import OutboxMessage
+from outbox.schemas import OutboxMessageCreate
+from outbox.service import count_unknown_outbox_messages, relay_outbox_messages
+from tasks_celery import async_task
+from tasks_dispatch import CeleryDispatcher
+from tasks_publisher import TaskPublisher
+
+
+relayed_values = []
+
+
+@async_task(name="tests.record_relayed_value")
+async def record_relayed_value(value: int):
+    relayed_values.append(value)
+
+
+@contextmanager
+def unavailable_broker():
+    raise ConnectionError("broker unavailable")
+    yield
+
+
+async def write_outbox_messages(*messages: OutboxMessageCreate) -> list[int]:
+    rows = [OutboxMessage(**message.model_dump()) for message in messages]
+    async with async_session_maker() as session:
+        session.add_all(rows)
+        await session.flush()
+        ids = [row.id for row in rows]
+        await session.commit()
+    return ids
+
+
+async def remaining_outbox_ids(ids: list[int]) -> set[int]:
+    async with async_session_maker() as session:
+        return set((await session.execute(select(OutboxMessage.id).where(OutboxMessage.id.in_(ids)))).scalars())
+
+
+async def delete_outbox_messages(ids: list[int]):
+    async with async_session_maker() as session:
+        await session.execute(delete(OutboxMessage).where(OutboxMessage.id.in_(ids)))
+        await session.commit()
+
+
+@pytest.mark.asyncio
+async def test_relay_deletes_accepted_messages():
+    ids = await write_outbox_messages(
+        OutboxMessageCreate(task=record_relayed_value.name, args=[1]),
+        OutboxMessageCreate(task=record_relayed_value.name, kwargs={"value": 2}),
+    )
+    relayed = await relay_outbox_messages(batch_size=100)
+    await outbox.service.dispatcher.stop()
+
+    assert relayed >= 2
+    assert await remaining_outbox_ids(ids) == set()
+    assert {1, 2} <= set(relayed_values)
+
+
+@pytest.mark.asyncio
+async def test_relay_keeps_messages_on_broker_failure(monkeypatch):
+    publisher = TaskPublisher(app=SimpleNamespace(producer_or_acquire=unavailable_broker), buffer_size=10, batch_size=10)
+    monkeypatch.setattr(outbox.service, "dispatcher", CeleryDispatcher(publisher=publisher, flush_timeout=1))
+    ids = await write_outbox_messages(OutboxMessageCreate(task=record_relayed_value.name, args=[3]))
+    try:
+        relayed = await relay_outbox_messages(batch_size=100)
+        assert relayed == 0
+        assert await remaining_outbox_ids(ids) == set(ids)
+        assert publisher.failed_count >= 1
+    finally:
+        publisher.stop(timeout=1)
+        await delete_outbox_messages(ids)
+
+
+@pytest.mark.asyncio
+async def test_relay_keeps_messages_of_unknown_tasks():
+    ids = await write_outbox_messages(OutboxMessageCreate(task="tests.unknown_task", args=[4]))
+    try:
+        await relay_outbox_messages(batch_size=100)
+        await outbox.service.dispatcher.stop()
+        assert await remaining_outbox_ids(ids) == set(ids)
+        assert await count_unknown_outbox_messages() >= 1
+    finally:
+        await delete_outbox_messages(ids)
+
+
+@pytest.mark.asyncio
+async def test_relay_groups_bulk_task_messages(monkeypatch):
+    batches = []
+
+    @async_task(name="tests.record_relayed_batch")
+    async def record_relayed_batch(messages: list[dict]):
+        batches.append(messages)
+
+    monkeypatch.setattr(outbox.service, "BULK_TASKS", {record_relayed_value.name: record_relayed_batch})
+    ids = await write_outbox_messages(
+        OutboxMessageCreate(task=record_relayed_value.name, kwargs={"value": 5}),
+        OutboxMessageCreate(task=record_relayed_value.name, kwargs={"value": 6}),
+    )
+    await relay_outbox_messages(batch_size=100)
+    await outbox.service.dispatcher.stop()
+
+    assert await remaining_outbox_ids(ids) == set()
+    assert [{"value": 5}, {"value": 6}] in batches
+    assert 5 not in relayed_values
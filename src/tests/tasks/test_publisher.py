@@ -0,0 +1,69 @@
+from contextlib import nullcontext
+from threading import Event
+from types import SimpleNamespace
+
+import pytest
+
+from tasks_publisher import TaskPublisher, TaskPublishError
+
+
+# Stand-in for the Celery application, the publisher only acquires producers from it
+app = SimpleNamespace(producer_or_acquire=nullcontext)
+
+
+def make_task(name: str, published: list, fail: bool = False, release: Event | None = None) -> SimpleNamespace:
+    """Builds a stand-in for a Celery task that records the messages published for it."""
+    def apply_async(args, kwargs, countdown=None, producer=None):
+        if release is not None:
+            release.wait()
+        if fail:
+            raise ConnectionError("broker unavailable")
+        published.append((name, args, kwargs, countdown))
+
+    return SimpleNamespace(name=name, apply_async=apply_async)
+
+
+@pytest.mark.asyncio
+async def test_publisher_publishes_buffered_messages():
+    published = []
+    publisher = TaskPublisher(app=app, buffer_size=10, batch_size=2)
+    task = make_task("ok", published)
+    for number in range(3):
+        await publisher.publish(task, (number,), {}, countdown=number or None)
+    publisher.flush(timeout=5)
+    publisher.stop(timeout=5)
+
+    assert published == [("ok", (0,), {}, None), ("ok", (1,), {}, 1), ("ok", (2,), {}, 2)]
+    assert publisher.stats()["published"] == 3
+    assert publisher.stats()["depth"] == 0
+
+
+@pytest.mark.asyncio
+async def test_publisher_reports_failed_messages():
+    published = []
+    publisher = TaskPublisher(app=app, buffer_size=10, batch_size=10)
+    await publisher.publish(make_task("broken", published, fail=True), (), {})
+    await publisher.publish(make_task("ok", published), (), {})
+    with pytest.raises(TaskPublishError):
+        publisher.flush(timeout=5)
+    publisher.stop(timeout=5)
+
+    assert published == [("ok", (), {}, None)]
+    assert (publisher.published_count, publisher.failed_count) == (1, 1)
+
+
+@pytest.mark.asyncio
+async def test_publisher_flush_and_stop_are_bounded():
+    published, release = [], Event()
+    publisher = TaskPublisher(app=app, buffer_size=1, batch_size=1)
+    task = make_task("stuck", published, release=release)
+    # The first message blocks the thread, the second one fills the buffer
+    await publisher.publish(task, (1,), {})
+    await publisher.publish(task, (2,), {})
+    try:
+        with pytest.raises(TaskPublishError):
+            publisher.flush(timeout=0.1)
+        publisher.stop(timeout=0.1)
+        assert publisher._thread is None
+    finally:
+        release.set()
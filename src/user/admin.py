@@ -1,9 +1,14 @@
-from sqladmin import ModelView
+from sqladmin import action
+from sqlalchemy import Select, or_
+from starlette.requests import Request
+from starlette.responses import RedirectResponse
 
+from admin.views import ScalableModelView
 from user.models import User
+from user.service import delete_users, verify_users, deactivate_users
 
 
-class UserAdmin(ModelView, model=User):
+class UserAdmin(ScalableModelView, model=User):
     """Admin view for managing user data in the admin interface."""
     name='User'
     name_plural='Users'
@@ -16,6 +21,9 @@ class UserAdmin(ModelView, model=User):
         "is_superuser",
         "is_verified",
     ]
+    # Only indexed columns, so sorting and searching stay fast on large tables
+    column_sortable_list = ["id", "username", "email"]
+    column_searchable_list = ["username", "email"]
     form_create_rules = [
         "username", 
         "email", 
@@ -47,3 +55,30 @@ class UserAdmin(ModelView, model=User):
             (False, 'No')
         ],
     }
+
+    def search_query(self, stmt: Select, term: str) -> Select:
+        # Usernames and emails are matched exactly, which their unique indexes serve
+        return stmt.where(or_(User.username == term, User.email == term))
+
+    @action(
+        name="bulk_delete",
+        label="Delete selected",
+        confirmation_message="Delete the selected users?",
+        add_in_detail=False,
+    )
+    async def bulk_delete(self, request: Request) -> RedirectResponse:
+        """Deletes the selected users with one statement."""
+        await delete_users(self.get_selected_pks(request))
+        return self.redirect_to_list(request)
+
+    @action(name="verify", label="Verify", confirmation_message="Mark the selected users as verified?")
+    async def verify(self, request: Request) -> RedirectResponse:
+        """Verifies the selected users with one statement."""
+        await verify_users(self.get_selected_pks(request))
+        return self.redirect_to_list(request)
+
+    @action(name="deactivate", label="Deactivate", confirmation_message="Deactivate the selected users?")
+    async def deactivate(self, request: Request) -> RedirectResponse:
+        """Deactivates the selected users with one statement."""
+        await deactivate_users(self.get_selected_pks(request))
+        return self.redirect_to_list(request)
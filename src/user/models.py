@@ -25,7 +25,8 @@ class User(SQLAlchemyBaseUserTable[uuid.UUID], Base):
     is_superuser: Mapped[bool] = mapped_column(Boolean, default=False, nullable=False)
     is_verified: Mapped[bool] = mapped_column(Boolean, default=False, nullable=False)
     
-    verification_token: Mapped[str | None]
+    verification_token: Mapped[str | None] = mapped_column(index=True)
+    verification_token_sent_at: Mapped[datetime | None]
 
     def __doc__(self):
         return f"User({self.id}){self.username}"
@@ -2,8 +2,10 @@ from typing import Optional
 from uuid import UUID
 
 from fastapi import HTTPException
-from sqlalchemy import select
+from sqlalchemy import select, update, delete, func
 
+from outbox.schemas import OutboxMessageCreate
+from outbox.service import add_outbox_messages
 from user.models import User
 from user.schemas import UserUpdate, UserRead
 from logger import db_query_logger as logger
@@ -94,25 +96,37 @@ async def update_user(user: User, updated_user: UserUpdate) -> UserRead:
         return db_user
 
 
-async def update_user_verification_token(user_id: UUID, token: str) -> Optional[User]:
+async def update_user_verification_token(
+        user_id: UUID, token: str, outbox_messages: list[OutboxMessageCreate] | None = None
+    ) -> Optional[User]:
     """
     Asynchronously updates a user's verification token.
 
+    The token update and the given outbox messages are written in one transaction, 
+    so the tasks caused by the new token are relayed only if the token is stored. 
+    The time the token was issued is stored along with it.
+
     Args:
         user_id (UUID): The unique identifier of the user.
         token (str): The new verification token to set for the user.
+        outbox_messages (list[OutboxMessageCreate] | None): Tasks to write into the outbox 
+                                                             together with the token.
 
     Returns:
         Optional[User]: The user object with the updated verification token, 
                         or None if the user is not found.
     """
     async with async_session_maker() as session:
-        query = select(User).where(user_id == User.id)
+        query = (
+            update(User)
+            .where(user_id == User.id)
+            .values(verification_token=token, verification_token_sent_at=func.timezone("utc", func.now()))
+            .returning(User)
+        )
         user = (await session.execute(query)).unique().scalar_one_or_none()
-        user.verification_token = token
-        session.add(user)
+        if user and outbox_messages:
+            add_outbox_messages(session, outbox_messages)
         await session.commit()
-        await session.refresh(user)
         return user
     
 
@@ -131,6 +145,7 @@ async def delete_user_verification_token(user_id: UUID) -> Optional[User]:
         query = select(User).where(user_id == User.id)
         user = (await session.execute(query)).unique().scalar_one_or_none()
         user.verification_token = None
+        user.verification_token_sent_at = None
         session.add(user)
         await session.commit()
         await session.refresh(user)
@@ -165,4 +180,61 @@ async def verify_verification_token(token: str) -> Optional[User]:
         await session.commit()
         await session.refresh(user)
 
-        return user
\ No newline at end of file
+        return user
+
+
+async def delete_users(user_ids: list[UUID]) -> int:
+    """
+    Asynchronously deletes the given users with a single statement.
+
+    Args:
+        user_ids (list[UUID]): The unique identifiers of the users to delete.
+
+    Returns:
+        int: The number of deleted users.
+    """
+    async with async_session_maker() as session:
+        result = await session.execute(delete(User).where(User.id.in_(user_ids)))
+        await session.commit()
+        logger.info(f"Deleted {result.rowcount} users")
+        return result.rowcount
+
+
+async def verify_users(user_ids: list[UUID]) -> int:
+    """
+    Asynchronously marks the given users as verified with a single statement.
+
+    Pending verification tokens of the users are discarded.
+
+    Args:
+        user_ids (list[UUID]): The unique identifiers of the users to verify.
+
+    Returns:
+        int: The number of verified users.
+    """
+    async with async_session_maker() as session:
+        result = await session.execute(
+            update(User)
+            .where(User.id.in_(user_ids))
+            .values(is_verified=True, verification_token=None, verification_token_sent_at=None)
+        )
+        await session.commit()
+        logger.info(f"Verified {result.rowcount} users")
+        return result.rowcount
+
+
+async def deactivate_users(user_ids: list[UUID]) -> int:
+    """
+    Asynchronously deactivates the given users with a single statement.
+
+    Args:
+        user_ids (list[UUID]): The unique identifiers of the users to deactivate.
+
+    Returns:
+        int: The number of deactivated users.
+    """
+    async with async_session_maker() as session:
+        result = await session.execute(update(User).where(User.id.in_(user_ids)).values(is_active=False))
+        await session.commit()
+        logger.info(f"Deactivated {result.rowcount} users")
+        return result.rowcount